@@ -11,6 +11,7 @@ from modules.views.ocr_view import render_ocr_mode
 from modules.views.document_view import render_document_compare_mode
 from modules.views.quick_convert_view import render_quick_convert_mode
 from modules.views.settings_view import render_settings_page
+from modules.views.jobs_view import render_jobs_sidebar
 
 import streamlit.components.v1 as components
 
@@ -158,6 +159,9 @@ with st.sidebar:
     if app_mode in info_dict:
         st.info(f"💡 **Info:** {info_dict[app_mode]}")
 
+    # งานเบื้องหลังที่กำลังทำ (ดูได้จากทุกเมนู)
+    render_jobs_sidebar()
+
 # --- 3. MAIN LOGIC (Router) ---
 
 if app_mode == "AI OCR (แปลง PDF)":
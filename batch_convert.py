@@ -0,0 +1,199 @@
+"""
+แปลง PDF ทั้งโฟลเดอร์แบบไม่ต้องเปิดหน้าเว็บ (Headless Batch)
+
+วิธีใช้ (รันจากโฟลเดอร์หลักของโปรเจกต์):
+    python batch_convert.py เอกสาร/ --out ผลลัพธ์/
+    python batch_convert.py เอกสาร/ --out ผลลัพธ์/ --mode quickfix --workers 8 --raster-procs 4
+
+ผลลัพธ์ต่อไฟล์ (โครงสร้างโฟลเดอร์เดียวกับต้นทาง):
+    <ชื่อไฟล์>.docx  - ข้อความทุกหน้า
+    <ชื่อไฟล์>.xlsx  - ตาราง (เฉพาะโหมด ocr และเมื่อพบตาราง)
+    <ชื่อไฟล์>.jsonl - ผลรายหน้า 1 บรรทัดต่อหน้า (text / tables / error / source)
+
+ไฟล์ที่มี .jsonl อยู่แล้วจะถูกข้าม (รันซ้ำเพื่อทำต่อได้) ยกเว้นใส่ --overwrite
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import fitz  # PyMuPDF
+
+from modules.services.ai_service import get_best_model
+from modules.services.image_encoder import ENCODING_PRESETS, DEFAULT_PRESET
+from modules.services.ocr_cache import get_ocr_cache, CacheStats
+from modules.services.ocr_engine import run_concurrent, DEFAULT_WORKERS
+from modules.services.page_packing import AdaptivePacker
+from modules.services.page_source import iter_encoded_pages, FITZ_LOCK
+from modules.services.text_triage import triage_document
+from modules.services.ocr_service import run_ocr_pages, split_ocr_results, process_page_ai
+from modules.services.document_export import create_word_docx, create_excel_from_tables, create_doc_from_results
+
+def find_pdfs(root):
+    """ไฟล์ PDF ทั้งหมดในโฟลเดอร์ (รวมโฟลเดอร์ย่อย) เรียงตามชื่อ"""
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if name.lower().endswith(".pdf"):
+                found.append(os.path.join(dirpath, name))
+    return sorted(found)
+
+def convert_ocr(pdf_path, page_count, args, pool, cache, stats):
+    """โหมด ocr: อ่านทุกหน้าด้วย AI + แยกตาราง (Logic เดียวกับหน้า AI OCR)"""
+    images = iter_encoded_pages(pool, pdf_path, range(page_count), ENCODING_PRESETS[args.encoding], adaptive_dpi=args.adaptive_dpi)
+    packer = AdaptivePacker(initial=args.pack, max_size=args.pack) if args.pack > 1 and not args.structured else None
+    raw_responses = run_ocr_pages(args.api_key, args.model, images, args.workers, lambda done, total: None, cache, stats, None, packer,
+                                  structured=args.structured)
+    texts, tables, errors = split_ocr_results(raw_responses)
+    return texts, tables, errors, ["ai"] * page_count
+
+def convert_quickfix(pdf_path, page_count, args, pool, cache, stats):
+    """โหมด quickfix: หน้าไหน Text Layer ปกติดึงเอง / หน้าที่เพี้ยนส่ง AI (Logic เดียวกับหน้า Quick Fix)"""
+    # ไฟล์ทำพร้อมกันหลาย Thread: fitz ใน Process หลักต้องอยู่ใต้ FITZ_LOCK (Render แยกไปทำใน Process Pool)
+    with FITZ_LOCK, fitz.open(pdf_path) as doc:
+        triage = triage_document(doc, remap=True)
+    ai_pages = [i for i, t in enumerate(triage) if t["needs_ai"]]
+    texts = [t["text"].strip() for t in triage]
+    sources = ["remap" if t["remapped"] else "text_layer" for t in triage]
+    errors = [None] * page_count
+
+    images = iter_encoded_pages(pool, pdf_path, ai_pages, ENCODING_PRESETS[args.encoding], adaptive_dpi=args.adaptive_dpi)
+    results = run_concurrent(
+        lambda blob: process_page_ai(args.api_key, blob, args.model, "text", cache, stats),
+        images,
+        max_workers=args.workers,
+        return_exceptions=True
+    )
+    for page_idx, result in zip(ai_pages, results):
+        sources[page_idx] = "ai"
+        if isinstance(result, Exception):
+            texts[page_idx] = ""
+            errors[page_idx] = {"kind": getattr(result, "kind", "fatal"), "message": str(result)}
+        else:
+            texts[page_idx] = result
+    return texts, [[] for _ in range(page_count)], errors, sources
+
+def write_outputs(base_path, rel_path, mode, texts, tables, errors, sources, single_sheet=False):
+    """เขียน .docx / .xlsx / .jsonl ของไฟล์ | Return: ข้อความเตือนจากการเขียน Excel (ตารางเกินขีดจำกัด)"""
+    warnings = []
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    if mode == "ocr":
+        docx = create_word_docx(texts)
+    else:
+        docx = create_doc_from_results(texts)
+    with open(base_path + ".docx", "wb") as f:
+        f.write(docx.getvalue())
+
+    if any(tables):
+        with open(base_path + ".xlsx", "wb") as f:
+            f.write(create_excel_from_tables(tables, single_sheet, warnings).getvalue())
+
+    # เขียน .jsonl เป็นไฟล์สุดท้าย (มีไฟล์นี้ = ไฟล์นั้นเสร็จสมบูรณ์)
+    tmp_path = base_path + ".jsonl.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for i, text in enumerate(texts):
+            record = {"file": rel_path, "page": i + 1, "text": text, "tables": tables[i], "error": errors[i], "source": sources[i]}
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, base_path + ".jsonl")
+    return warnings
+
+def run(args):
+    pdfs = find_pdfs(args.input)
+    if not pdfs:
+        print(f"ไม่พบไฟล์ PDF ใน {args.input}")
+        return 1
+    if not args.model:
+        args.model = get_best_model(args.api_key)
+        if not args.model:
+            # ไม่มีโมเดลให้ใช้ (API Key ผิด / ต่อเน็ตไม่ได้) ทุกหน้าจะล้มเหลวอยู่ดี หยุดเลยดีกว่า
+            print("❌ ไม่พบโมเดลที่ใช้ได้ (ตรวจสอบ API Key / การเชื่อมต่อ หรือระบุ --model)")
+            return 1
+
+    cache = get_ocr_cache() if not args.no_cache else None
+    stats = CacheStats()
+    converter = convert_ocr if args.mode == "ocr" else convert_quickfix
+    lock = threading.Lock()
+    report = {"files": 0, "skipped": 0, "pages": 0, "failed_pages": [], "failed_files": []}
+
+    print(f"พบ {len(pdfs)} ไฟล์ | โหมด {args.mode} | โมเดล {args.model} | AI พร้อมกัน {args.files_parallel}x{args.workers} | Render {args.raster_procs} process")
+    started = time.perf_counter()
+
+    # Render ใน Process Pool (ใช้ spawn เพราะ Process หลักมี Thread อยู่แล้ว)
+    pool = ProcessPoolExecutor(max_workers=args.raster_procs, mp_context=multiprocessing.get_context("spawn"))
+
+    def process(numbered):
+        n, pdf_path = numbered
+        rel_path = os.path.relpath(pdf_path, args.input)
+        base_path = os.path.join(args.out, os.path.splitext(rel_path)[0])
+        if not args.overwrite and os.path.exists(base_path + ".jsonl"):
+            with lock:
+                report["skipped"] += 1
+            return
+
+        t0 = time.perf_counter()
+        try:
+            with FITZ_LOCK, fitz.open(pdf_path) as doc:
+                page_count = len(doc)
+            texts, tables, errors, sources = converter(pdf_path, page_count, args, pool, cache, stats)
+            warnings = write_outputs(base_path, rel_path, args.mode, texts, tables, errors, sources, args.single_sheet)
+        except Exception as e:
+            with lock:
+                report["failed_files"].append((rel_path, str(e)))
+            print(f"[{n}/{len(pdfs)}] ❌ {rel_path}: {e}")
+            return
+
+        failed = [i + 1 for i, err in enumerate(errors) if err]
+        with lock:
+            report["files"] += 1
+            report["pages"] += page_count
+            report["failed_pages"].extend((rel_path, p) for p in failed)
+        note = f" (ล้มเหลว {len(failed)} หน้า)" if failed else ""
+        print(f"[{n}/{len(pdfs)}] {rel_path}: {page_count} หน้า {time.perf_counter() - t0:.1f}s{note}")
+        for warning in warnings:
+            print(f"    ⚠️ {rel_path}.xlsx: {warning}")
+
+    try:
+        # หลายไฟล์พร้อมกัน (แต่ละไฟล์ยิง AI ได้ไม่เกิน --workers) เพื่อไม่ให้ไฟล์เล็กๆ ทำให้ Pipeline ว่าง
+        with ThreadPoolExecutor(max_workers=args.files_parallel) as file_pool:
+            list(file_pool.map(process, enumerate(pdfs, start=1)))
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print("\n=== สรุป (Throughput Report) ===")
+    print(f"ไฟล์สำเร็จ: {report['files']} | ข้าม (มีผลอยู่แล้ว): {report['skipped']} | ล้มเหลว: {len(report['failed_files'])}")
+    print(f"หน้าทั้งหมด: {report['pages']} ใน {elapsed:.1f}s = {report['pages'] / elapsed if elapsed else 0:.2f} pages/sec")
+    if cache:
+        print(stats.summary())
+    if report["failed_pages"]:
+        print(f"หน้าที่อ่านไม่สำเร็จ {len(report['failed_pages'])} หน้า:")
+        for rel_path, page in report["failed_pages"]:
+            print(f"  - {rel_path} หน้า {page}")
+    for rel_path, error in report["failed_files"]:
+        print(f"  - ❌ {rel_path}: {error}")
+    return 1 if report["failed_files"] or report["failed_pages"] else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch OCR / Quick Fix for folders of PDFs")
+    parser.add_argument("input", help="โฟลเดอร์ที่มีไฟล์ PDF")
+    parser.add_argument("--out", required=True, help="โฟลเดอร์เก็บผลลัพธ์")
+    parser.add_argument("--mode", choices=["ocr", "quickfix"], default="ocr")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"))
+    parser.add_argument("--model", help="ไม่ระบุ = เลือกโมเดลที่ดีที่สุดให้อัตโนมัติ")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="จำนวนคำขอ AI พร้อมกันต่อไฟล์")
+    parser.add_argument("--files-parallel", type=int, default=2, help="จำนวนไฟล์ที่ทำพร้อมกัน")
+    parser.add_argument("--raster-procs", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="จำนวน Process สำหรับ Render หน้า PDF")
+    parser.add_argument("--encoding", choices=list(ENCODING_PRESETS), default=DEFAULT_PRESET)
+    parser.add_argument("--adaptive-dpi", action="store_true")
+    parser.add_argument("--pack", type=int, default=1, help="โหมด ocr: จำนวนหน้าสูงสุดต่อคำขอ (1 = ทีละหน้า)")
+    parser.add_argument("--structured", action="store_true", help="โหมด ocr: ให้ AI ตอบเป็น JSON (ย่อหน้า/ตาราง) แทนแท็ก [[TABLE]] (ไม่ใช้ --pack)")
+    parser.add_argument("--single-sheet", action="store_true", help="รวมทุกตารางของไฟล์ไว้ Sheet เดียวใน .xlsx")
+    parser.add_argument("--no-cache", action="store_true", help="ไม่ใช้ OCR Cache บนดิสก์")
+    parser.add_argument("--overwrite", action="store_true", help="ทำใหม่แม้มีผลลัพธ์อยู่แล้ว")
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("ต้องระบุ --api-key หรือตั้งค่า GEMINI_API_KEY")
+    raise SystemExit(run(args))
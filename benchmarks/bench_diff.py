@@ -0,0 +1,98 @@
+"""
+Benchmark การสร้างตาราง Diff: difflib.HtmlDiff (แบบเดิม) เทียบกับ TextComparator (Myers แบบ Linear Space)
+
+ข้อมูลสังเคราะห์ (สุ่มแบบกำหนด seed ได้) หลายขนาด หลายรูปแบบการแก้:
+- scattered: แก้/ลบ/เพิ่มกระจายทั่วเอกสาร (~1% ของบรรทัด)
+- heavy: แก้ ~20% ของบรรทัด
+- rewrite: เขียนใหม่เกือบทั้งหมด (~90%)
+- code: โค้ดที่มีบรรทัดซ้ำกันมาก (เช่น "}" / "return") แก้ ~5%
+วัดเวลาหา Edit Script, เวลาสร้าง HTML และหน่วยความจำสูงสุด
+
+วิธีใช้ (รันจากโฟลเดอร์หลักของโปรเจกต์):
+    python -m benchmarks.bench_diff
+    python -m benchmarks.bench_diff --lines 1000 10000 50000 --cases scattered heavy --difflib-max-lines 10000
+"""
+import argparse
+import difflib
+import random
+import time
+import tracemalloc
+
+from modules.services.comparator import TextComparator
+
+WORDS = "เอกสาร ข้อมูล รายงาน ประจำปี บริษัท report total amount customer invoice page table ตรวจสอบ แก้ไข".split()
+CODE_LINES = ["}", "return result;", "", "else {", "i += 1;", "break;", "// TODO"]
+
+def make_line(rng, style):
+    if style == "code":
+        if rng.random() < 0.4:
+            return rng.choice(CODE_LINES)
+        return f"    var_{rng.randrange(1000)} = compute({rng.randrange(100)}, {rng.choice(WORDS)!r});"
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 14)))
+
+def make_pair(line_count, case, seed=0):
+    """ข้อความต้นฉบับ + ฉบับแก้ไข (list ของบรรทัด)"""
+    rng = random.Random(f"{seed}:{line_count}:{case}")
+    style = "code" if case == "code" else "text"
+    rate = {"scattered": 0.01, "heavy": 0.2, "rewrite": 0.9, "code": 0.05}[case]
+    old = [make_line(rng, style) for _ in range(line_count)]
+    new = []
+    for line in old:
+        if rng.random() >= rate:
+            new.append(line)
+            continue
+        action = rng.random()
+        if action < 0.5:
+            # แก้คำในบรรทัด
+            words = line.split(" ")
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+            new.append(" ".join(words))
+        elif action < 0.75:
+            pass  # ลบบรรทัด
+        else:
+            new.extend([line, make_line(rng, style)])
+    return old, new
+
+def measure(fn):
+    """เวลา (วินาที, วัดโดยไม่เปิด tracemalloc ซึ่งทำให้โค้ด Python ช้าลงหลายเท่า) และหน่วยความจำสูงสุด (MB, วัดอีกรอบ)"""
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+def run(line_counts, cases, difflib_max_lines, mode, seed):
+    context = mode == "diff_only"
+    comparator = TextComparator()
+    print(f"{'case':<10} {'lines':>7} {'engine':<8} {'script s':>9} {'html s':>9} {'total s':>9} {'peak MB':>8} {'speedup':>8}")
+    for case in cases:
+        for line_count in line_counts:
+            old, new = make_pair(line_count, case, seed)
+
+            opcodes, script_s, script_mb = measure(lambda: comparator.compute_diff(old, new))
+            _, html_s, html_mb = measure(lambda: comparator.render_table(old, new, opcodes, context=context))
+            total = script_s + html_s
+            line = f"{case:<10} {line_count:>7} {'myers':<8} {script_s:>9.3f} {html_s:>9.3f} {total:>9.3f} {max(script_mb, html_mb):>8.1f}"
+
+            if line_count > difflib_max_lines:
+                print(line + f" {'-':>8}")
+                print(f"{case:<10} {line_count:>7} {'difflib':<8} {'(ข้าม: เกิน --difflib-max-lines)':>38}")
+                continue
+            differ = difflib.HtmlDiff(wrapcolumn=80)
+            _, difflib_s, difflib_mb = measure(lambda: differ.make_table(old, new, context=context, numlines=2))
+            print(line + f" {difflib_s / total:>7.1f}x")
+            print(f"{case:<10} {line_count:>7} {'difflib':<8} {'-':>9} {'-':>9} {difflib_s:>9.3f} {difflib_mb:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff engine benchmark: difflib.HtmlDiff vs Myers linear-space")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--cases", nargs="+", choices=["scattered", "heavy", "rewrite", "code"], default=["scattered", "heavy", "rewrite", "code"])
+    parser.add_argument("--difflib-max-lines", type=int, default=10000, help="ข้าม difflib เมื่อเอกสารยาวกว่านี้ (อาจใช้เวลาหลายนาที)")
+    parser.add_argument("--mode", choices=["all", "diff_only"], default="all")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.lines, args.cases, args.difflib_max_lines, args.mode, args.seed)
@@ -0,0 +1,69 @@
+"""
+Benchmark การบีบอัดภาพก่อนส่ง AI (ขนาด Payload ต่อหน้า + เวลา)
+
+วิธีใช้ (รันจากโฟลเดอร์หลักของโปรเจกต์):
+    python -m benchmarks.bench_image_encoding เอกสาร.pdf
+    python -m benchmarks.bench_image_encoding เอกสาร.pdf --pages 5 --api-key KEY --model models/gemini-2.5-flash
+
+ถ้าใส่ --api-key จะยิง AI จริงเพื่อวัด Latency แบบ End-to-End และเก็บข้อความไว้เทียบความแม่นยำภาษาไทย
+หน้าที่ยิงไม่สำเร็จ (หลัง Retry) ไม่นับรวมใน Latency และไม่เขียนไฟล์ข้อความ แต่แสดงจำนวนแยกในคอลัมน์ failed
+"""
+import argparse
+import os
+import statistics
+import time
+
+from modules.services.page_source import PdfPageSource
+from modules.services.image_encoder import encode_image, ENCODING_PRESETS
+
+def run(pdf_path, max_pages, api_key=None, model_name=None, adaptive_dpi=False, out_dir=None):
+    with open(pdf_path, "rb") as f:
+        source = PdfPageSource(f.read(), dpi=150, adaptive_dpi=adaptive_dpi)
+    page_numbers = list(range(min(max_pages, len(source))))
+
+    if api_key:
+        from modules.services.ai_service import request_text, AIServiceError
+        from modules.services.ocr_service import TEXT_PROMPT
+
+    print(f"{'preset':<10} {'KB/page':>10} {'encode ms':>10} {'e2e ms':>10} {'failed':>7}")
+    for preset, settings in ENCODING_PRESETS.items():
+        sizes, encode_times, e2e_times = [], [], []
+        failures = []
+        for page_num in page_numbers:
+            image = source.render(page_num)
+
+            t0 = time.perf_counter()
+            blob = encode_image(image, settings)
+            encode_times.append((time.perf_counter() - t0) * 1000)
+            sizes.append(len(blob["data"]) / 1024)
+
+            if api_key:
+                t0 = time.perf_counter()
+                try:
+                    text = request_text(api_key, model_name, [TEXT_PROMPT, blob])
+                except AIServiceError as e:
+                    failures.append((page_num + 1, e))
+                    continue
+                e2e_times.append((time.perf_counter() - t0) * 1000)
+                if out_dir:
+                    os.makedirs(out_dir, exist_ok=True)
+                    with open(os.path.join(out_dir, f"{preset}_p{page_num+1}.txt"), "w", encoding="utf-8") as f:
+                        f.write(text)
+
+        e2e = f"{statistics.mean(e2e_times):>10.0f}" if e2e_times else f"{'-':>10}"
+        failed = f"{len(failures):>7}" if api_key else f"{'-':>7}"
+        print(f"{preset:<10} {statistics.mean(sizes):>10.1f} {statistics.mean(encode_times):>10.1f} {e2e} {failed}")
+        for page, error in failures:
+            print(f"    ❌ หน้า {page}: [{error.kind}] {error.message}")
+    source.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image encoding presets")
+    parser.add_argument("pdf")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"))
+    parser.add_argument("--model", default="models/gemini-2.5-flash")
+    parser.add_argument("--adaptive-dpi", action="store_true")
+    parser.add_argument("--out-dir", help="เก็บข้อความที่ได้จากแต่ละ preset ไว้เทียบความแม่นยำ")
+    args = parser.parse_args()
+    run(args.pdf, args.pages, args.api_key, args.model, args.adaptive_dpi, args.out_dir)
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark: ค่าใช้จ่ายต่อการเรียก 1 ครั้งก่อนยิง AI (ไม่รวมเวลา Network)
+
+เทียบ:
+  - แบบเดิม: genai.configure() + สร้าง GenerativeModel + สร้าง Client ใหม่ทุกหน้า
+  - แบบ Pool: ai_service.get_model() ใช้ Model/Client เดิมซ้ำ
+
+วิธีใช้ (รันจากโฟลเดอร์หลักของโปรเจกต์ ไม่ต้องใช้ Key จริง):
+    python -m benchmarks.bench_model_pool --calls 200
+"""
+import argparse
+import time
+
+import google.generativeai as genai
+from modules.services.ai_service import get_model, SAFETY_SETTINGS, _bind_client
+
+def per_call_legacy(api_key, model_name):
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(model_name, safety_settings=SAFETY_SETTINGS)
+    _bind_client(model)  # เทียบเท่าตอนยิงครั้งแรก
+    return model
+
+def per_call_pooled(api_key, model_name):
+    return get_model(api_key, model_name)
+
+def measure(fn, calls, api_key, model_name):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn(api_key, model_name)
+    return (time.perf_counter() - start) / calls * 1e6  # ไมโครวินาทีต่อครั้ง
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model client setup overhead")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--model", default="models/gemini-2.5-flash")
+    args = parser.parse_args()
+
+    dummy_key = "benchmark-key"
+    legacy = measure(per_call_legacy, args.calls, dummy_key, args.model)
+    pooled = measure(per_call_pooled, args.calls, dummy_key, args.model)
+    print(f"{'path':<8} {'us/call':>12}")
+    print(f"{'legacy':<8} {legacy:>12.1f}")
+    print(f"{'pooled':<8} {pooled:>12.1f}")
+    print(f"speedup  {legacy / max(pooled, 1e-9):>12.1f}x")
@@ -0,0 +1,155 @@
+"""
+Benchmark Throughput ของ Pipeline ทั้งระบบแบบ Offline (ใช้ Backend จำลอง ไม่ต้องมี API Key)
+
+วัด pages/sec, Latency ต่อหน้า (p50/p95/p99) และหน่วยความจำสูงสุด ของงาน
+OCR, Quick Fix และตรวจทาน (Proofread) ที่จำนวน Worker ต่างๆ
+
+งานตรวจทานใช้เส้นทางเดียวกับหน้าเว็บ (proofread_text: แบ่งชิ้น + Cache รายย่อหน้า + ตรวจคำเบื้องต้น)
+ทีละเอกสาร โดยส่งชิ้นของเอกสารพร้อมกันตามจำนวน Worker
+- proofread: Cache ว่าง (ตรวจครั้งแรก)
+- proofread_edit: ตรวจซ้ำหลังแก้ 1 ย่อหน้าต่อเอกสาร (ย่อหน้าอื่นได้จาก Cache)
+
+วิธีใช้ (รันจากโฟลเดอร์หลักของโปรเจกต์):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --pages 40 --workers 1 4 8 16 --latency 0.8 --error-rate 0.05 --quota-rate 0.02
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+import fitz  # PyMuPDF
+
+from modules.services.ai_service import set_backend
+from modules.services.fake_ai_backend import FakeBackend
+from modules.services.image_encoder import ENCODING_PRESETS, DEFAULT_PRESET
+from modules.services.ocr_engine import run_concurrent
+from modules.services.page_source import PdfPageSource
+from modules.services.ocr_service import ocr_single_image, process_page_ai
+from modules.services.proofreader import CorrectionCache, proofread_text
+from modules.services.spell_prepass import get_spell_prepass
+
+API_KEY = "benchmark"
+MODEL = "models/fake-flash"
+
+def make_pdf(page_count):
+    """PDF สังเคราะห์ (ข้อความ + เส้นตาราง) สำหรับ Render"""
+    doc = fitz.open()
+    for n in range(page_count):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 60 + line * 18), f"Page {n + 1} line {line + 1} benchmark text 0123456789", fontsize=10)
+        page.draw_rect(fitz.Rect(50, 500, 550, 700))
+    return doc.tobytes()
+
+# ย่อหน้าที่ทุกคำอยู่ในพจนานุกรม (ตรวจคำเบื้องต้นแล้วข้ามได้) / ย่อหน้าที่มีคำสะกดผิด (ต้องส่ง AI)
+CLEAN_PARAGRAPH = "รายงานประจำปีของบริษัทแสดงข้อมูลการเงิน เอกสาร ข้อมูล รายงาน ตรวจสอบ แก้ไข ข้อความ ภาษาไทย The company report shows total amount for each customer invoice. "
+DIRTY_PARAGRAPH = "เอกสารนี้มีคำสะกดผิด เช่น กระเพรา และ สังเกตุ ข้อมูลรายงานประจำปี The reprot has a tpyo in the invoice total. "
+
+def make_texts(count, paragraphs=30, dirty_every=3):
+    """เอกสารสังเคราะห์: ทุก dirty_every ย่อหน้ามีคำสะกดผิด 1 ย่อหน้า (ย่อหน้าไม่ซ้ำกันทั้งชุด กัน Cache ชนกันเอง)"""
+    return [
+        "\n\n".join(
+            f"{n + 1}.{p + 1} " + (DIRTY_PARAGRAPH if p % dirty_every == 0 else CLEAN_PARAGRAPH) * 4
+            for p in range(paragraphs)
+        )
+        for n in range(count)
+    ]
+
+def edit_one_paragraph(text):
+    """แก้ย่อหน้ากลางเอกสาร 1 ย่อหน้า (จำลองผู้ใช้แก้แล้วสั่งตรวจซ้ำ)"""
+    paragraphs = text.split("\n\n")
+    paragraphs[len(paragraphs) // 2] += " แก้ไขเพิ่มเติม"
+    return "\n\n".join(paragraphs)
+
+def proofread_task(workers, cache):
+    """ตรวจทาน 1 เอกสารแบบเดียวกับ run_proofread ของหน้าเว็บ (ไม่รวมการ Stream ซึ่งเป็นส่วนแสดงผล)"""
+    def task(text):
+        _, failures, _ = proofread_text(API_KEY, MODEL, text, num_workers=workers, cache=cache, prepass=get_spell_prepass())
+        if failures:
+            raise failures[0][1]
+    return task
+
+def workloads(pdf_bytes, texts, encoding, workers):
+    """
+    คืน {ชื่องาน: (ฟังก์ชันสร้าง items, task_fn, จำนวน items ที่ทำพร้อมกัน)}
+    งานตรวจทานทำทีละเอกสาร (Worker ใช้ส่งชิ้นของเอกสารพร้อมกันแทน)
+    """
+    def pages():
+        return PdfPageSource(pdf_bytes, dpi=150).iter_pages()
+
+    # proofread_edit: เติม Cache ด้วยต้นฉบับก่อน (ไม่นับเวลา) แล้ววัดการตรวจซ้ำหลังแก้
+    def edited_texts():
+        warm = proofread_task(workers, edit_cache)
+        for text in texts:
+            warm(text)
+        return [edit_one_paragraph(text) for text in texts]
+
+    edit_cache = CorrectionCache()
+    return {
+        "ocr": (pages, lambda img: ocr_single_image(API_KEY, img, MODEL, encoding=encoding), workers),
+        "quickfix": (pages, lambda img: process_page_ai(API_KEY, img, MODEL, "text", encoding=encoding), workers),
+        "proofread": (lambda: texts, proofread_task(workers, CorrectionCache()), 1),
+        "proofread_edit": (edited_texts, proofread_task(workers, edit_cache), 1),
+    }
+
+WORKLOADS = ["ocr", "quickfix", "proofread", "proofread_edit"]
+
+def run_one(make_items, task_fn, workers):
+    latencies = []
+
+    def timed(item):
+        t0 = time.perf_counter()
+        try:
+            return task_fn(item)
+        finally:
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    items = make_items()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    results = run_concurrent(timed, items, max_workers=workers, return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    errors = sum(1 for r in results if isinstance(r, Exception))
+    q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "items": len(results),
+        "rate": len(results) / elapsed,
+        "p50": q[49], "p95": q[94], "p99": q[98],
+        "errors": errors,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+def run(page_count, worker_counts, backend_options, encoding, only=None):
+    pdf_bytes = make_pdf(page_count)
+    texts = make_texts(page_count)
+
+    print(f"{'workload':<14} {'workers':>7} {'items/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'peak MB':>8}")
+    for name in WORKLOADS:
+        if only and name not in only:
+            continue
+        for workers in worker_counts:
+            # Backend ใหม่ทุกรอบ เพื่อให้ชุด Error ที่จำลองเหมือนกันทุกรอบ
+            set_backend(FakeBackend(**backend_options))
+            make_items, task_fn, parallel = workloads(pdf_bytes, texts, encoding, workers)[name]
+            r = run_one(make_items, task_fn, parallel)
+            print(f"{name:<14} {workers:>7} {r['rate']:>9.2f} {r['p50']:>9.0f} {r['p95']:>9.0f} {r['p99']:>9.0f} {r['errors']:>7} {r['peak_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark with the fake AI backend")
+    parser.add_argument("--pages", type=int, default=20, help="จำนวนหน้า (และจำนวนข้อความสำหรับงานตรวจทาน)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--workload", nargs="+", choices=WORKLOADS)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--quota-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=100000, help="Rate Limit ของ Backend จำลอง (ค่าสูง = ไม่จำกัด)")
+    parser.add_argument("--encoding", choices=list(ENCODING_PRESETS), default=DEFAULT_PRESET)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend_options = {"latency": args.latency, "error_rate": args.error_rate, "quota_rate": args.quota_rate, "rpm": args.rpm, "seed": args.seed}
+    run(args.pages, args.workers, backend_options, ENCODING_PRESETS[args.encoding], args.workload)
@@ -1,5 +1,10 @@
 import google.generativeai as genai
-import streamlit as st
+from google.generativeai import client as genai_client
+import hashlib
+import os
+import random
+import threading
+import time
 
 # ตั้งค่าความปลอดภัย (ใช้ร่วมกันทั้งแอป)
 SAFETY_SETTINGS = [
@@ -9,16 +14,239 @@ SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
 
+# --- RATE LIMIT & RETRY ---
+# จำนวน Request ต่อนาทีที่ยอมให้ยิง (ต่อ API Key + Model) ปรับได้ผ่าน Environment Variable
+DEFAULT_RPM = int(os.environ.get("GEMINI_RPM", "60"))
+MAX_RETRIES = 4
+BASE_BACKOFF = 1.0   # วินาที
+MAX_BACKOFF = 30.0
+
+class AIServiceError(Exception):
+    """
+    ข้อผิดพลาดจากการเรียก AI (หลัง Retry ครบแล้ว)
+    kind: 'quota' (429) | 'transient' (5xx/timeout) | 'fatal' (อื่นๆ เช่น Key ผิด)
+    """
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+
+    def to_dict(self):
+        return {"kind": self.kind, "message": self.message}
+
+class RateLimiter:
+    """Token Bucket: เติม Token ตาม RPM, ยอมให้ Burst ได้ประมาณ 10 วินาที"""
+    def __init__(self, rpm=DEFAULT_RPM):
+        self.rate = rpm / 60.0
+        self.capacity = max(1.0, rpm / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """รอจนกว่าจะมี Token ว่าง (Block เฉพาะ Thread ที่เรียก)"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """โดน 429: หยุดทุก Thread ที่ใช้ Limiter ตัวนี้ชั่วคราว และทิ้ง Token ที่สะสมไว้"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(api_key, model_name):
+    """Limiter ใช้ร่วมกันทุก Session ที่ใช้ Backend + Key + Model เดียวกัน"""
+    backend = get_backend()
+    key = (backend.name, api_key, model_name)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(backend.rpm or DEFAULT_RPM)
+        return _limiters[key]
+
+def classify_error(e):
+    """แยกประเภท Exception เป็น quota / transient / fatal"""
+    msg = str(e)
+    name = type(e).__name__
+    if "429" in msg or "ResourceExhausted" in name or "quota" in msg.lower():
+        return "quota"
+    if any(code in msg for code in ("500", "502", "503", "504")) or name in (
+        "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "TimeoutError", "ConnectionError"
+    ):
+        return "transient"
+    return "fatal"
+
+def backoff_delay(attempt):
+    """Exponential Backoff แบบ Full Jitter"""
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * (2 ** attempt)))
+
+def call_with_retry(fn, limiter=None, max_retries=MAX_RETRIES):
+    """
+    เรียก fn() ผ่าน Rate Limiter พร้อม Retry เมื่อเจอ 429 / 5xx
+    Return: ผลของ fn() | Raise: AIServiceError เมื่อ Retry ครบแล้วยังไม่ผ่าน
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire()
+        try:
+            return fn()
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == "fatal" or attempt >= max_retries:
+                raise AIServiceError(kind, str(e)) from e
+            delay = backoff_delay(attempt)
+            if kind == "quota" and limiter:
+                limiter.pause(delay)
+            time.sleep(delay)
+            attempt += 1
+
+# --- MODEL CLIENT POOL ---
+# genai.configure() ล้าง Client เดิมทิ้งทุกครั้ง จึงเรียกเฉพาะตอน Key เปลี่ยน
+# และเก็บ GenerativeModel ที่ผูก Client แล้วไว้ใช้ซ้ำ (ตาม api_key + model + safety settings)
+_configured_key = None
+_model_pool = {}
+_model_pool_lock = threading.RLock()
+
 def configure_api(api_key):
-    """ตั้งค่า API Key"""
+    """ตั้งค่า API Key (ข้ามถ้าเป็น Key เดิมที่ตั้งไว้แล้ว)"""
+    global _configured_key
     if api_key:
-        genai.configure(api_key=api_key)
+        with _model_pool_lock:
+            if api_key != _configured_key:
+                genai.configure(api_key=api_key)
+                _configured_key = api_key
+
+def get_model(api_key, model_name, safety_settings=None):
+    """
+    คืน GenerativeModel จาก Pool (สร้างครั้งเดียวต่อ Process)
+    Model แต่ละตัวผูก Client ของ Key ตัวเองไว้ตั้งแต่สร้าง จึงใช้หลาย Key พร้อมกันได้
+    """
+    if safety_settings is None:
+        safety_settings = SAFETY_SETTINGS
+    safety_key = tuple((s["category"], s["threshold"]) for s in safety_settings)
+    pool_key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), model_name, safety_key)
+
+    with _model_pool_lock:
+        model = _model_pool.get(pool_key)
+        if model is None:
+            configure_api(api_key)
+            model = genai.GenerativeModel(model_name, safety_settings=safety_settings)
+            _bind_client(model)
+            _model_pool[pool_key] = model
+        return model
+
+def _bind_client(model):
+    """
+    ผูก Client ของ Key ปัจจุบันให้ Model ทันที (ปกติ SDK จะสร้างตอนเรียกครั้งแรก ซึ่งอาจเป็นหลังจาก Key ถูกเปลี่ยนไปแล้ว)
+    SDK ไม่มี API สาธารณะสำหรับ Client ต่อ Model จึงทำเฉพาะเมื่อ Attribute ภายในยังมีอยู่
+    ถ้า SDK เวอร์ชันใหม่เปลี่ยนไป จะข้ามไปและให้ is_client_bound() เป็น False (ตอนเรียกใช้จะตั้ง Key ผ่าน genai.configure แทน)
+    """
+    get_client = getattr(genai_client, "get_default_generative_client", None)
+    if get_client and hasattr(model, "_client"):
+        model._client = get_client()
+
+def is_client_bound(model):
+    return getattr(model, "_client", None) is not None
+
+# --- AI BACKEND ---
+# ทุกหน้าจอเรียก AI ผ่าน request_ai / request_text / list_available_models ซึ่งส่งต่อให้ Backend ปัจจุบัน
+# Backend ต้องมี: name, rpm (None = DEFAULT_RPM), list_models(api_key), generate(api_key, model_name, content, stream)
+# generate() คืน Object ที่มี .text (stream=True: Iterable ของ Chunk ที่มี .text) และ Raise Exception ตามปกติ
+# generate() รับ generation_config (dict แบบ Gemini เช่น response_mime_type/response_schema) เพิ่มได้ ถ้าผู้เรียกส่งมา
+class GeminiBackend:
+    """Backend จริง (google.generativeai)"""
+    name = "gemini"
+    rpm = None
+
+    def list_models(self, api_key):
+        # genai.list_models() ใช้ Client ของ Key ที่ตั้งไว้ล่าสุด: ถือ Lock ตั้งแต่ตั้ง Key จนดึงรายชื่อครบ
+        # (กัน Session อื่นเปลี่ยน Key ระหว่างทาง แล้วได้รายชื่อของอีก Key มา Cache ผิดที่)
+        with _model_pool_lock:
+            configure_api(api_key)
+            return [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+
+    def generate(self, api_key, model_name, content, stream=False, generation_config=None):
+        model = get_model(api_key, model_name)
+        if not is_client_bound(model):
+            configure_api(api_key)
+        return model.generate_content(content, stream=stream, generation_config=generation_config)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def _backend_from_env():
+    """SMART_DOC_AI_BACKEND=fake ใช้ Backend จำลองในเครื่อง (ไม่ต้องต่อเน็ต / ไม่เสียโควต้า)"""
+    if os.environ.get("SMART_DOC_AI_BACKEND", "gemini").lower() == "fake":
+        from modules.services.fake_ai_backend import FakeBackend
+        return FakeBackend.from_env()
+    return GeminiBackend()
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = _backend_from_env()
+        return _backend
+
+def set_backend(backend):
+    """
+    เปลี่ยน Backend ทั้ง Process (ใช้ใน Benchmark / Load Test) - ล้าง Cache รายชื่อโมเดลและ Rate Limiter ด้วย
+    (Backend ใหม่อาจชื่อเดิมแต่ RPM ต่างกัน ไม่ควรใช้ Token / ช่วงหยุดจาก 429 ของตัวเก่า)
+    """
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    with _model_lists_lock:
+        _model_lists.clear()
+    with _limiters_lock:
+        _limiters.clear()
+
+# --- MODEL REGISTRY ---
+# เก็บรายชื่อโมเดลไว้ในหน่วยความจำ (ใช้ร่วมกันทุก Session แยกตาม API Key)
+# จะได้ไม่ต้องเรียก list_models() ทุกครั้งที่ Streamlit Rerun
+MODEL_LIST_TTL = int(os.environ.get("GEMINI_MODEL_LIST_TTL", "600"))  # วินาที
+_model_lists = {}
+_model_lists_lock = threading.Lock()
+
+def list_available_models(api_key, ttl=MODEL_LIST_TTL):
+    """
+    รายชื่อโมเดลที่ Key นี้ใช้ generateContent ได้ (Cache ตาม TTL)
+    ถ้าดึงใหม่ไม่สำเร็จ จะคืนรายการเก่าที่เคยดึงได้ (Stale) แทนการคืนค่าว่าง
+    """
+    if not api_key:
+        return []
+    # ไม่เก็บ Key ดิบเป็น Key ของ dict
+    cache_key = (get_backend().name, hashlib.sha256(api_key.encode("utf-8")).hexdigest())
+    with _model_lists_lock:
+        entry = _model_lists.get(cache_key)
+    if entry and time.monotonic() - entry[0] < ttl:
+        return list(entry[1])
+
+    try:
+        models = get_backend().list_models(api_key)
+    except Exception:
+        return list(entry[1]) if entry else []
+
+    with _model_lists_lock:
+        _model_lists[cache_key] = (time.monotonic(), models)
+    return list(models)
 
 def get_best_model(api_key):
     """Auto-select โมเดลที่ดีที่สุด (Flash -> Pro)"""
     try:
-        configure_api(api_key)
-        all_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+        all_models = list_available_models(api_key)
         
         # ลำดับความสำคัญ
         priority = [
@@ -35,23 +263,44 @@ def get_best_model(api_key):
     except:
         return None
 
+def request_ai(api_key, model_name, content, stream=False, generation_config=None):
+    """
+    ยิง AI ผ่าน Rate Limiter + Retry (ใช้ร่วมกันทุกหน้าจอ)
+    generation_config: (ไม่บังคับ) เช่น {"response_mime_type": "application/json", "response_schema": ...}
+    Return: response object | Raise: AIServiceError
+    """
+    backend = get_backend()
+    extra = {"generation_config": generation_config} if generation_config else {}
+
+    def call():
+        return backend.generate(api_key, model_name, content, stream=stream, **extra)
+
+    return call_with_retry(call, get_rate_limiter(api_key, model_name))
+
+def request_text(api_key, model_name, content, generation_config=None):
+    """เหมือน request_ai แต่คืนเป็นข้อความ (Response ที่ถูก Block/ว่าง ก็ถือเป็น AIServiceError)"""
+    response = request_ai(api_key, model_name, content, generation_config=generation_config)
+    try:
+        return response.text
+    except Exception as e:
+        raise AIServiceError("fatal", f"AI ไม่ส่งข้อความกลับมา: {e}") from e
+
 def generate_content(api_key, model_name, prompt, image=None, stream=False):
     """ฟังก์ชันยิง AI อเนกประสงค์ (รองรับทั้ง Text และ Image)"""
     try:
-        configure_api(api_key)
-        model = genai.GenerativeModel(model_name, safety_settings=SAFETY_SETTINGS)
-        
         content = [prompt]
         if image:
             content.append(image)
             
-        response = model.generate_content(content, stream=stream)
+        response = request_ai(api_key, model_name, content, stream=stream)
         
         if stream:
             return response # คืนค่าเป็น Generator สำหรับ Streaming
         else:
             return response.text
-    except Exception as e:
-        if "429" in str(e):
+    except AIServiceError as e:
+        if e.kind == "quota":
             return "API_ERROR: Quota Exceeded (โควต้าเต็ม กรุณารอสักครู่)"
+        return f"API_ERROR: {e.message}"
+    except Exception as e:
         return f"API_ERROR: {str(e)}"
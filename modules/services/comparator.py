@@ -1,18 +1,101 @@
-import difflib
+import html
+
+from modules.services.diff_engine import diff_opcodes, DiffTooExpensive
+
+# เทียบระดับตัวอักษรภายในบรรทัดที่ถูกแก้ เฉพาะคู่ที่ต่างกันไม่เกิน INLINE_MAX_RATIO ของความยาวรวม
+# และไม่เกิน INLINE_MAX_COST จุด (มากกว่านี้ = ถือว่าเขียนใหม่ ระบายทั้งบรรทัด ไม่ต้องเสียเวลาหาจุดต่าง)
+INLINE_MAX_COST = 200
+INLINE_MAX_RATIO = 0.3
+
+def _span(css_class, text):
+    return f'<span class="{css_class}">{html.escape(text)}</span>' if text else ""
+
+def _inline_marks(old_line, new_line):
+    """ระบายเฉพาะตัวอักษรที่ต่างกันในบรรทัดคู่ที่ถูกแก้ Return: (HTML ฝั่งเดิม, HTML ฝั่งใหม่)"""
+    max_cost = min(INLINE_MAX_COST, int((len(old_line) + len(new_line)) * INLINE_MAX_RATIO))
+    try:
+        if abs(len(old_line) - len(new_line)) > max_cost:
+            raise DiffTooExpensive()
+        opcodes = diff_opcodes(old_line, new_line, max_cost=max_cost)
+    except DiffTooExpensive:
+        return _span("diff_chg", old_line), _span("diff_chg", new_line)
+    left, right = [], []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            left.append(html.escape(old_line[i1:i2]))
+            right.append(html.escape(new_line[j1:j2]))
+        elif tag == "delete":
+            left.append(_span("diff_sub", old_line[i1:i2]))
+        elif tag == "insert":
+            right.append(_span("diff_add", new_line[j1:j2]))
+        else:
+            left.append(_span("diff_chg", old_line[i1:i2]))
+            right.append(_span("diff_chg", new_line[j1:j2]))
+    return "".join(left), "".join(right)
+
+def _row(left_no, left_html, right_no, right_html):
+    return (f'<tr><td class="diff_header">{left_no}</td><td class="diff_text">{left_html}</td>'
+            f'<td class="diff_header">{right_no}</td><td class="diff_text">{right_html}</td></tr>')
 
 class TextComparator:
-    def __init__(self):
-        self.differ = difflib.HtmlDiff(wrapcolumn=80) 
+    """
+    เปรียบเทียบข้อความทีละบรรทัด แยกเป็น 2 ขั้น:
+    1. compute_diff: หา Edit Script ด้วย Myers แบบ Linear Space (diff_engine) - เร็วแม้เอกสารหลายหมื่นบรรทัด
+    2. render_table: แปลง Edit Script เป็นตาราง HTML (Class เดียวกับ difflib.HtmlDiff: diff_add / diff_chg / diff_sub)
+    """
+    def __init__(self, context_lines=2):
+        self.context_lines = context_lines
+
+    def compute_diff(self, text1_lines, text2_lines):
+        """Edit Script ระดับบรรทัด: list ของ (tag, i1, i2, j1, j2)"""
+        return diff_opcodes(text1_lines, text2_lines)
+
+    def _change_rows(self, tag, text1_lines, text2_lines, i1, i2, j1, j2):
+        """แถวของช่วงที่ถูกแก้ (แทนที่: จับคู่บรรทัดตามลำดับ ส่วนที่เกินเป็นลบ/เพิ่มทั้งบรรทัด)"""
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for k in range(paired):
+            left, right = _inline_marks(text1_lines[i1 + k], text2_lines[j1 + k])
+            yield _row(i1 + k + 1, left, j1 + k + 1, right)
+        for i in range(i1 + paired, i2):
+            yield _row(i + 1, _span("diff_sub", text1_lines[i]), "", "")
+        for j in range(j1 + paired, j2):
+            yield _row("", "", j + 1, _span("diff_add", text2_lines[j]))
+
+    def render_table(self, text1_lines, text2_lines, opcodes, context=False):
+        """
+        ตาราง HTML จาก Edit Script
+        context=True: แสดงเฉพาะจุดที่ต่าง + บรรทัดรอบๆ context_lines บรรทัด (แต่ละจุดแยกเป็น tbody)
+        """
+        groups = [[]]
+        n = self.context_lines
+        for index, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+            if tag != "equal":
+                groups[-1].extend(self._change_rows(tag, text1_lines, text2_lines, i1, i2, j1, j2))
+                continue
+            equal_rows = [(i1 + k, j1 + k) for k in range(i2 - i1)]
+            if context:
+                head = n if index > 0 else 0
+                tail = n if index < len(opcodes) - 1 else 0
+                if head + tail < len(equal_rows):
+                    for i, j in equal_rows[:head]:
+                        groups[-1].append(_row(i + 1, html.escape(text1_lines[i]), j + 1, html.escape(text2_lines[j])))
+                    groups.append([])
+                    equal_rows = equal_rows[len(equal_rows) - tail:] if tail else []
+            for i, j in equal_rows:
+                groups[-1].append(_row(i + 1, html.escape(text1_lines[i]), j + 1, html.escape(text2_lines[j])))
+
+        groups = [rows for rows in groups if rows]
+        if context and not any(tag != "equal" for tag, *_ in opcodes):
+            groups = [['<tr><td class="diff_header"></td><td class="diff_text" colspan="3">ไม่พบความแตกต่าง (No Differences Found)</td></tr>']]
+        body = "".join(f"<tbody>{''.join(rows)}</tbody>" for rows in groups)
+        return ('<table class="diff" cellspacing="0" cellpadding="0" rules="groups">'
+                '<colgroup><col class="diff_header"/><col/><col class="diff_header"/><col/></colgroup>'
+                f"{body}</table>")
 
     def generate_diff_html(self, text1_lines, text2_lines, mode="all"):
         """สร้างตาราง HTML Diff ดิบๆ"""
-        show_context = True if mode == "diff_only" else False
-        return self.differ.make_table(
-            text1_lines, 
-            text2_lines, 
-            context=show_context, 
-            numlines=2
-        )
+        opcodes = self.compute_diff(text1_lines, text2_lines)
+        return self.render_table(text1_lines, text2_lines, opcodes, context=(mode == "diff_only"))
 
     def get_final_display_html(self, raw_html_diff, search_query=""):
         """
@@ -47,6 +130,7 @@ class TextComparator:
             table.diff { width: 100%; border-collapse: collapse; font-size: 14px; }
             .diff_header { background-color: #f8f9fa; color: #6c757d; padding: 8px; text-align: right; border-bottom: 2px solid #dee2e6; width: 40px; font-weight: bold;}
             td { padding: 10px; border-bottom: 1px solid #f0f0f0; vertical-align: top;}
+            .diff_text { white-space: pre-wrap; overflow-wrap: anywhere; }
             
             /* Diff Colors */
             .diff_add { background-color: #e2f0d9; color: #38761d; }
@@ -0,0 +1,187 @@
+from bisect import bisect_left
+from collections import Counter
+
+# หา Edit Script ระหว่างข้อความ 2 ชุดด้วยอัลกอริทึม Myers แบบ Linear Space (Middle Snake + Divide and Conquer)
+# - เวลา O((N+M)·D) หน่วยความจำ O(N+M) (D = จำนวนบรรทัดที่ต่างกัน) ไม่ใช่ O(N·M) แบบ difflib ในกรณีแย่
+# - บรรทัดถูกแปลงเป็นเลข (Hash ผ่าน dict) ก่อน เปรียบเทียบทีละ int แทนทีละ String
+# - บรรทัดที่ไม่มีอยู่ในอีกฝั่งเลยตัดทิ้งก่อน (ไม่มีทางจับคู่ได้) เอกสารที่ต่างกันมากจึงไม่ช้า
+# - บรรทัดที่มีฝั่งละครั้งเดียวใช้เป็นหมุดยึด (Patience Diff) แล้วใช้ Myers เฉพาะช่วงระหว่างหมุด
+#   (D ของแต่ละช่วงเล็ก แม้โค้ดที่มีบรรทัดซ้ำมาก เช่น "}" หรือบรรทัดว่าง)
+# - ผลลัพธ์เป็น Opcodes รูปแบบเดียวกับ difflib.SequenceMatcher.get_opcodes() ไม่มีเรื่อง HTML
+
+class DiffTooExpensive(Exception):
+    """จำนวนจุดต่างเกิน max_cost ที่กำหนด (ใช้ตัดการเทียบระดับตัวอักษรของบรรทัดที่ต่างกันทั้งบรรทัด)"""
+
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_cost):
+    """
+    หา "งู" ตรงกลางของเส้นทางแก้ไขที่สั้นที่สุด (Myers 1986, หัวข้อ 4b)
+    Return: (x, y, u, v) ช่วงที่ตรงกันตรงกลาง a[x:u] == b[y:v] (ตำแหน่งจริงใน a/b)
+    """
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    limit = (n + m + 1) // 2
+    offset = limit + 1
+    forward = [0] * (2 * offset + 1)
+    backward = [0] * (2 * offset + 1)
+
+    for d in range(limit + 1):
+        # รอบที่ d หาเส้นทางที่มีจุดแก้ได้ถึง 2d จุด
+        if max_cost is not None and 2 * d - 1 > max_cost:
+            raise DiffTooExpensive()
+
+        # ไปข้างหน้าจากมุมซ้ายบน
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[offset + k] = x
+            c = delta - k
+            if odd and -(d - 1) <= c <= d - 1 and x + backward[offset + c] >= n:
+                return alo + x0, blo + y0, alo + x, blo + y
+
+        # ย้อนกลับจากมุมขวาล่าง (พิกัดกลับด้าน: x นับจากท้าย)
+        for c in range(-d, d + 1, 2):
+            if c == -d or (c != d and backward[offset + c - 1] < backward[offset + c + 1]):
+                x = backward[offset + c + 1]
+            else:
+                x = backward[offset + c - 1] + 1
+            y = x - c
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[offset + c] = x
+            k = delta - c
+            if not odd and -d <= k <= d and x + forward[offset + k] >= n:
+                return ahi - x, bhi - y, ahi - x0, bhi - y0
+    raise AssertionError("middle snake not found")
+
+def _matches(a, alo, ahi, b, blo, bhi, max_cost, out):
+    """เก็บช่วงที่ตรงกัน (i, j, ขนาด) ของ a[alo:ahi] กับ b[blo:bhi] ตามลำดับลงใน out"""
+    # ตัดส่วนหัว/ท้ายที่เหมือนกันก่อน (กรณีที่พบบ่อย: แก้ไม่กี่จุดในเอกสารยาว)
+    start = 0
+    while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+        start += 1
+    if start:
+        out.append((alo, blo, start))
+        alo += start
+        blo += start
+    end = 0
+    while alo < ahi - end and blo < bhi - end and a[ahi - 1 - end] == b[bhi - 1 - end]:
+        end += 1
+    ahi -= end
+    bhi -= end
+
+    # เหลือฝั่งเดียว = แทรก/ลบล้วน ไม่มีอะไรให้จับคู่
+    if alo < ahi and blo < bhi:
+        x, y, u, v = _middle_snake(a, alo, ahi, b, blo, bhi, max_cost)
+        _matches(a, alo, x, b, blo, y, max_cost, out)
+        if u > x:
+            out.append((x, y, u - x))
+        _matches(a, u, ahi, b, v, bhi, max_cost, out)
+
+    if end:
+        out.append((ahi, bhi, end))
+
+def _patience_anchors(a, b):
+    """
+    คู่ตำแหน่ง (i, j) ของค่าที่มีฝั่งละครั้งเดียว เลือกชุดที่ยาวที่สุดที่เรียงตามลำดับทั้งสองฝั่ง
+    (Longest Increasing Subsequence แบบ Patience Sorting)
+    """
+    a_counts, b_counts = Counter(a), Counter(b)
+    b_position = {x: j for j, x in enumerate(b) if b_counts[x] == 1}
+    pairs = [(i, b_position[x]) for i, x in enumerate(a) if a_counts[x] == 1 and x in b_position]
+
+    tails, tail_index, previous = [], [], [None] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        pile = bisect_left(tails, j)
+        if pile:
+            previous[n] = tail_index[pile - 1]
+        if pile == len(tails):
+            tails.append(j)
+            tail_index.append(n)
+        else:
+            tails[pile] = j
+            tail_index[pile] = n
+
+    anchors = []
+    n = tail_index[-1] if tail_index else None
+    while n is not None:
+        anchors.append(pairs[n])
+        n = previous[n]
+    anchors.reverse()
+    return anchors
+
+def matching_blocks(a, b, max_cost=None):
+    """
+    ช่วงที่ตรงกันทั้งหมด [(i, j, ขนาด), ...] เรียงตามลำดับ (รวมช่วงที่ต่อกันแล้ว)
+    a, b: ลำดับของค่าที่ Hash ได้ (list ของบรรทัด หรือ String สำหรับเทียบทีละตัวอักษร)
+    max_cost: (ไม่บังคับ) เพดานความต่าง เกินแล้ว Raise DiffTooExpensive (ใช้ Myers ล้วน ไม่ใช้หมุดยึด)
+    """
+    # แปลงเป็นเลข: ค่าเดียวกัน = เลขเดียวกัน และตัดค่าที่มีแค่ฝั่งเดียวทิ้ง (จับคู่ไม่ได้อยู่แล้ว)
+    ids = {}
+    a_ids = [ids.setdefault(item, len(ids)) for item in a]
+    shared = set(ids.get(item, -1) for item in b)
+    b_ids = [ids.get(item, -1) for item in b]
+    a_keep = [i for i, x in enumerate(a_ids) if x in shared]
+    b_keep = [j for j, x in enumerate(b_ids) if x != -1 and x in shared]
+    a_seq = [a_ids[i] for i in a_keep]
+    b_seq = [b_ids[j] for j in b_keep]
+
+    # ส่วนหัว/ท้ายที่เหมือนกันไม่ต้องหาหมุดยึด
+    n, m = len(a_seq), len(b_seq)
+    start = 0
+    while start < n and start < m and a_seq[start] == b_seq[start]:
+        start += 1
+    end = 0
+    while end < n - start and end < m - start and a_seq[n - 1 - end] == b_seq[m - 1 - end]:
+        end += 1
+
+    filtered = [(0, 0, start)] if start else []
+    anchors = []
+    if max_cost is None:
+        middle = _patience_anchors(a_seq[start:n - end], b_seq[start:m - end])
+        anchors = [(start + i, start + j) for i, j in middle]
+    ai = bj = start
+    for anchor_i, anchor_j in anchors + [(n - end, m - end)]:
+        _matches(a_seq, ai, anchor_i, b_seq, bj, anchor_j, max_cost, filtered)
+        filtered.append((anchor_i, anchor_j, 1))
+        ai, bj = anchor_i + 1, anchor_j + 1
+    filtered[-1] = (n - end, m - end, end)
+
+    # แปลงตำแหน่งกลับเป็นของลำดับเดิม (ช่วงที่ถูกตัดบรรทัดแทรกกลางจะแยกเป็นหลายช่วง)
+    blocks = []
+    for fi, fj, size in filtered:
+        for t in range(size):
+            i, j = a_keep[fi + t], b_keep[fj + t]
+            if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+                blocks[-1][2] += 1
+            else:
+                blocks.append([i, j, 1])
+    return [tuple(block) for block in blocks]
+
+def diff_opcodes(a, b, max_cost=None):
+    """
+    Edit Script ระหว่าง a กับ b: list ของ (tag, i1, i2, j1, j2)
+    tag: "equal" / "replace" / "delete" / "insert" (เหมือน difflib.SequenceMatcher.get_opcodes)
+    """
+    opcodes = []
+    i = j = 0
+    for bi, bj, size in matching_blocks(a, b, max_cost) + [(len(a), len(b), 0)]:
+        if i < bi and j < bj:
+            opcodes.append(("replace", i, bi, j, bj))
+        elif i < bi:
+            opcodes.append(("delete", i, bi, j, bj))
+        elif j < bj:
+            opcodes.append(("insert", i, bi, j, bj))
+        if size:
+            opcodes.append(("equal", bi, bi + size, bj, bj + size))
+        i, j = bi + size, bj + size
+    return opcodes
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+
+from modules.services.page_source import PdfPageSource, FITZ_LOCK
+
+# เอกสาร PDF ที่เปิดไว้แล้ว (ใช้ร่วมกันทุก Session ตาม Hash ของไฟล์)
+MAX_CACHED_DOCS = 8
+MAX_CACHED_BYTES = int(os.environ.get("SMART_DOC_DOC_CACHE_MB", "512")) * 1024 * 1024
+# จำ file_id ของ Streamlit -> Hash ไว้ จะได้ไม่ต้อง Hash ไฟล์ใหม่ทุก Rerun
+MAX_UPLOAD_IDS = 64
+
+class DocumentHandle:
+    """
+    ไฟล์ PDF 1 ไฟล์: เขียนลง Temp File ครั้งเดียว แล้ว Memory-map ไว้
+    - data: memoryview ของไฟล์ (ไม่ copy เป็น bytes ก้อนใหม่) ส่งแทน pdf_bytes ได้ทุกที่
+    - source: PdfPageSource ที่เปิดไว้แล้ว (ใช้ source.doc ตรงๆ ต้องถือ lock = FITZ_LOCK เพราะ fitz ไม่ thread-safe)
+    งานเบื้องหลัง/Worker ควรเปิดเอกสารของตัวเองจาก data
+    """
+    def __init__(self, data_hash, path):
+        self.hash = data_hash
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)
+        self.size = len(self.data)
+        self.source = PdfPageSource(self.data)
+        self.page_count = len(self.source)
+        self.lock = FITZ_LOCK
+
+    def render(self, page_num, dpi=None):
+        return self.source.render(page_num, dpi)
+
+    def close(self):
+        """
+        ปิดเอกสารและลบ Temp File
+        ไม่ปิด mmap ตรงๆ เพราะ Session/งานเบื้องหลังอาจยังถือ data อยู่ (จะถูกคืนเมื่อไม่มีใครใช้แล้ว)
+        """
+        self.source.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+class DocumentCache:
+    """LRU ของ DocumentHandle จำกัดทั้งจำนวนไฟล์และขนาดรวม"""
+    def __init__(self, max_docs=MAX_CACHED_DOCS, max_bytes=MAX_CACHED_BYTES, temp_dir=None):
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.temp_dir = temp_dir or tempfile.mkdtemp(prefix="smart_document_docs_")
+        self.total_bytes = 0
+        self._handles = OrderedDict()
+        self._upload_hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, data_hash):
+        with self._lock:
+            handle = self._handles.get(data_hash)
+            if handle is not None:
+                self._handles.move_to_end(data_hash)
+            return handle
+
+    def from_upload(self, uploaded_file):
+        """
+        Handle ของไฟล์ที่อัปโหลด (Hash + เขียนลงดิสก์ + เปิดเอกสาร ครั้งเดียวต่อไฟล์)
+        อ่านผ่าน getbuffer() จึงไม่ขึ้นกับตำแหน่ง read() ของ UploadedFile และไม่ copy ข้อมูล
+        """
+        with self._lock:
+            data_hash = self._upload_hashes.get(uploaded_file.file_id)
+        if data_hash:
+            handle = self.get(data_hash)
+            if handle is not None:
+                return handle
+
+        buffer = uploaded_file.getbuffer()
+        data_hash = hashlib.sha256(buffer).hexdigest()
+        with self._lock:
+            self._upload_hashes[uploaded_file.file_id] = data_hash
+            while len(self._upload_hashes) > MAX_UPLOAD_IDS:
+                self._upload_hashes.popitem(last=False)
+        return self.from_buffer(buffer, data_hash)
+
+    def from_buffer(self, buffer, data_hash=None):
+        """Handle จาก bytes / memoryview (ใช้ Handle เดิมถ้าเคยเปิดไฟล์นี้แล้ว)"""
+        data_hash = data_hash or hashlib.sha256(buffer).hexdigest()
+        handle = self.get(data_hash)
+        if handle is not None:
+            return handle
+
+        path = os.path.join(self.temp_dir, f"{data_hash}.pdf")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer)
+        os.replace(tmp_path, path)
+        handle = DocumentHandle(data_hash, path)
+
+        evicted = []
+        with self._lock:
+            existing = self._handles.get(data_hash)
+            if existing is not None:
+                # อีก Thread เปิดไฟล์เดียวกันไปก่อนแล้ว
+                self._handles.move_to_end(data_hash)
+                return existing
+            self._handles[data_hash] = handle
+            self.total_bytes += handle.size
+            while len(self._handles) > 1 and (len(self._handles) > self.max_docs or self.total_bytes > self.max_bytes):
+                _, old = self._handles.popitem(last=False)
+                self.total_bytes -= old.size
+                evicted.append(old)
+        for old in evicted:
+            old.close()
+        return handle
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_document_cache():
+    """Cache ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = DocumentCache()
+        return _shared_cache
@@ -0,0 +1,53 @@
+from docx import Document
+import io
+from modules.services.table_export import write_tables_xlsx
+
+# สร้างไฟล์ Word / Excel จากผล OCR (ใช้ร่วมกันระหว่างหน้าเว็บกับ batch_convert.py)
+
+def create_word_docx(text_list):
+    doc = Document()
+    for i, text in enumerate(text_list):
+        doc.add_heading(f'Page {i+1}', level=1)
+        doc.add_paragraph(text)
+        doc.add_page_break()
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def ocr_tables(all_pages_tables):
+    """(หน้า, ตารางที่, ตาราง) ของทุกตารางในผล OCR สำหรับ write_tables_xlsx / excel_limit_warnings"""
+    return (
+        (page_idx + 1, table_idx + 1, csv_data)
+        for page_idx, page_tables in enumerate(all_pages_tables)
+        for table_idx, csv_data in enumerate(page_tables)
+    )
+
+def create_excel_from_tables(all_pages_tables, single_sheet=False, warnings=None):
+    """
+    all_pages_tables: list ของ list (แต่ละหน้าอาจมีหลายตาราง)
+    Format: [ [table1_p1, table2_p1], [table1_p2], ... ]
+    single_sheet=True: รวมทุกตารางไว้ Sheet เดียว (มีคอลัมน์หน้า/ตาราง) แทน 1 ตาราง = 1 Sheet (P1_Table1)
+    warnings: (ไม่บังคับ) list รับข้อความเตือนเมื่อตารางเกินขีดจำกัดของ Excel
+    """
+    return write_tables_xlsx(ocr_tables(all_pages_tables), single_sheet=single_sheet, empty_message="ไม่พบตารางในเอกสาร", warnings=warnings)
+
+def create_doc_from_results(results):
+    """สร้าง Word จาก List ของข้อความ"""
+    doc = Document()
+    for text in results:
+        doc.add_paragraph(text)
+        doc.add_page_break()
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def create_excel_from_results(csv_results, single_sheet=False, warnings=None):
+    """
+    สร้าง Excel จาก List ของ CSV String (แยก Sheet ตามหน้า)
+    single_sheet=True: รวมทุกหน้าไว้ Sheet เดียว (มีคอลัมน์บอกหน้า)
+    warnings: (ไม่บังคับ) list รับข้อความเตือนเมื่อตารางเกินขีดจำกัดของ Excel
+    """
+    tables = ((i + 1, 1, csv_text) for i, csv_text in enumerate(csv_results))
+    return write_tables_xlsx(tables, single_sheet=single_sheet, sheet_name=lambda page, table: f"Page_{page}", warnings=warnings)
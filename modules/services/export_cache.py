@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+
+# ไฟล์ผลลัพธ์ (Word/Excel) ที่สร้างแล้ว เก็บตาม Fingerprint ของเนื้อหา
+# สร้างใหม่เฉพาะเมื่อเนื้อหาเปลี่ยนจริง (เช่นแก้ข้อความบางหน้า) ไม่ใช่ทุก Rerun
+MAX_EXPORT_BYTES = int(os.environ.get("SMART_DOC_EXPORT_CACHE_MB", "128")) * 1024 * 1024
+
+def text_fingerprint(text):
+    """Hash ของข้อความ 1 หน้า (เก็บไว้รายหน้า จะได้ Hash ใหม่เฉพาะหน้าที่ถูกแก้)"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def tables_fingerprint(tables):
+    """Hash ของตารางทุกหน้า (list ของ list ตาราง: CSV String หรือ list ของแถว)"""
+    h = hashlib.sha256()
+    for page_tables in tables:
+        for table in page_tables:
+            data = table if isinstance(table, str) else json.dumps(table, ensure_ascii=False)
+            h.update(data.encode("utf-8"))
+            h.update(b"\0")
+        h.update(b"\1")
+    return h.hexdigest()
+
+def combine_fingerprints(fingerprints):
+    """รวม Hash รายหน้าเป็น Fingerprint ของทั้งเอกสาร"""
+    return hashlib.sha256("".join(fingerprints).encode("ascii")).hexdigest()
+
+class ExportCache:
+    """LRU ของไฟล์ผลลัพธ์ (bytes) ตาม (ชนิด, Fingerprint) จำกัดขนาดรวมเป็น bytes"""
+    def __init__(self, max_bytes=MAX_EXPORT_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._items[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get_or_build(self, key, build_fn):
+        """
+        คืนไฟล์จาก Cache หรือเรียก build_fn() (คืน bytes) แล้วเก็บไว้
+        กดดาวน์โหลดซ้ำพร้อมกันจะสร้างแค่ครั้งเดียว
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        with build_lock:
+            data = self.get(key)
+            if data is None:
+                data = build_fn()
+                self.put(key, data)
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return data
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_export_cache():
+    """Cache ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ExportCache()
+        return _shared_cache
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+# Backend จำลองสำหรับ Load Test / Benchmark แบบ Offline
+# ผลลัพธ์, Latency และ Error ขึ้นกับเนื้อหาของคำขอเท่านั้น (รันซ้ำได้ผลเดิม ไม่ขึ้นกับลำดับของ Thread)
+
+_PAGE_MARKER = re.compile(r"^\[\[PAGE (\d+)\]\]$")
+
+class FakeQuotaError(Exception):
+    pass
+
+class FakeServerError(Exception):
+    pass
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeResponse:
+    """หน้าตาเหมือน Response ของ Gemini: มี .text และวนลูปเป็น Chunk ได้ (โหมด Stream)"""
+    def __init__(self, text, chunk_chars=None, chunk_delay=0.0):
+        self.text = text
+        self._chunk_chars = chunk_chars
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self):
+        size = self._chunk_chars or len(self.text) or 1
+        for start in range(0, len(self.text), size):
+            if self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield FakeChunk(self.text[start:start + size])
+
+def _fraction(*parts):
+    """ค่า 0-1 แบบกำหนดได้จาก parts (ใช้แทน random)"""
+    digest = hashlib.sha256("\0".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+def _part_digest(part):
+    if isinstance(part, dict):
+        return hashlib.sha256(part.get("data", b"")).hexdigest()
+    if isinstance(part, (bytes, bytearray)):
+        return hashlib.sha256(part).hexdigest()
+    if hasattr(part, "tobytes"):  # PIL Image
+        return hashlib.sha256(f"{part.mode}{part.size}".encode() + part.tobytes()).hexdigest()
+    return hashlib.sha256(str(part).encode("utf-8")).hexdigest()
+
+class FakeBackend:
+    """
+    Backend จำลอง
+    - latency: เวลาตอบกลับต่อคำขอ (วินาที) ± jitter, บวก per_image_latency ต่อภาพ 1 ภาพ
+    - error_rate: โอกาสตอบ 503 (transient) | quota_rate: โอกาสตอบ 429
+    - stream: แบ่งคำตอบเป็น Chunk ละ chunk_chars ตัวอักษร ห่างกัน chunk_delay วินาที
+    """
+    name = "fake"
+
+    def __init__(self, latency=0.5, jitter=0.2, per_image_latency=0.1, error_rate=0.0, quota_rate=0.0,
+                 page_lines=20, chunk_chars=40, chunk_delay=0.02, rpm=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.per_image_latency = per_image_latency
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.page_lines = page_lines
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.rpm = rpm
+        self.seed = seed
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(
+            latency=float(env("SMART_DOC_FAKE_LATENCY", "0.5")),
+            error_rate=float(env("SMART_DOC_FAKE_ERROR_RATE", "0")),
+            quota_rate=float(env("SMART_DOC_FAKE_429_RATE", "0")),
+            rpm=int(env("SMART_DOC_FAKE_RPM", "0")) or None,
+            seed=int(env("SMART_DOC_FAKE_SEED", "0")),
+        )
+
+    def list_models(self, api_key):
+        return ["models/fake-flash", "models/fake-pro"]
+
+    def generate(self, api_key, model_name, content, stream=False, generation_config=None):
+        parts = content if isinstance(content, (list, tuple)) else [content]
+        digests = [_part_digest(p) for p in parts]
+        request_key = hashlib.sha256("".join(digests).encode()).hexdigest()
+        image_count = sum(1 for p in parts if not isinstance(p, str))
+
+        # ครั้งที่เท่าไรของคำขอเดิม (Retry ของคำขอเดียวกันจะได้ผลสุ่มใหม่ แต่ยังกำหนดได้)
+        with self._lock:
+            attempt = self._attempts.get(request_key, 0)
+            self._attempts[request_key] = attempt + 1
+
+        roll = _fraction(self.seed, request_key, attempt)
+        if roll < self.quota_rate:
+            time.sleep(self.latency * 0.1)
+            raise FakeQuotaError("429 Resource has been exhausted (fake backend)")
+
+        delay = self.latency + self.jitter * (2 * _fraction(self.seed, request_key, "latency") - 1)
+        time.sleep(max(0.0, delay) + self.per_image_latency * image_count)
+        if roll < self.quota_rate + self.error_rate:
+            raise FakeServerError("503 Service Unavailable (fake backend)")
+
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            text = self._structured_answer([d for p, d in zip(parts, digests) if not isinstance(p, str)])
+        else:
+            text = self._answer(parts, digests)
+        if stream:
+            return FakeResponse(text, self.chunk_chars, self.chunk_delay)
+        return FakeResponse(text)
+
+    def _answer(self, parts, digests):
+        prompt = "\n".join(p for p in parts if isinstance(p, str))
+
+        # งานตรวจทาน: คืนข้อความเดิม (ตัดช่องว่างซ้ำ)
+        if "Text to correct:" in prompt:
+            original = prompt.split("Text to correct:", 1)[1]
+            return re.sub(r"[ \t]+", " ", original).strip()
+
+        with_table = "[[TABLE]]" in prompt
+        csv_only = "CSV format (Comma Separated Values)" in prompt
+
+        # คำขอแบบรวมหลายหน้า: ตอบตาม Marker [[PAGE n]]
+        pages = []
+        current = None
+        for part, digest in zip(parts, digests):
+            if isinstance(part, str):
+                match = _PAGE_MARKER.match(part.strip())
+                current = match.group(1) if match else current
+            else:
+                pages.append((current, digest))
+
+        bodies = [self._page_body(digest, with_table, csv_only) for _, digest in pages]
+        if len(pages) > 1 and all(marker for marker, _ in pages):
+            return "\n".join(f"[[PAGE {marker}]]\n{body}" for (marker, _), body in zip(pages, bodies))
+        return "\n".join(bodies)
+
+    def _structured_answer(self, image_digests):
+        """โหมด JSON (response_schema ของ OCR): ย่อหน้า + ตาราง (เฉพาะภาพที่ Hash ขึ้นต้นด้วยเลขคู่)"""
+        blocks = []
+        for digest in image_digests:
+            blocks.append({"type": "heading", "text": f"หน้าจำลอง {digest[:8]}"})
+            blocks += [{"type": "paragraph", "text": f"บรรทัดที่ {i} ข้อความทดสอบภาษาไทยสำหรับวัดประสิทธิภาพ {digest[i % 32:i % 32 + 6]}"}
+                       for i in range(1, self.page_lines + 1)]
+            if int(digest[0], 16) % 2 == 0:
+                blocks.append({"type": "table", "rows": [["ลำดับ", "รายการ"], ["1", "ทดสอบ, มีจุลภาค"], ["2", "ตัวอย่าง"]]})
+        return json.dumps({"blocks": blocks}, ensure_ascii=False)
+
+    def _page_body(self, digest, with_table, csv_only):
+        if csv_only:
+            rows = ["ลำดับ,รายการ,จำนวน"] + [f"{i},รายการ {digest[i % 32:i % 32 + 4]},{i * 10}" for i in range(1, self.page_lines + 1)]
+            return "\n".join(rows)
+        lines = [f"หน้าจำลอง {digest[:8]}"]
+        lines += [f"บรรทัดที่ {i} ข้อความทดสอบภาษาไทยสำหรับวัดประสิทธิภาพ {digest[i % 32:i % 32 + 6]}" for i in range(1, self.page_lines + 1)]
+        if with_table:
+            lines += ["[[TABLE]]", "ลำดับ,รายการ", "1,ทดสอบ", "2,ตัวอย่าง", "[[/TABLE]]"]
+        return "\n".join(lines)
@@ -1,14 +1,17 @@
 import fitz  # PyMuPDF
 from docx import Document
+from modules.services.page_source import FITZ_LOCK
 import io
 
 def extract_text_from_pdf(file_bytes):
     """อ่านข้อความจากไฟล์ PDF"""
     try:
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text() + "\n"
+        with FITZ_LOCK:
+            doc = fitz.open(stream=file_bytes, filetype="pdf")
+            text = ""
+            for page in doc:
+                text += page.get_text() + "\n"
+            doc.close()
         return text
     except Exception as e:
         return f"Error reading PDF: {e}"
@@ -0,0 +1,65 @@
+from PIL import Image
+import io
+import statistics
+
+# --- ชุดการตั้งค่าบีบอัดภาพก่อนส่ง AI ---
+# grayscale: แปลงเป็นขาวดำ | format: PNG/JPEG/WEBP | quality: คุณภาพ (JPEG/WEBP) | max_dim: ด้านยาวสุด (px)
+ENCODING_PRESETS = {
+    "original": {"grayscale": False, "format": "PNG", "quality": None, "max_dim": None},
+    "balanced": {"grayscale": False, "format": "JPEG", "quality": 85, "max_dim": 2000},
+    "gray": {"grayscale": True, "format": "JPEG", "quality": 75, "max_dim": 2000},
+    "small": {"grayscale": True, "format": "WEBP", "quality": 60, "max_dim": 1600},
+}
+DEFAULT_PRESET = "balanced"
+
+PRESET_LABELS = {
+    "original": "ต้นฉบับ (PNG สี - ใหญ่สุด)",
+    "balanced": "สมดุล (JPEG 85, สูงสุด 2000px)",
+    "gray": "ขาวดำ (JPEG 75)",
+    "small": "เล็กสุด (WebP 60 ขาวดำ, 1600px)",
+}
+
+_MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+def encode_image(image, settings):
+    """
+    บีบอัด PIL Image ตาม settings
+    Return: dict {"mime_type", "data"} (รูปแบบ Blob ที่ Gemini รับได้โดยตรง)
+    """
+    img = image
+    max_dim = settings.get("max_dim")
+    if max_dim and max(img.size) > max_dim:
+        scale = max_dim / max(img.size)
+        img = img.resize((round(img.width * scale), round(img.height * scale)), Image.LANCZOS)
+
+    if settings.get("grayscale"):
+        img = img.convert("L")
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    fmt = settings.get("format", "PNG").upper()
+    buffer = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buffer, format="PNG", optimize=False)
+    else:
+        img.save(buffer, format=fmt, quality=settings.get("quality") or 85)
+
+    return {"mime_type": _MIME_TYPES[fmt], "data": buffer.getvalue()}
+
+def choose_dpi(page, base_dpi=150, min_dpi=100, max_dpi=220):
+    """
+    เลือก DPI ตามขนาดตัวอักษรใน Text Layer (Adaptive DPI)
+    ตัวเล็กให้ DPI สูงขึ้น ตัวใหญ่ลด DPI ได้ | ไม่มี Text Layer (หน้าสแกน) ใช้ base_dpi
+    """
+    sizes = []
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                if span.get("text", "").strip():
+                    sizes.append(span.get("size", 0))
+    if not sizes:
+        return base_dpi
+
+    # อ้างอิง: ตัวอักษร 11pt ที่ base_dpi อ่านได้ชัดพอสำหรับภาษาไทย
+    dpi = base_dpi * 11 / max(statistics.median(sizes), 1)
+    return int(min(max(dpi, min_dpi), max_dpi))
@@ -0,0 +1,157 @@
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import os
+import threading
+import time
+
+# จำนวนงานเบื้องหลังที่รันพร้อมกันทั้ง Process (งานที่เกินจะรอคิว)
+MAX_CONCURRENT_JOBS = 2
+# เก็บงานที่เสร็จแล้วไว้ต่อผู้ใช้ได้สูงสุดกี่งาน
+MAX_FINISHED_PER_OWNER = 10
+# ผลลัพธ์ของงานที่เสร็จแล้ว (อาจมีไฟล์ PDF ทั้งไฟล์) เก็บไว้นานเท่าไร และรวมทุกผู้ใช้ได้กี่งาน
+# (Session ที่ปิดไปแล้วไม่มีใครมาลบงานของตัวเอง จึงต้องล้างจากฝั่ง Runner)
+FINISHED_JOB_TTL = int(os.environ.get("SMART_DOC_JOB_TTL_MINUTES", "60")) * 60
+MAX_FINISHED_JOBS = int(os.environ.get("SMART_DOC_MAX_FINISHED_JOBS", "50"))
+
+STATUS_LABELS = {
+    "queued": "⏳ รอคิว",
+    "running": "⚙️ กำลังทำงาน",
+    "done": "✅ เสร็จแล้ว",
+    "failed": "❌ ล้มเหลว",
+    "cancelled": "🚫 ยกเลิกแล้ว",
+}
+
+class BackgroundJob:
+    """
+    งาน 1 ชิ้นที่รันนอก Script ของ Streamlit
+    มีเมธอด progress() / markdown() / empty() หน้าตาเหมือน st.progress และ st.empty
+    จึงส่งแทน progress_bar / stream_box ให้ฟังก์ชันเดิมได้เลย
+    """
+    def __init__(self, job_id, owner, kind, title, resource=None):
+        self.id = job_id
+        self.owner = owner
+        self.kind = kind
+        self.title = title
+        self.resource = resource
+        self.status = "queued"
+        self.fraction = 0.0
+        self.message = ""
+        self.preview = ""
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.created = time.time()
+        self.finished = None
+
+    # --- ใช้แทน st.progress ---
+    def progress(self, value, text=None):
+        self.fraction = float(value)
+        if text:
+            self.message = text
+
+    # --- ใช้แทน st.empty (Live Preview) ---
+    def markdown(self, body, **kwargs):
+        self.preview = body
+
+    def empty(self):
+        self.preview = ""
+
+    @property
+    def is_finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+class JobRunner:
+    """คิวงานเบื้องหลังแบบ Thread (ใช้ร่วมกันทุก Session, แยกงานตาม owner)"""
+    def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="smartdoc-job")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, owner, kind, title, fn, *args, resource=None, **kwargs):
+        """
+        ส่งงานเข้าคิว: fn(job, *args, **kwargs) -> ผลลัพธ์
+        resource: (ไม่บังคับ) ชื่อสิ่งที่งานนี้ใช้อยู่ (เช่น Job ID ของ Checkpoint OCR) ดูได้จาก is_busy()
+        Return: job_id
+        """
+        with self._lock:
+            job = BackgroundJob(f"{kind}-{next(self._ids)}", owner, kind, title, resource)
+            self._jobs[job.id] = job
+            self._sweep()
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.status = "cancelled"
+            job.finished = time.time()
+            return
+        job.status = "running"
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+            job.fraction = 1.0
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        job.finished = time.time()
+
+    def cancel(self, job_id):
+        """ยกเลิกได้เฉพาะงานที่ยังรอคิวอยู่"""
+        job = self._jobs.get(job_id)
+        if job and job.status == "queued":
+            job.cancel_requested = True
+            return True
+        return False
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def is_busy(self, resource):
+        """มีงานที่ยังรอคิว/กำลังทำงาน ใช้ resource นี้อยู่หรือไม่ (ทุกผู้ใช้)"""
+        with self._lock:
+            return any(j.resource == resource and not j.is_finished for j in self._jobs.values())
+
+    def list_jobs(self, owner, kind=None):
+        """งานของผู้ใช้คนนี้ (ล่าสุดก่อน)"""
+        with self._lock:
+            self._sweep()
+            jobs = [j for j in self._jobs.values() if j.owner == owner and (kind is None or j.kind == kind)]
+        return sorted(jobs, key=lambda j: j.created, reverse=True)
+
+    def remove(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.is_finished:
+                del self._jobs[job_id]
+
+    def _sweep(self):
+        """
+        ลบงานที่เสร็จแล้วของทุกผู้ใช้ (เรียกภายใต้ lock ตอนส่งงานและตอนเช็คสถานะ)
+        - เสร็จมานานเกิน FINISHED_JOB_TTL
+        - เกินโควต้าต่อผู้ใช้ (MAX_FINISHED_PER_OWNER) หรือเกินเพดานรวม (MAX_FINISHED_JOBS) ลบงานเก่าก่อน
+        """
+        cutoff = time.time() - FINISHED_JOB_TTL
+        finished = sorted(
+            (j for j in self._jobs.values() if j.is_finished),
+            key=lambda j: j.created, reverse=True
+        )
+        per_owner = {}
+        kept = 0
+        for job in finished:
+            per_owner[job.owner] = per_owner.get(job.owner, 0) + 1
+            if (job.finished or 0) < cutoff or per_owner[job.owner] > MAX_FINISHED_PER_OWNER or kept >= MAX_FINISHED_JOBS:
+                del self._jobs[job.id]
+            else:
+                kept += 1
+
+_shared_runner = None
+_shared_lock = threading.Lock()
+
+def get_job_runner():
+    """Runner ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_runner
+    with _shared_lock:
+        if _shared_runner is None:
+            _shared_runner = JobRunner()
+        return _shared_runner
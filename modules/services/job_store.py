@@ -0,0 +1,195 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# ที่เก็บ Checkpoint ของงาน OCR (เปลี่ยนได้ผ่าน Environment Variable)
+JOBS_DIR = os.environ.get("SMART_DOC_JOBS_DIR", os.path.join(os.path.expanduser("~"), ".cache", "smart_document", "jobs"))
+JOB_TTL_DAYS = 7
+# Lease ของงานที่กำลังรัน: ต่ออายุทุกครั้งที่บันทึกหน้า ถ้าไม่ถูกแตะนานเกินนี้ถือว่าตัวที่รันตายไปแล้ว
+LEASE_SECONDS = 600
+
+class JobBusyError(RuntimeError):
+    """มีตัวอื่นกำลังรันงานนี้อยู่ (ใช้ Checkpoint เดียวกัน)"""
+
+def file_hash(data):
+    """SHA-256 ของไฟล์ที่อัปโหลด (ใช้จับคู่ไฟล์เดิมเพื่อ Resume)"""
+    return hashlib.sha256(data).hexdigest()
+
+def make_job_id(data_hash, model_name, page_numbers, options=None):
+    """
+    Job ID = ไฟล์เดิม + โมเดลเดิม + ชุดหน้าเดิม + ตัวเลือกที่มีผลต่อผลลัพธ์
+    options: dict ที่แปลงเป็น JSON ได้ (เช่น Prompt, โหมด JSON, การบีบอัดภาพ, จำนวนหน้าต่อ Request)
+    เปลี่ยนตัวเลือกเหล่านี้ = งานใหม่ ไม่ใช้ Checkpoint ของงานเดิมที่ได้ผลคนละแบบ
+    """
+    h = hashlib.sha256()
+    h.update(data_hash.encode())
+    h.update(b"\0" + model_name.encode("utf-8"))
+    h.update(b"\0" + ",".join(map(str, page_numbers)).encode())
+    if options:
+        h.update(b"\0" + json.dumps(options, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return h.hexdigest()[:32]
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+class OcrJobStore:
+    """
+    เก็บผล OCR รายหน้าลงดิสก์ทันทีที่เสร็จ (Checkpoint)
+    โครงสร้าง: <jobs_dir>/<job_id>/meta.json + pages/<ลำดับ>.json
+    """
+    def __init__(self, jobs_dir=JOBS_DIR):
+        self.jobs_dir = jobs_dir
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def create(self, job_id, meta):
+        """สร้างงานใหม่ (ถ้ามีอยู่แล้วจะใช้ของเดิม เพื่อให้ทำต่อจาก Checkpoint ได้)"""
+        pages_dir = os.path.join(self._job_dir(job_id), "pages")
+        os.makedirs(pages_dir, exist_ok=True)
+        meta_path = os.path.join(self._job_dir(job_id), "meta.json")
+        if not os.path.exists(meta_path):
+            meta = dict(meta, job_id=job_id, created=time.time(), completed=False)
+            _write_json(meta_path, meta)
+        return self.load_meta(job_id)
+
+    def load_meta(self, job_id):
+        try:
+            with open(os.path.join(self._job_dir(job_id), "meta.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def mark_completed(self, job_id):
+        meta = self.load_meta(job_id)
+        if meta:
+            meta["completed"] = True
+            _write_json(os.path.join(self._job_dir(job_id), "meta.json"), meta)
+
+    def save_page(self, job_id, position, text, tables):
+        """บันทึกผล 1 หน้า (เรียกจาก worker thread ได้) และต่ออายุ Lease"""
+        path = os.path.join(self._job_dir(job_id), "pages", f"{position}.json")
+        _write_json(path, {"text": text, "tables": tables})
+        try:
+            os.utime(self._lease_path(job_id))
+        except OSError:
+            pass
+
+    def _lease_path(self, job_id):
+        return os.path.join(self._job_dir(job_id), "running.lock")
+
+    def is_running(self, job_id):
+        """มีตัวที่กำลังรันงานนี้อยู่ (Lease ยังไม่หมดอายุ)"""
+        try:
+            return time.time() - os.path.getmtime(self._lease_path(job_id)) < LEASE_SECONDS
+        except OSError:
+            return False
+
+    def acquire(self, job_id):
+        """จองสิทธิ์รันงาน (สร้างไฟล์ Lease แบบ Atomic) | Raise: JobBusyError ถ้ามีตัวอื่นรันอยู่"""
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        path = self._lease_path(job_id)
+        if os.path.exists(path) and not self.is_running(job_id):
+            # Lease หมดอายุ (ตัวที่รันเดิมตายไป) ลบทิ้งแล้วจองใหม่
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise JobBusyError("งาน OCR นี้กำลังทำงานอยู่ (เช่น ในงานเบื้องหลัง) - รอให้เสร็จก่อน")
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+
+    def release(self, job_id):
+        try:
+            os.remove(self._lease_path(job_id))
+        except OSError:
+            pass
+
+    @contextmanager
+    def lease(self, job_id):
+        """with store.lease(job_id): ... = acquire() ตอนเข้า และ release() ตอนออก (แม้เกิด Error)"""
+        self.acquire(job_id)
+        try:
+            yield
+        finally:
+            self.release(job_id)
+
+    def load_pages(self, job_id):
+        """Return: dict {ลำดับหน้าในงาน: {"text", "tables"}} เฉพาะหน้าที่เสร็จแล้ว"""
+        pages_dir = os.path.join(self._job_dir(job_id), "pages")
+        pages = {}
+        if not os.path.isdir(pages_dir):
+            return pages
+        for name in os.listdir(pages_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(pages_dir, name), "r", encoding="utf-8") as f:
+                    pages[int(name[:-5])] = json.load(f)
+            except (OSError, ValueError):
+                continue  # ไฟล์เสีย ถือว่ายังไม่เสร็จ
+        return pages
+
+    def find_unfinished(self, data_hash):
+        """งานที่ยังไม่เสร็จของไฟล์นี้ (ล่าสุดก่อน) พร้อมจำนวนหน้าที่ทำไปแล้ว"""
+        self.prune()
+        jobs = []
+        for job_id in os.listdir(self.jobs_dir):
+            meta = self.load_meta(job_id)
+            if not meta or meta.get("completed") or meta.get("file_hash") != data_hash:
+                continue
+            meta["done"] = len(self.load_pages(job_id))
+            meta["running"] = self.is_running(job_id)
+            jobs.append(meta)
+        return sorted(jobs, key=lambda m: m.get("created", 0), reverse=True)
+
+    def reset(self, job_id):
+        """ล้างผลเดิมของงาน (meta + หน้าที่เสร็จแล้ว) แต่คง Lease ไว้ ใช้ตอนสั่งรันงานที่เคยเสร็จแล้วซ้ำ"""
+        shutil.rmtree(os.path.join(self._job_dir(job_id), "pages"), ignore_errors=True)
+        try:
+            os.remove(os.path.join(self._job_dir(job_id), "meta.json"))
+        except OSError:
+            pass
+
+    def delete(self, job_id):
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def prune(self, ttl_days=JOB_TTL_DAYS):
+        """ลบงานที่เก่ากว่า ttl_days"""
+        cutoff = time.time() - ttl_days * 86400
+        for job_id in os.listdir(self.jobs_dir):
+            if self.is_running(job_id):
+                continue
+            meta = self.load_meta(job_id)
+            if meta is not None:
+                created = meta.get("created", 0)
+            else:
+                # โฟลเดอร์ที่ไม่มี meta (อาจกำลังสร้างอยู่) ดูจากเวลาแก้ไขแทน
+                try:
+                    created = os.path.getmtime(self._job_dir(job_id))
+                except OSError:
+                    continue
+            if created < cutoff:
+                self.delete(job_id)
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+def get_job_store():
+    """Store ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = OcrJobStore()
+        return _shared_store
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+
+# ที่เก็บ Cache บนดิสก์ (เปลี่ยนได้ผ่าน Environment Variable)
+CACHE_DIR = os.environ.get("SMART_DOC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "smart_document", "ocr"))
+MAX_CACHE_BYTES = int(os.environ.get("SMART_DOC_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+class CacheStats:
+    """นับ Hit/Miss ของการรันแต่ละครั้ง (ปลอดภัยเมื่อเรียกจากหลาย Thread) | unit: หน่วยที่แสดงในสรุป"""
+    def __init__(self, unit="หน้า"):
+        self.unit = unit
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def summary(self):
+        return f"♻️ ใช้ผลจาก Cache {self.hits} {self.unit} | ส่ง AI ใหม่ {self.misses} {self.unit}"
+
+class OcrCache:
+    """
+    Cache ผล OCR บนดิสก์ แบบ Content-addressed
+    Key = SHA-256 ของ (ภาพหน้าเอกสาร + ชื่อโมเดล + Prompt)
+    เกินขนาดที่กำหนดจะลบไฟล์ที่ถูกใช้ล่าสุดนานที่สุดออกก่อน (LRU ตาม mtime)
+    ขนาดรวมนับสะสมไว้ในหน่วยความจำ (สแกนโฟลเดอร์ครั้งแรกครั้งเดียว) สแกนใหม่เฉพาะตอนเกินขนาดและต้องลบ
+    """
+    # ลบจนเหลือสัดส่วนนี้ของ max_bytes (เผื่อที่ไว้ จะได้ไม่ต้องสแกนทุกครั้งที่เขียนตอนใกล้เต็ม)
+    EVICT_TARGET = 0.9
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # None = ยังไม่ได้สแกน
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image, model_name, prompt):
+        h = hashlib.sha256()
+        if isinstance(image, dict):
+            # ภาพที่บีบอัดแล้ว (Blob จาก encode_image)
+            h.update(image["mime_type"].encode())
+            h.update(image["data"])
+        elif isinstance(image, (bytes, bytearray)):
+            h.update(image)
+        else:
+            # PIL Image: ใช้ขนาด + mode + pixel ดิบ
+            h.update(f"{image.mode}:{image.size}".encode())
+            h.update(image.tobytes())
+        h.update(b"\0" + model_name.encode("utf-8"))
+        h.update(b"\0" + prompt.encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)  # แตะเวลาไว้ เพื่อให้เป็นรายการล่าสุดตาม LRU
+            return text
+        except OSError:
+            return None
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            new_size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += new_size - old_size
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _scan(self):
+        """รายการ (mtime, ขนาด, path) ของทุกไฟล์ใน Cache"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st_ = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st_.st_mtime, st_.st_size, path))
+        return entries
+
+    def _evict(self):
+        """ลบไฟล์เก่าสุดจนกว่าขนาดรวมจะไม่เกิน EVICT_TARGET ของ max_bytes (สแกนจริงอีกครั้ง เผื่อมี Process อื่นเขียนด้วย)"""
+        with self._lock:
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                target = self.max_bytes * self.EVICT_TARGET
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            self._total_bytes = total
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_ocr_cache():
+    """คืน Cache ตัวเดียวที่ใช้ร่วมกันทั้ง Process (ทุก Session)"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = OcrCache()
+        return _shared_cache
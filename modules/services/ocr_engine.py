@@ -0,0 +1,174 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import queue
+import threading
+import time
+
+# จำนวนงานที่ยิง AI พร้อมกันโดยปริยาย (ปรับได้จากหน้า UI)
+DEFAULT_WORKERS = 4
+MAX_WORKERS = 16
+# จำนวน Thread สำหรับบีบอัดภาพในขั้น encode ของ Pipeline (PIL ปล่อย GIL ระหว่าง Encode)
+ENCODE_WORKERS = 2
+
+def run_concurrent(task_fn, items, max_workers=DEFAULT_WORKERS, on_progress=None, return_exceptions=False):
+    """
+    รัน task_fn กับทุก item ด้วย Thread Pool แบบจำกัดจำนวน worker
+    - items เป็น list หรือ generator ก็ได้ (ดึงทีละชิ้นเมื่อมีคิวว่าง ไม่โหลดล่วงหน้าทั้งหมด)
+    - on_progress(done, total) ถูกเรียกจาก thread หลักทุกครั้งที่เสร็จ 1 งาน (total = None ถ้าไม่รู้จำนวน)
+    - return_exceptions=True: งานที่ Error จะคืน Exception object แทนผลลัพธ์ (งานอื่นทำต่อได้)
+    Return: list ผลลัพธ์ เรียงตามลำดับ items เดิมเสมอ
+    """
+    max_workers = max(1, min(int(max_workers), MAX_WORKERS))
+    total = len(items) if hasattr(items, '__len__') else None
+    source = iter(enumerate(items))
+    results = {}
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def submit_next():
+            # ดึงงานถัดไปจาก items (ทำใน thread หลัก เพราะ fitz ไม่ thread-safe)
+            try:
+                idx, item = next(source)
+            except StopIteration:
+                return False
+            pending[pool.submit(task_fn, item)] = idx
+            return True
+
+        # เติมคิวไว้ 2 เท่าของ worker เพื่อไม่ให้ thread ว่าง แต่ก็ไม่ถือของในหน่วยความจำมากเกินไป
+        while len(pending) < max_workers * 2 and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                error = future.exception()
+                if error is not None and not return_exceptions:
+                    raise error
+                results[idx] = error if error is not None else future.result()
+                if on_progress:
+                    on_progress(len(results), total)
+                submit_next()
+
+    return [results[i] for i in range(len(results))]
+
+# --- PIPELINE: แยกงานเป็นขั้น (render -> encode -> upload -> parse) ให้ทำงานซ้อนกัน ---
+# ระหว่างหน้า N รอ AI อยู่ หน้า N+1 ก็ถูก Render/บีบอัดไปพร้อมกัน
+DEFAULT_QUEUE_SIZE = 4
+_STOP = object()
+
+class StageTimings:
+    """เวลาที่ใช้จริงของแต่ละขั้น (รวมทุก worker) ใช้ร่วมกันข้าม Thread ได้"""
+    def __init__(self):
+        self.busy = {}
+        self.counts = {}
+        self.workers = {}
+        self.wall = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.busy[stage] = self.busy.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def as_dict(self):
+        """{ขั้น: {"seconds", "count", "avg_ms", "utilization"}} + เวลารวม"""
+        stats = {"wall_seconds": self.wall}
+        for stage, busy in self.busy.items():
+            count = self.counts[stage]
+            capacity = self.wall * self.workers.get(stage, 1)
+            stats[stage] = {
+                "seconds": busy,
+                "count": count,
+                "avg_ms": busy / count * 1000,
+                "utilization": busy / capacity if capacity else 0.0,
+            }
+        return stats
+
+    def summary(self):
+        parts = [f"{stage} {busy / self.counts[stage] * 1000:.0f} ms/หน้า" for stage, busy in self.busy.items()]
+        return f"⏱️ ใช้เวลารวม {self.wall:.1f}s | " + " | ".join(parts)
+
+def run_pipeline(items, stages, queue_size=DEFAULT_QUEUE_SIZE, on_progress=None, timings=None):
+    """
+    ส่ง items ผ่านหลายขั้นต่อกัน โดยแต่ละขั้นมี Thread ของตัวเองและคั่นด้วยคิวแบบจำกัดขนาด
+    - stages: list ของ (ชื่อขั้น, fn, จำนวน worker) ผลของขั้นก่อนเป็น input ของขั้นถัดไป
+      (ขั้นที่แตะ fitz ต้องใช้ worker = 1 เพราะ fitz ไม่ thread-safe)
+    - item ที่ Error จะถูกส่งต่อเป็น Exception object โดยข้ามขั้นที่เหลือ (งานอื่นทำต่อได้)
+    - on_progress(done, total) ถูกเรียกจาก thread ที่เรียกฟังก์ชันนี้ เมื่อ item ผ่านขั้นสุดท้าย
+    - timings: StageTimings (ไม่บังคับ) สำหรับเก็บเวลาของแต่ละขั้น
+    Return: list ผลลัพธ์ (หรือ Exception) เรียงตามลำดับ items เดิม
+    """
+    total = len(items) if hasattr(items, '__len__') else None
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages] + [queue.Queue()]
+    remaining_workers = [max(1, int(workers)) for _, _, workers in stages]
+    counter_lock = threading.Lock()
+    if timings:
+        for name, _, workers in stages:
+            timings.workers[name] = max(1, int(workers))
+
+    def feed():
+        try:
+            for idx, item in enumerate(items):
+                queues[0].put((idx, item))
+        except Exception as e:
+            # items เองพัง (เช่น generator Error): แจ้งเป็นผลลัพธ์ลำดับถัดไปแล้วหยุดป้อน
+            queues[0].put((None, e))
+        for _ in range(remaining_workers[0]):
+            queues[0].put(_STOP)
+
+    def work(stage_idx, name, fn):
+        inbox, outbox = queues[stage_idx], queues[stage_idx + 1]
+        while True:
+            entry = inbox.get()
+            if entry is _STOP:
+                break
+            idx, value = entry
+            if not isinstance(value, Exception):
+                t0 = time.perf_counter()
+                try:
+                    value = fn(value)
+                except Exception as e:
+                    value = e
+                if timings:
+                    timings.record(name, time.perf_counter() - t0)
+            outbox.put((idx, value))
+
+        # worker ตัวสุดท้ายของขั้นนี้ปิดคิวของขั้นถัดไป
+        with counter_lock:
+            remaining_workers[stage_idx] -= 1
+            last = remaining_workers[stage_idx] == 0
+        if last:
+            next_workers = remaining_workers[stage_idx + 1] if stage_idx + 1 < len(stages) else 1
+            for _ in range(next_workers):
+                outbox.put(_STOP)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for stage_idx, (name, fn, workers) in enumerate(stages):
+        for _ in range(remaining_workers[stage_idx]):
+            threads.append(threading.Thread(target=work, args=(stage_idx, name, fn), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    results = {}
+    feed_error = None
+    while True:
+        entry = queues[-1].get()
+        if entry is _STOP:
+            break
+        idx, value = entry
+        if idx is None:
+            feed_error = value
+            continue
+        results[idx] = value
+        if on_progress:
+            on_progress(len(results), total)
+
+    for thread in threads:
+        thread.join()
+    if timings:
+        timings.wall += time.perf_counter() - started
+    if feed_error is not None:
+        raise feed_error
+    return [results[i] for i in range(len(results))]
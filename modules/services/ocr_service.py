@@ -0,0 +1,313 @@
+import json
+import re
+from modules.services.ocr_engine import run_concurrent
+from modules.services.ai_service import request_text, AIServiceError
+from modules.services.image_encoder import encode_image
+from modules.services.page_packing import iter_groups, build_packed_content, split_packed_response, PACKED_PROMPT_HEADER
+
+# Logic การ OCR ที่ใช้ร่วมกันระหว่างหน้าเว็บ (ocr_view / quick_convert_view) กับ batch_convert.py
+# ไม่แตะ Streamlit จึง import จากสคริปต์ Command Line ได้
+
+TABLE_MARKER = "\n[--- ตรวจพบตาราง: ดูรายละเอียดในไฟล์ Excel ---]\n"
+
+def parse_structured_response(raw_text):
+    """
+    แยกคำตอบโหมด JSON ({"blocks": [...]} ตาม OCR_RESPONSE_SCHEMA)
+    Return: (Clean Text, list ตาราง แต่ละตารางเป็น list ของแถว) หรือ None ถ้าไม่ใช่ JSON ที่ถูกต้อง
+    """
+    try:
+        data = json.loads(raw_text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("blocks"), list):
+        return None
+
+    parts, tables = [], []
+    for block in data["blocks"]:
+        if not isinstance(block, dict):
+            continue
+        if block.get("type") == "table":
+            rows = [[str(cell) for cell in row] for row in block.get("rows") or [] if isinstance(row, list) and row]
+            if rows:
+                tables.append(rows)
+                parts.append(TABLE_MARKER.strip())
+        elif block.get("text"):
+            parts.append(str(block["text"]).strip())
+    return "\n\n".join(parts), tables
+
+def parse_ai_response(raw_text):
+    """
+    แยกเนื้อหา:
+    1. ข้อความทั่วไป (Clean Text) -> สำหรับ Word
+    2. ข้อมูลตาราง (CSV List) -> สำหรับ Excel
+    คำตอบโหมด JSON (Structured) จะได้ตารางเป็น list ของแถวแทน CSV (ไม่ต้องแปลงซ้ำตอน Export)
+    """
+    if not raw_text: 
+        return "", []
+
+    if raw_text.lstrip().startswith("{"):
+        structured = parse_structured_response(raw_text)
+        if structured is not None:
+            return structured
+
+    # Regex ค้นหาข้อความที่อยู่ระหว่าง [[TABLE]]...[[/TABLE]]
+    # re.DOTALL เพื่อให้ . ครอบคลุมบรรทัดใหม่ด้วย
+    table_pattern = re.compile(r'\[\[TABLE\]\](.*?)\[\[/TABLE\]\]', re.DOTALL)
+    
+    found_tables = []
+    
+    # ฟังก์ชันสำหรับแทนที่ตารางในข้อความหลักด้วย Marker
+    def replace_with_marker(match):
+        csv_content = match.group(1).strip()
+        if csv_content:
+            found_tables.append(csv_content)
+            return TABLE_MARKER
+        return ""
+
+    # 1. สร้าง Clean Text (เอาตารางออกแล้วแปะป้ายแทน)
+    clean_text = table_pattern.sub(replace_with_marker, raw_text)
+    
+    # ล้างบรรทัดว่างส่วนเกิน
+    clean_text = re.sub(r'\n{3,}', '\n\n', clean_text).strip()
+
+    return clean_text, found_tables
+
+# --- PROMPT สูตรพิเศษ: สั่งให้แยกตารางด้วยแท็ก ---
+OCR_PROMPT = """
+        Analyze this image and extract content.
+        1. **Text**: Extract normal text with original layout.
+        2. **Tables**: If you see any data table, DO NOT format it as Markdown. 
+           Instead, convert it to CSV format and wrap it strictly within [[TABLE]] and [[/TABLE]] tags.
+           Example:
+           [[TABLE]]
+           Column1,Column2
+           Val1,Val2
+           [[/TABLE]]
+        3. **Thai Language**: Ensure high accuracy.
+        """
+
+# --- โหมด Structured: ให้ AI ตอบเป็น JSON ตาม Schema (ไม่ต้องพึ่งแท็ก [[TABLE]]) ---
+OCR_JSON_PROMPT = """
+        Analyze this image and extract its content as a list of blocks in reading order.
+        - "heading" / "paragraph": normal text with original line breaks.
+        - "table": every data table, as rows of cell strings (first row = header). Repeat merged cell values.
+        - Thai Language: Ensure high accuracy.
+        """
+
+OCR_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "blocks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": ["heading", "paragraph", "table"]},
+                    "text": {"type": "string"},
+                    "rows": {"type": "array", "items": {"type": "array", "items": {"type": "string"}}},
+                },
+                "required": ["type"],
+            },
+        },
+    },
+    "required": ["blocks"],
+}
+
+STRUCTURED_CONFIG = {"response_mime_type": "application/json", "response_schema": OCR_RESPONSE_SCHEMA}
+
+def ocr_single_image(api_key, image, model_name, cache=None, stats=None, encoding=None, structured=False):
+    """
+    OCR 1 หน้า คืน Raw Text (ยังไม่แยกตาราง)
+    structured=True: ขอคำตอบเป็น JSON ตาม OCR_RESPONSE_SCHEMA (parse_ai_response แยกให้อัตโนมัติ)
+    Raise: AIServiceError ถ้ายิง AI ไม่สำเร็จหลัง Retry (ไม่ฝังข้อความ Error ลงในผลลัพธ์)
+    """
+    # บีบอัดภาพก่อนส่ง (ลดขนาด Payload)
+    if encoding:
+        image = encode_image(image, encoding)
+
+    # เช็ค Cache ก่อน (หน้าเดิม + โมเดลเดิม + Prompt เดิม = ไม่ต้องเสียโควต้าซ้ำ)
+    prompt = OCR_JSON_PROMPT if structured else OCR_PROMPT
+    cache_key = None
+    if cache:
+        cache_key = cache.make_key(image, model_name, prompt)
+        cached_text = cache.get(cache_key)
+        if stats: stats.record(cached_text is not None)
+        if cached_text is not None:
+            return cached_text
+
+    # ยิงผ่าน ai_service (Rate Limit + Retry อัตโนมัติ)
+    raw_text = request_text(api_key, model_name, [prompt, image], generation_config=STRUCTURED_CONFIG if structured else None)
+    
+    # ส่งค่ากลับเป็น Raw Text ก่อน เดี๋ยวไปแยกข้างนอก
+    if cache_key:
+        cache.put(cache_key, raw_text)
+    return raw_text
+
+def ocr_page_group(api_key, images, model_name, cache=None, stats=None, encoding=None, packer=None):
+    """
+    OCR หลายหน้าใน Request เดียว (คั่นด้วย [[PAGE n]]) แล้วแยกคำตอบกลับเป็นรายหน้า
+    ถ้าแยกไม่ผ่าน จะลดขนาดกลุ่มของ packer และส่งใหม่ทีละหน้า
+    Cache: ผลที่ตัดจากคำตอบรวมเก็บแยกจากผลแบบทีละหน้า (คนละ Prompt / คุณภาพอาจต่างกัน)
+    ตอนอ่านใช้ผลแบบทีละหน้าก่อน ส่วน ocr_single_image ไม่เคยหยิบผลจากคำตอบรวมไปใช้
+    Return: list (Raw Text หรือ Exception) เรียงตามหน้าในกลุ่ม
+    """
+    if encoding:
+        images = [encode_image(img, encoding) for img in images]
+
+    results = [None] * len(images)
+    cache_keys = [None] * len(images)
+    packed_keys = [None] * len(images)
+    pending = []
+    for i, image in enumerate(images):
+        if cache:
+            cache_keys[i] = cache.make_key(image, model_name, OCR_PROMPT)
+            packed_keys[i] = cache.make_key(image, model_name, PACKED_PROMPT_HEADER + OCR_PROMPT)
+            cached_text = cache.get(cache_keys[i])
+            if cached_text is None:
+                cached_text = cache.get(packed_keys[i])
+            if stats: stats.record(cached_text is not None)
+            if cached_text is not None:
+                results[i] = cached_text
+                continue
+        pending.append(i)
+
+    if len(pending) > 1:
+        try:
+            raw_text = request_text(api_key, model_name, build_packed_content(OCR_PROMPT, [images[i] for i in pending]))
+            pages = split_packed_response(raw_text, len(pending))
+        except AIServiceError:
+            pages = None
+
+        if pages is not None:
+            if packer: packer.success()
+            for i, page_text in zip(pending, pages):
+                results[i] = page_text
+                if packed_keys[i]:
+                    cache.put(packed_keys[i], page_text)
+            return results
+        if packer: packer.failure()
+
+    # Fallback: ส่งทีละหน้า
+    for i in pending:
+        try:
+            results[i] = ocr_single_image(api_key, images[i], model_name)
+            if cache_keys[i]:
+                cache.put(cache_keys[i], results[i])
+        except Exception as e:
+            results[i] = e
+    return results
+
+def run_ocr_pages(api_key, model_name, images, num_workers, on_progress, cache=None, stats=None, encoding=None, packer=None, on_page_done=None, structured=False):
+    """
+    OCR ทุกหน้าจาก images (list/generator) พร้อมกัน
+    packer: AdaptivePacker ถ้าต้องการรวมหลายหน้าต่อ Request (ไม่ใช้ในโหมด structured)
+    on_page_done(ลำดับ, raw_text): เรียกจาก worker ทันทีที่หน้านั้นอ่านสำเร็จ (ใช้ทำ Checkpoint)
+    Return: list (Raw Text หรือ Exception) เรียงตามหน้า
+    """
+    if not packer or structured:
+        def single_task(item):
+            position, img = item
+            raw_text = ocr_single_image(api_key, img, model_name, cache, stats, encoding, structured)
+            if on_page_done:
+                on_page_done(position, raw_text)
+            return raw_text
+
+        return run_concurrent(
+            single_task,
+            enumerate(images),
+            max_workers=num_workers,
+            on_progress=on_progress,
+            return_exceptions=True
+        )
+
+    pages_done = []
+
+    def task(group):
+        results = ocr_page_group(api_key, [img for _, img in group], model_name, cache, stats, encoding, packer)
+        if on_page_done:
+            for (position, _), raw_text in zip(group, results):
+                if not isinstance(raw_text, Exception):
+                    on_page_done(position, raw_text)
+        pages_done.append(len(group))
+        return results
+
+    def report(done, total):
+        on_progress(sum(pages_done), None)
+
+    groups = run_concurrent(task, iter_groups(enumerate(images), packer), max_workers=num_workers, on_progress=report)
+    return [result for group in groups for result in group]
+
+def error_to_dict(e):
+    """Exception -> dict {"kind", "message"} สำหรับเก็บใน Session State"""
+    error = e if isinstance(e, AIServiceError) else AIServiceError("fatal", str(e))
+    return error.to_dict()
+
+def split_ocr_results(raw_responses):
+    """
+    แยกผลจาก run_concurrent(..., return_exceptions=True) เป็น (texts, tables, errors)
+    หน้าที่ล้มเหลวจะได้ข้อความว่าง + เก็บสถานะ Error แยกไว้ ไม่ปนลงในเอกสาร
+    """
+    texts, tables, errors = [], [], []
+    for raw_response in raw_responses:
+        if isinstance(raw_response, Exception):
+            texts.append("")
+            tables.append([])
+            errors.append(error_to_dict(raw_response))
+            continue
+        # Parse: แยก Text กับ Tables
+        clean_text, page_tables = parse_ai_response(raw_response)
+        texts.append(clean_text)
+        tables.append(page_tables)
+        errors.append(None)
+    return texts, tables, errors
+
+def clean_ocr_text(text):
+    if not text: return ""
+    # ลบพวก Markdown code block ออก (เผื่อ AI เผลอใส่มา)
+    text = text.replace("```csv", "").replace("```", "")
+    return text.strip()
+
+# Prompt สำหรับ Excel (ขอ CSV)
+CSV_PROMPT = """
+            Act as a Data Entry Clerk. 
+            Extract the table data from this image perfectly.
+            - Output STRICTLY in CSV format (Comma Separated Values).
+            - Do NOT use Markdown code blocks. Just raw CSV data.
+            - Handle Thai characters correctly.
+            - If there are merged cells, repeat the value in each cell or handle logically.
+            """
+
+# Prompt สำหรับ Word (ขอ Text)
+TEXT_PROMPT = """
+            You are a high-speed OCR engine. 
+            Convert this document image into plain text.
+            - IGNORE any underlying text layer. READ VISUALLY.
+            - Preserve the original layout (paragraphs/lists).
+            - Thai Language accuracy is top priority.
+            """
+
+def process_page_ai(api_key, image, model_name, output_format="text", cache=None, stats=None, encoding=None):
+    """
+    ฟังก์ชันส่งรูปให้ AI แกะข้อความ
+    output_format: 'text' (Word) หรือ 'csv' (Excel)
+    cache/stats: (ไม่บังคับ) OcrCache และ CacheStats สำหรับข้ามหน้าที่เคยแปลงแล้ว
+    encoding: (ไม่บังคับ) การตั้งค่าบีบอัดภาพจาก ENCODING_PRESETS
+    Raise: AIServiceError ถ้ายิง AI ไม่สำเร็จหลัง Retry
+    """
+    prompt = CSV_PROMPT if output_format == "csv" else TEXT_PROMPT
+    if encoding:
+        image = encode_image(image, encoding)
+
+    cache_key = None
+    if cache:
+        cache_key = cache.make_key(image, model_name, prompt)
+        cached_text = cache.get(cache_key)
+        if stats: stats.record(cached_text is not None)
+        if cached_text is not None:
+            return cached_text
+
+    # ยิงผ่าน ai_service (Rate Limit + Retry อัตโนมัติ)
+    result = clean_ocr_text(request_text(api_key, model_name, [prompt, image]))
+    if cache_key:
+        cache.put(cache_key, result)
+    return result
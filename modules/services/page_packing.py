@@ -0,0 +1,71 @@
+import re
+import threading
+
+# --- รวมหลายหน้าต่อ 1 Request (Page Packing) ---
+PAGE_MARKER = "[[PAGE {n}]]"
+_MARKER_LINE = re.compile(r"^[ \t]*\[\[PAGE (\d+)\]\][ \t]*$", re.MULTILINE)
+
+PACKED_PROMPT_HEADER = """
+        You will receive {count} page images. Each image is preceded by its marker [[PAGE n]].
+        Process EVERY page independently using the rules below.
+        For each page, output its marker on its own line exactly as given ([[PAGE 1]], [[PAGE 2]], ...),
+        in the same order, followed by that page's content. Never merge or skip pages.
+        Output nothing before [[PAGE 1]].
+        """
+
+class AdaptivePacker:
+    """
+    ปรับจำนวนหน้าต่อ Request อัตโนมัติ
+    - แยกผลสำเร็จ: เพิ่มขนาดทีละ 1 (ไม่เกิน max_size)
+    - แยกผลไม่ผ่าน: ลดลงครึ่งหนึ่ง (ต่ำสุด 1 = ส่งทีละหน้าตามเดิม)
+    """
+    def __init__(self, initial=4, max_size=8):
+        self.max_size = max(1, max_size)
+        self.size = max(1, min(initial, self.max_size))
+        self._lock = threading.Lock()
+
+    def success(self):
+        with self._lock:
+            self.size = min(self.size + 1, self.max_size)
+
+    def failure(self):
+        with self._lock:
+            self.size = max(1, self.size // 2)
+
+def iter_groups(items, packer):
+    """แบ่ง items เป็นกลุ่มตามขนาดปัจจุบันของ packer (อ่านขนาดใหม่ทุกครั้งที่ตัดกลุ่ม)"""
+    group = []
+    for item in items:
+        group.append(item)
+        if len(group) >= packer.size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+def build_packed_content(base_prompt, images):
+    """สร้าง Content สำหรับ Request เดียว: Prompt + (Marker, ภาพ) ทีละหน้า"""
+    content = [PACKED_PROMPT_HEADER.format(count=len(images)) + base_prompt]
+    for n, image in enumerate(images, start=1):
+        content.append(PAGE_MARKER.format(n=n))
+        content.append(image)
+    return content
+
+def split_packed_response(raw_text, count):
+    """
+    แยกคำตอบรวมกลับเป็นข้อความรายหน้า
+    Return: list ของข้อความ (ยาว count) หรือ None ถ้า Marker ไม่ครบ/ไม่เรียงลำดับ (ต้อง Fallback)
+    """
+    if not raw_text:
+        return None
+    markers = list(_MARKER_LINE.finditer(raw_text))
+    if [int(m.group(1)) for m in markers] != list(range(1, count + 1)):
+        return None
+    if raw_text[:markers[0].start()].strip():
+        return None
+
+    pages = []
+    for i, m in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(raw_text)
+        pages.append(raw_text[m.end():end].strip())
+    return pages
@@ -0,0 +1,103 @@
+import fitz  # PyMuPDF
+from PIL import Image
+from collections import OrderedDict, deque
+import io
+import threading
+from modules.services.image_encoder import choose_dpi, encode_image
+
+# MuPDF ไม่ thread-safe แม้จะเป็นคนละเอกสาร (ใช้ Context กลางร่วมกัน)
+# ทุกการเรียก fitz ใน Process ที่มีหลาย Thread (Streamlit / งานเบื้องหลัง) ต้องทำภายใต้ Lock นี้
+# (ถ้าต้องการ Render ขนานจริง ใช้ Process Pool แบบ render_encoded ด้านล่าง)
+FITZ_LOCK = threading.RLock()
+
+class PdfPageSource:
+    """
+    แหล่งภาพหน้า PDF แบบ Lazy
+    - เก็บแค่ไฟล์ PDF ต้นฉบับ (bytes ที่บีบอัดอยู่แล้ว)
+    - Render เป็นภาพทีละหน้าเฉพาะตอนที่ถูกขอ แล้วปล่อยทิ้ง ไม่ถือภาพทุกหน้าไว้ในหน่วยความจำ
+    - adaptive_dpi=True: ปรับ DPI รายหน้าตามขนาดตัวอักษร (ดู choose_dpi)
+    """
+    def __init__(self, pdf_bytes, dpi=150, adaptive_dpi=False):
+        self.pdf_bytes = pdf_bytes
+        self.dpi = dpi
+        self.adaptive_dpi = adaptive_dpi
+        with FITZ_LOCK:
+            self.doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            self.page_count = len(self.doc)
+
+    def __len__(self):
+        return self.page_count
+
+    def render(self, page_num, dpi=None):
+        """Render หน้าเดียวเป็น PIL Image"""
+        with FITZ_LOCK:
+            page = self.doc.load_page(page_num)
+            if dpi is None:
+                dpi = choose_dpi(page, self.dpi) if self.adaptive_dpi else self.dpi
+            png = page.get_pixmap(dpi=dpi).tobytes()
+        return Image.open(io.BytesIO(png))
+
+    def close(self):
+        with FITZ_LOCK:
+            self.doc.close()
+
+    # with PdfPageSource(...) as source: ปิดเอกสารเองภายใต้ FITZ_LOCK เสมอแม้เกิด Error ระหว่างทาง
+    # (ไม่ปล่อยให้ GC ปิดจาก Thread ไหนก็ได้ และไม่ค้างในงานเบื้องหลังที่รันยาว)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def iter_pages(self, page_numbers=None):
+        """Generator คืนภาพทีละหน้า (ใช้ป้อนเข้า run_concurrent ได้ตรงๆ)"""
+        if page_numbers is None:
+            page_numbers = range(self.page_count)
+        for page_num in page_numbers:
+            yield self.render(page_num)
+
+# --- Render แบบ Process Pool (ใช้กับงาน Batch ขนาดใหญ่) ---
+# เปิดไฟล์ค้างไว้ต่อ Process (ไม่ต้อง fitz.open ใหม่ทุกหน้า)
+_PROCESS_DOC_LIMIT = 4
+_process_docs = OrderedDict()
+
+def _open_cached(pdf_path):
+    doc = _process_docs.pop(pdf_path, None)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+    _process_docs[pdf_path] = doc
+    while len(_process_docs) > _PROCESS_DOC_LIMIT:
+        _process_docs.popitem(last=False)[1].close()
+    return doc
+
+def render_encoded(task):
+    """
+    Render + บีบอัด 1 หน้า (ต้องเป็นฟังก์ชันระดับ Module เพื่อส่งเข้า ProcessPoolExecutor ได้)
+    แต่ละ Process มี MuPDF ของตัวเอง Render พร้อมกันได้โดยไม่ต้องใช้ FITZ_LOCK
+    task: (pdf_path, page_num, dpi, adaptive_dpi, encoding)
+    Return: dict {"mime_type", "data"} พร้อมส่ง AI
+    """
+    pdf_path, page_num, dpi, adaptive_dpi, encoding = task
+    page = _open_cached(pdf_path).load_page(page_num)
+    if adaptive_dpi:
+        dpi = choose_dpi(page, dpi)
+    pix = page.get_pixmap(dpi=dpi)
+    return encode_image(Image.open(io.BytesIO(pix.tobytes())), encoding)
+
+def iter_encoded_pages(pool, pdf_path, page_numbers, encoding, dpi=150, adaptive_dpi=False, window=8):
+    """
+    Generator คืนภาพที่บีบอัดแล้วทีละหน้าตามลำดับ โดย Render ล่วงหน้าใน pool ไม่เกิน window หน้า
+    (ไม่ใช้ pool.map เพราะจะส่งทุกหน้าเข้าคิวทันทีและถือผลไว้ในหน่วยความจำทั้งหมด)
+    """
+    tasks = iter((pdf_path, page_num, dpi, adaptive_dpi, encoding) for page_num in page_numbers)
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(render_encoded, task))
+        if len(pending) >= window:
+            break
+    while pending:
+        blob = pending.popleft().result()
+        next_task = next(tasks, None)
+        if next_task is not None:
+            pending.append(pool.submit(render_encoded, next_task))
+        yield blob
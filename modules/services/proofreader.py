@@ -0,0 +1,316 @@
+from collections import OrderedDict
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from modules.services.ai_service import request_text
+from modules.services.ocr_engine import run_concurrent, DEFAULT_WORKERS
+
+# ตรวจทานข้อความยาว: แบ่งเป็นชิ้นตามย่อหน้า/ประโยค -> ส่ง AI พร้อมกัน -> ต่อกลับตามลำดับเดิม
+# (ส่งทั้งก้อนเดียวจะชน Output Token Limit / Timeout และทำขนานไม่ได้)
+
+PROOFREAD_PROMPT = """
+        Act as a professional proofreader.
+        Please correct the spelling, grammar, and punctuation errors in the following text (Thai and English).
+        Maintain the original tone and style.
+        RETURN ONLY THE CORRECTED TEXT without any explanation or markdown formatting.
+
+        Text to correct:
+        {text}
+        """
+
+# งบ Token (โดยประมาณ) ต่อชิ้น: คำตอบยาวพอๆ กับต้นฉบับ จึงต้องต่ำกว่า Output Limit ของโมเดลพอสมควร
+CHUNK_TOKENS = int(os.environ.get("SMART_DOC_PROOF_CHUNK_TOKENS", "1500"))
+# Cache ผลตรวจทานรายย่อหน้า (ในหน่วยความจำ ใช้ร่วมกันทุก Session)
+MAX_CORRECTION_BYTES = int(os.environ.get("SMART_DOC_PROOF_CACHE_MB", "32")) * 1024 * 1024
+
+_THAI_CHAR = re.compile(r"[฀-๿]")
+# สระบน/ล่าง วรรณยุกต์ และเครื่องหมายที่ต้องอยู่ติดกับพยัญชนะตัวหน้า (ห้ามตัดก่อนตัวเหล่านี้)
+_THAI_COMBINING = set("ัิีึืฺุู็่้๊๋์ํ๎")
+# สระหน้า (เ แ โ ใ ไ) ต้องอยู่ติดกับพยัญชนะตัวถัดไป (ห้ามตัดหลังตัวเหล่านี้)
+_THAI_LEADING = set("เแโใไ")
+_PARAGRAPH_SEP = re.compile(r"(\n[ \t]*\n\s*)")
+# จุดจบประโยค: หลัง . ! ? ที่ตามด้วยช่องว่าง หรือช่องว่างระหว่างข้อความไทย (ภาษาไทยเว้นวรรคแทนการจบประโยค/วลี)
+_SENTENCE_SEP = re.compile(r"((?<=[.!?])\s+|(?<=[฀-๿])[ \t]+(?=[฀-๿])|\n)")
+
+def estimate_tokens(text):
+    """
+    ประมาณจำนวน Token แบบเร็ว (ไม่ต้องเรียก API)
+    ภาษาไทยไม่มีช่องว่างระหว่างคำ และใช้ Token ต่อตัวอักษรมากกว่าภาษาอังกฤษ (~2 ตัวอักษร/Token เทียบกับ ~4)
+    """
+    thai = len(_THAI_CHAR.findall(text))
+    return math.ceil(thai / 2 + (len(text) - thai) / 4)
+
+def _safe_cut(text, limit):
+    """ตำแหน่งตัดที่ไม่แยกพยัญชนะออกจากสระ/วรรณยุกต์ (ถอยหลังจาก limit จนกว่าจะตัดได้)"""
+    cut = min(limit, len(text))
+    while 0 < cut < len(text) and (text[cut] in _THAI_COMBINING or text[cut - 1] in _THAI_LEADING):
+        cut -= 1
+    return cut or limit
+
+def _split_oversized(piece, max_tokens):
+    """ประโยคเดียวที่ยาวเกินงบ: ตัดที่ช่องว่างถ้ามี ไม่งั้นตัดตามจำนวนตัวอักษร (ไม่ตัดกลางพยางค์)"""
+    parts = []
+    while estimate_tokens(piece) > max_tokens:
+        # จำนวนตัวอักษรที่ใส่ได้ (คิดแบบไทยล้วน = แย่ที่สุด)
+        limit = max(1, max_tokens * 2)
+        space = piece.rfind(" ", 0, limit)
+        cut = space + 1 if space > limit // 2 else _safe_cut(piece, limit)
+        parts.append(piece[:cut])
+        piece = piece[cut:]
+    if piece:
+        parts.append(piece)
+    return parts
+
+def _units(text, max_tokens):
+    """แตกข้อความเป็น (ข้อความ, ตัวคั่นที่ตามหลัง) โดยย่อหน้าที่ยาวเกินงบจะถูกแตกเป็นประโยค"""
+    pieces = _PARAGRAPH_SEP.split(text)
+    for i in range(0, len(pieces), 2):
+        paragraph = pieces[i]
+        separator = pieces[i + 1] if i + 1 < len(pieces) else ""
+        if estimate_tokens(paragraph) <= max_tokens:
+            yield paragraph, separator
+            continue
+        sentences = _SENTENCE_SEP.split(paragraph)
+        for j in range(0, len(sentences), 2):
+            sentence_sep = sentences[j + 1] if j + 1 < len(sentences) else separator
+            # ประโยคว่าง (เช่น ย่อหน้าจบด้วย ". ") ต้องยังส่งตัวคั่นต่อ ไม่งั้นช่องว่าง/ตัวคั่นย่อหน้าท้ายหาย
+            parts = _split_oversized(sentences[j], max_tokens) or [""]
+            for k, part in enumerate(parts):
+                yield part, sentence_sep if k == len(parts) - 1 else ""
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS):
+    """
+    แบ่งข้อความเป็นชิ้น (ไม่เกิน max_tokens โดยประมาณ) ตามขอบย่อหน้า -> ประโยค -> ตัวอักษร
+    Return: list ของ (ข้อความในชิ้น, ตัวคั่นหลังชิ้น) ต่อกลับด้วย join_chunks ได้ข้อความเดิมทุกตัวอักษร
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for unit, separator in _units(text, max_tokens):
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > max_tokens:
+            body = "".join(u + s for u, s in current[:-1]) + current[-1][0]
+            chunks.append((body, current[-1][1]))
+            current, current_tokens = [], 0
+        current.append((unit, separator))
+        current_tokens += tokens
+    if current:
+        body = "".join(u + s for u, s in current[:-1]) + current[-1][0]
+        chunks.append((body, current[-1][1]))
+    return chunks
+
+def normalize_paragraph(paragraph):
+    """รูปแบบมาตรฐานสำหรับทำ Key (NFC, ตัดช่องว่างหัว/ท้ายบรรทัด, ยุบช่องว่างซ้ำ) - ไม่สนใจการเว้นวรรคที่ต่างกันเล็กน้อย"""
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in unicodedata.normalize("NFC", paragraph).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+class CorrectionCache:
+    """
+    LRU ของผลตรวจทานรายย่อหน้า จำกัดขนาดรวมเป็น bytes
+    Key = SHA-256 ของ (ชื่อโมเดล + ย่อหน้าที่ Normalize แล้ว)
+    """
+    def __init__(self, max_bytes=MAX_CORRECTION_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(paragraph, model_name):
+        h = hashlib.sha256(model_name.encode("utf-8"))
+        h.update(b"\0" + normalize_paragraph(paragraph).encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            text = self._items.get(key)
+            if text is not None:
+                self._items.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old.encode("utf-8"))
+            self._items[key] = text
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted.encode("utf-8"))
+
+# ย่อหน้าที่ผ่านการตรวจคำเบื้องต้น (ไม่มีคำนอกพจนานุกรม)
+_CLEAN = object()
+
+def join_chunks(chunks, texts):
+    """ต่อข้อความของแต่ละชิ้น (texts) กลับด้วยตัวคั่นเดิม"""
+    return "".join(text + separator for text, (_, separator) in zip(texts, chunks))
+
+def _keep_outer_space(original, corrected):
+    """ใส่ช่องว่างหัว/ท้ายของต้นฉบับกลับให้ข้อความที่แก้แล้ว"""
+    leading = original[:len(original) - len(original.lstrip())]
+    trailing = original[len(original.rstrip()):]
+    return leading + corrected.strip() + trailing
+
+def proofread_chunk(api_key, model_name, text, send_fn=None):
+    """
+    ตรวจทาน 1 ชิ้น (ช่องว่างหัว/ท้ายของต้นฉบับคงไว้ตามเดิม) | Raise: AIServiceError
+    send_fn(body): (ไม่บังคับ) ใช้ส่งแทน request_text เช่นแบบ Stream
+    """
+    body = text.strip()
+    if not body:
+        return text
+    if send_fn:
+        corrected = send_fn(body)
+    else:
+        corrected = request_text(api_key, model_name, PROOFREAD_PROMPT.format(text=body))
+    return _keep_outer_space(text, corrected)
+
+def proofread_text(api_key, model_name, text, num_workers=DEFAULT_WORKERS, max_tokens=CHUNK_TOKENS, on_chunk=None,
+                   cache=None, stats=None, single_fn=None, prepass=None, prepass_stats=None):
+    """
+    ตรวจทานข้อความยาวแบบแบ่งชิ้นพร้อมกัน
+    - cache: CorrectionCache ย่อหน้าที่เคยตรวจแล้ว (ข้อความ + โมเดลเดิม) ใช้ผลเดิมเลย ส่ง AI เฉพาะย่อหน้าใหม่/ที่ถูกแก้
+      stats: CacheStats นับ Hit/Miss รายย่อหน้า
+    - prepass: SpellPrepass ย่อหน้าที่ทุกคำอยู่ในพจนานุกรมคงไว้ตามเดิมโดยไม่ส่ง AI
+      prepass_stats: PrepassStats นับย่อหน้าที่ข้าม และเวลา AI ต่อ Token (ไว้ประมาณเวลาที่ประหยัดได้)
+    - on_chunk(chunks, finished): เรียกจาก Thread หลักทุกครั้งที่ชิ้นใดเสร็จ (finished = {ลำดับชิ้น: ข้อความที่แก้แล้ว})
+    - single_fn(body): ถ้าต้องส่ง AI แค่ชิ้นเดียว จะใช้ฟังก์ชันนี้แทน (เช่น Stream คำตอบให้ดูสดๆ)
+    - ชิ้นที่ล้มเหลวหลัง Retry จะคงข้อความเดิมไว้ (ไม่ทิ้งทั้งงาน)
+    Return: (ข้อความที่แก้แล้ว, list ของ (ลำดับชิ้น, Exception) ที่ล้มเหลว, จำนวนชิ้นที่ส่ง AI)
+    """
+    # 1. แยกย่อหน้า: ย่อหน้าที่มีใน Cache ใส่ผลเดิมไว้เลย / ย่อหน้าที่ไม่มีคำนอกพจนานุกรมคงไว้ตามเดิม
+    #    ย่อหน้าที่ต้องส่งต่อกันเป็นช่วงๆ แล้วค่อยแบ่งชิ้น
+    pieces = _PARAGRAPH_SEP.split(text)
+    pairs = [(pieces[i], pieces[i + 1] if i + 1 < len(pieces) else "") for i in range(0, len(pieces), 2)]
+    entries = []       # (ย่อหน้า, ตัวคั่น, ข้อความที่พร้อมแล้ว หรือ CLEAN / None = ต้องส่ง AI)
+    pending_keys = {}  # ย่อหน้าต้นฉบับ -> Key (ไว้เก็บผลลง Cache หลังตรวจเสร็จ)
+    for paragraph, separator in pairs:
+        if not paragraph.strip():
+            entries.append((paragraph, separator, paragraph + separator))
+            continue
+        cached = None
+        key = cache.make_key(paragraph, model_name) if cache else None
+        if key:
+            cached = cache.get(key)
+        if cached is not None:
+            if stats: stats.record(True)
+            entries.append((paragraph, separator, _keep_outer_space(paragraph, cached) + separator))
+        elif prepass and prepass.is_clean(paragraph, prepass_stats):
+            entries.append((paragraph, separator, _CLEAN))
+        else:
+            if key:
+                if stats: stats.record(False)
+                pending_keys[paragraph] = key
+            entries.append((paragraph, separator, None))
+
+    layout = []        # str (ข้อความที่พร้อมแล้ว) หรือ (start, end) ช่วงของ chunks
+    chunks = []
+    run = []
+    run_tokens = 0
+
+    def flush_run():
+        nonlocal run_tokens
+        if not run:
+            return
+        body = "".join(p + s for p, s in run[:-1]) + run[-1][0]
+        start = len(chunks)
+        chunks.extend(chunk_text(body, max_tokens))
+        layout.append((start, len(chunks)))
+        layout.append(run[-1][1])
+        run.clear()
+        run_tokens = 0
+
+    i = 0
+    while i < len(entries):
+        paragraph, separator, ready = entries[i]
+        if ready is None:
+            run.append((paragraph, separator))
+            run_tokens += estimate_tokens(paragraph)
+        elif ready is _CLEAN:
+            # ย่อหน้าสะอาดที่ติดกัน: ถ้าคั่นอยู่ระหว่างย่อหน้าที่ต้องส่งและรวมกันยังอยู่ในชิ้นเดียว ส่งไปด้วยเลย
+            # (ดีกว่าแยกเป็นหลายคำขอ) ไม่งั้นคงไว้ตามเดิมโดยไม่ส่ง AI
+            j = i
+            while j < len(entries) and entries[j][2] is _CLEAN:
+                j += 1
+            gap = entries[i:j]
+            gap_tokens = sum(estimate_tokens(p) for p, _, _ in gap)
+            bridge = run and j < len(entries) and entries[j][2] is None and \
+                run_tokens + gap_tokens + estimate_tokens(entries[j][0]) <= max_tokens
+            if bridge:
+                run.extend((p, s) for p, s, _ in gap)
+                run_tokens += gap_tokens
+            else:
+                flush_run()
+                for p, s, _ in gap:
+                    layout.append(p + s)
+                    if prepass_stats: prepass_stats.record_skip(estimate_tokens(p))
+            i = j
+            continue
+        else:
+            flush_run()
+            layout.append(ready)
+        i += 1
+    flush_run()
+
+    # 2. ส่ง AI เฉพาะชิ้นที่ต้องตรวจ
+    finished = {}
+    send_fn = single_fn if single_fn and len(chunks) == 1 else None
+
+    def task(item):
+        index, (body, _) = item
+        started = time.perf_counter()
+        corrected = proofread_chunk(api_key, model_name, body, send_fn)
+        if prepass_stats:
+            prepass_stats.record_ai(estimate_tokens(body), time.perf_counter() - started)
+        finished[index] = corrected
+        if cache:
+            # เก็บลง Cache รายย่อหน้า (เฉพาะเมื่อจำนวนย่อหน้าของคำตอบตรงกับต้นฉบับ)
+            originals = _PARAGRAPH_SEP.split(body)[::2]
+            corrections = _PARAGRAPH_SEP.split(corrected.strip())[::2]
+            if len(originals) == len(corrections):
+                for original, correction in zip(originals, corrections):
+                    if original in pending_keys:
+                        cache.put(pending_keys[original], correction.strip())
+        return corrected
+
+    def report(done, total):
+        if on_chunk:
+            on_chunk(chunks, finished)
+
+    if send_fn:
+        # ชิ้นเดียว: รันใน Thread ที่เรียก (single_fn อาจอัปเดต UI ซึ่งต้องทำจาก Thread ของ Script)
+        try:
+            results = [task((0, chunks[0]))]
+        except Exception as e:
+            results = [e]
+        report(1, 1)
+    else:
+        results = run_concurrent(task, list(enumerate(chunks)), max_workers=num_workers, on_progress=report, return_exceptions=True)
+    failures = [(i, r) for i, r in enumerate(results) if isinstance(r, Exception)]
+    texts = [chunks[i][0] if isinstance(r, Exception) else r for i, r in enumerate(results)]
+
+    # 3. ต่อกลับตามลำดับเดิม
+    output = []
+    for item in layout:
+        if isinstance(item, tuple):
+            output.append(join_chunks(chunks[item[0]:item[1]], texts[item[0]:item[1]]))
+        else:
+            output.append(item)
+    return "".join(output), failures, len(chunks)
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_correction_cache():
+    """Cache ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = CorrectionCache()
+        return _shared_cache
@@ -0,0 +1,200 @@
+from bisect import bisect_left
+import os
+import re
+import threading
+import time
+
+# ตรวจคำเบื้องต้นแบบ Local ก่อนส่ง AI ตรวจทาน
+# - ตัดคำไทยแบบ Maximal Matching กับพจนานุกรม (ภาษาไทยไม่มีช่องว่างระหว่างคำ) / คำอังกฤษเทียบกับรายการคำ
+# - ย่อหน้าที่ทุกคำอยู่ในพจนานุกรม = "สะอาด" ผ่านไปตามเดิมโดยไม่ส่ง AI / ย่อหน้าที่มีคำแปลกค่อยส่ง
+# - พจนานุกรม: รายการคำที่แนบมากับโปรแกรม (wordlists/) + pythainlp (ถ้าติดตั้งไว้) + ไฟล์ใน SMART_DOC_WORDLIST
+#   (คั่นหลายไฟล์ด้วย os.pathsep, 1 คำต่อบรรทัด)
+
+WORDLIST_DIR = os.path.join(os.path.dirname(__file__), "wordlists")
+EXTRA_WORDLISTS = os.environ.get("SMART_DOC_WORDLIST", "")
+
+# ตัวอักษรไทย (ไม่รวมเลขไทย ๐-๙ ซึ่งถือเป็นตัวเลข)
+_TOKEN = re.compile(r"(?P<thai>[ก-๏]+)|(?P<latin>[A-Za-z]+(?:'[A-Za-z]+)*)")
+_ENGLISH_SUFFIXES = ("ies", "es", "s", "ed", "ing", "ly", "er", "est", "'s")
+# คำตัวพิมพ์ใหญ่ล้วนที่สั้นไม่เกินนี้ถือเป็นตัวย่อ (PDF, OCR, NASA) ไม่ต้องอยู่ในพจนานุกรม
+ACRONYM_MAX_LEN = 5
+
+class WordTrie:
+    """
+    Trie แบบอัดแน่น: เก็บคำเรียงลำดับไว้ใน list เดียว แล้วไล่ช่วงของคำที่ขึ้นต้นเหมือนกันด้วย bisect
+    (ไม่ต้องสร้าง Node ต่อตัวอักษร ใช้หน่วยความจำเท่ากับตัวคำเท่านั้น แม้พจนานุกรมหลายหมื่นคำ)
+    """
+    def __init__(self, words=()):
+        self._words = sorted(set(w for w in words if w))
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word):
+        i = bisect_left(self._words, word)
+        return i < len(self._words) and self._words[i] == word
+
+    def prefix_lengths(self, text, start=0):
+        """ความยาวของทุกคำในพจนานุกรมที่เป็นคำขึ้นต้นของ text[start:] (เรียงจากสั้นไปยาว)"""
+        words = self._words
+        lo, hi = 0, len(words)
+        lengths = []
+        for end in range(start + 1, len(text) + 1):
+            prefix = text[start:end]
+            lo = bisect_left(words, prefix, lo, hi)
+            # คำที่ขึ้นต้นด้วย prefix อยู่ติดกันเป็นช่วง [lo, hi)
+            hi = bisect_left(words, prefix + "\U0010ffff", lo, hi)
+            if lo >= hi:
+                break
+            if words[lo] == prefix:
+                lengths.append(end - start)
+        return lengths
+
+def segment_thai(text, trie):
+    """
+    ตัดคำไทยแบบ Maximal Matching: เลือกแบบที่มีตัวอักษรนอกพจนานุกรมน้อยที่สุด แล้วจำนวนคำน้อยที่สุด
+    Return: list ของ (คำ, อยู่ในพจนานุกรมหรือไม่) ตัวอักษรนอกพจนานุกรมที่ติดกันรวมเป็นคำเดียว
+    """
+    n = len(text)
+    # best[i] = (จำนวนตัวอักษรที่ไม่รู้จัก, จำนวนคำ, ตำแหน่งก่อนหน้า, รู้จักหรือไม่)
+    best = [None] * (n + 1)
+    best[0] = (0, 0, -1, True)
+    for i in range(n):
+        if best[i] is None:
+            continue
+        unknown, count = best[i][0], best[i][1]
+        for length in trie.prefix_lengths(text, i):
+            candidate = (unknown, count + 1, i, True)
+            if best[i + length] is None or candidate[:2] < best[i + length][:2]:
+                best[i + length] = candidate
+        candidate = (unknown + 1, count + 1, i, False)
+        if best[i + 1] is None or candidate[:2] < best[i + 1][:2]:
+            best[i + 1] = candidate
+
+    segments = []
+    end = n
+    while end > 0:
+        _, _, start, known = best[end]
+        word = text[start:end]
+        if not known and segments and not segments[-1][1]:
+            segments[-1] = (word + segments[-1][0], False)
+        else:
+            segments.append((word, known))
+        end = start
+    segments.reverse()
+    return segments
+
+class PrepassStats:
+    """สถิติการตรวจเบื้องต้นของการรันแต่ละครั้ง (ปลอดภัยเมื่อเรียกจากหลาย Thread)"""
+    def __init__(self):
+        self.paragraphs = 0
+        self.skipped = 0
+        self.skipped_tokens = 0
+        self.check_seconds = 0.0
+        self.ai_tokens = 0
+        self.ai_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_check(self, seconds):
+        with self._lock:
+            self.paragraphs += 1
+            self.check_seconds += seconds
+
+    def record_skip(self, tokens):
+        """ย่อหน้าสะอาดที่ข้ามการส่ง AI จริง (ย่อหน้าสะอาดที่คั่นกลางชิ้นเดียวกันอาจถูกส่งไปด้วย)"""
+        with self._lock:
+            self.skipped += 1
+            self.skipped_tokens += tokens
+
+    def record_ai(self, tokens, seconds):
+        """เวลาที่ AI ใช้จริงต่อชิ้น (ใช้ประมาณเวลาที่ประหยัดได้จากย่อหน้าที่ข้าม)"""
+        with self._lock:
+            self.ai_tokens += tokens
+            self.ai_seconds += seconds
+
+    def saved_seconds(self):
+        """เวลา AI ที่ประหยัดได้โดยประมาณ = Token ที่ข้าม x เวลาต่อ Token ของรอบนี้ (None ถ้ายังไม่ได้ส่ง AI เลย)"""
+        if not self.ai_tokens:
+            return None
+        return self.skipped_tokens * self.ai_seconds / self.ai_tokens
+
+    def summary(self):
+        if not self.paragraphs:
+            return None
+        text = f"🔎 ตรวจคำเบื้องต้น: ข้าม {self.skipped}/{self.paragraphs} ย่อหน้า ({self.skipped / self.paragraphs:.0%}) ไม่ต้องส่ง AI"
+        saved = self.saved_seconds()
+        if saved is not None and self.skipped:
+            text += f" | ประหยัดเวลา AI ~{saved:.1f} วินาที"
+        return text + f" (ใช้เวลาตรวจ {self.check_seconds:.2f} วินาที)"
+
+class SpellPrepass:
+    """ตรวจว่าย่อหน้ามีคำที่ไม่อยู่ในพจนานุกรมหรือไม่ (ไม่แก้ข้อความ แค่คัดกรองว่าต้องส่ง AI หรือเปล่า)"""
+    def __init__(self, thai_words, english_words):
+        self.thai = WordTrie(thai_words)
+        self.english = frozenset(w.lower() for w in english_words)
+
+    def _english_known(self, word, acronyms=True):
+        lower = word.lower()
+        # ตัวอักษรเดี่ยว และตัวย่อสั้นๆ ตัวพิมพ์ใหญ่ล้วน (เช่น PDF, ABC) ถือว่าผ่าน
+        if len(word) <= 1 or (acronyms and word.isupper() and len(word) <= ACRONYM_MAX_LEN) or lower in self.english:
+            return True
+        for suffix in _ENGLISH_SUFFIXES:
+            if lower.endswith(suffix) and len(lower) > len(suffix) + 1:
+                stem = lower[:-len(suffix)]
+                candidates = (stem, stem + "e", stem + "y", stem[:-1] if stem[-1:] == stem[-2:-1] else None)
+                if any(c in self.english for c in candidates if c):
+                    return True
+        return False
+
+    def unknown_words(self, paragraph):
+        """คำในย่อหน้าที่ไม่อยู่ในพจนานุกรม (ตัวเลข เครื่องหมาย และช่องว่างไม่นับ)"""
+        unknown = []
+        # ย่อหน้าตัวพิมพ์ใหญ่ทั้งหมด (หัวเรื่อง/แบบฟอร์มที่ OCR มา) แยกตัวย่อจากคำสะกดผิดไม่ได้ ตรวจทุกคำกับพจนานุกรม
+        acronyms = bool(re.search(r"[a-zก-๏]", paragraph))
+        for match in _TOKEN.finditer(paragraph):
+            if match.group("thai"):
+                unknown.extend(word for word, known in segment_thai(match.group("thai"), self.thai) if not known)
+            elif not self._english_known(match.group("latin"), acronyms):
+                unknown.append(match.group("latin"))
+        return unknown
+
+    def is_clean(self, paragraph, stats=None):
+        """ย่อหน้านี้ไม่มีคำนอกพจนานุกรมหรือไม่ | stats: PrepassStats (ไม่บังคับ) บันทึกเวลาที่ใช้ตรวจ"""
+        started = time.perf_counter()
+        clean = not self.unknown_words(paragraph)
+        if stats:
+            stats.record_check(time.perf_counter() - started)
+        return clean
+
+def load_word_list(path):
+    """อ่านไฟล์รายการคำ (1 คำต่อบรรทัด ข้ามบรรทัดว่างและบรรทัดที่ขึ้นต้นด้วย #) | ไฟล์อ่านไม่ได้ = ไม่มีคำ"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    except OSError:
+        return []
+
+def _load_dictionary():
+    thai = load_word_list(os.path.join(WORDLIST_DIR, "th.txt"))
+    english = load_word_list(os.path.join(WORDLIST_DIR, "en.txt"))
+    try:
+        # pythainlp (ไม่บังคับ): พจนานุกรมคำไทยเต็ม (~60,000 คำ) ทำให้ข้ามย่อหน้าได้มากขึ้น
+        from pythainlp.corpus.common import thai_words
+        thai.extend(thai_words())
+    except ImportError:
+        pass
+    for path in filter(None, EXTRA_WORDLISTS.split(os.pathsep)):
+        for word in load_word_list(path):
+            (thai if re.search(r"[ก-๏]", word) else english).append(word)
+    return SpellPrepass(thai, english)
+
+_shared_prepass = None
+_shared_lock = threading.Lock()
+
+def get_spell_prepass():
+    """ตัวตรวจตัวเดียวที่ใช้ร่วมกันทั้ง Process (โหลดพจนานุกรมครั้งแรกที่เรียก)"""
+    global _shared_prepass
+    with _shared_lock:
+        if _shared_prepass is None:
+            _shared_prepass = _load_dictionary()
+        return _shared_prepass
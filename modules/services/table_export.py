@@ -0,0 +1,166 @@
+import csv
+import io
+import re
+
+import xlsxwriter
+
+# ส่งออกตาราง (CSV จาก AI) เป็น Excel แบบ Stream
+# - ไม่ใช้ pandas: แปลง CSV เองแบบยืดหยุ่น (แถวยาวไม่เท่ากัน, ข้อความไทยในเครื่องหมายคำพูด, Markdown Table)
+# - xlsxwriter โหมด constant_memory: เขียนทีละแถวลงไฟล์ชั่วคราว ไม่ถือทั้ง Workbook ไว้ในหน่วยความจำ
+# - CSV ที่แปลงไม่ได้จะถูกเขียนเป็นบรรทัดดิบ (ไม่ทิ้งข้อมูล)
+# - เกินขีดจำกัดของ Excel: แถวเกินขึ้น Sheet ต่อ "(2)", ช่องยาวเกินตัดท้ายพร้อมเครื่องหมาย และแจ้งเตือนใน warnings
+
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_CELL_CHARS = 32767
+# Excel เก็บตัวเลขเป็น double ได้แม่นยำแค่ 15 หลัก (เลขบัตร/บัญชี/เลขประจำตัวที่ยาวกว่านี้หลักท้ายจะเพี้ยน)
+EXCEL_MAX_DIGITS = 15
+SHEET_NAME_MAX = 31
+TRUNCATED_MARKER = " …[ตัดท้าย: เกินขีดจำกัดของ Excel]"
+
+_NUMBER = re.compile(r"^-?(0|[1-9]\d*)(\.\d+)?$")
+_MD_SEPARATOR = re.compile(r"^\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?$")
+_INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+def _to_cell(value):
+    """ตัวเลขล้วน -> number (เลขที่ขึ้นต้นด้วย 0 เช่นรหัส หรือยาวเกิน EXCEL_MAX_DIGITS หลัก เก็บเป็นข้อความเหมือนเดิม)"""
+    value = value.strip()
+    if _NUMBER.match(value) and len(value.lstrip("-").replace(".", "").lstrip("0")) <= EXCEL_MAX_DIGITS:
+        return float(value) if "." in value else int(value)
+    return value
+
+def parse_csv_rows(csv_text):
+    """
+    แปลงข้อความ CSV จาก AI เป็น list ของแถว (แต่ละแถวเป็น list ของ cell)
+    - ตัด Code Fence (```csv) และบรรทัดว่าง
+    - Markdown Table (| a | b |) แยกด้วย | และข้ามเส้นคั่น
+    - เครื่องหมายคำพูดไม่ครบคู่: แยกด้วย , ทีละบรรทัดแทน (กันทั้งไฟล์รวมเป็น Cell เดียว)
+    """
+    lines = [line for line in csv_text.replace("\r\n", "\n").split("\n")
+             if line.strip() and not line.strip().startswith("```")]
+    if not lines:
+        return []
+
+    if all(line.strip().startswith("|") for line in lines):
+        return [[_to_cell(cell) for cell in line.strip().strip("|").split("|")]
+                for line in lines if not _MD_SEPARATOR.match(line.strip())]
+
+    text = "\n".join(lines)
+    if text.count('"') % 2 == 0:
+        try:
+            return [[_to_cell(cell) for cell in row] for row in csv.reader(io.StringIO(text), skipinitialspace=True) if row]
+        except csv.Error:
+            pass
+    return [[_to_cell(cell.strip('"')) for cell in line.split(",")] for line in lines]
+
+def _fit_cell(value):
+    """ข้อความยาวเกินที่ Excel เก็บได้ใน 1 ช่อง -> ตัดท้ายแล้วต่อ TRUNCATED_MARKER | Return: (ค่า, ถูกตัดหรือไม่)"""
+    if isinstance(value, str) and len(value) > EXCEL_MAX_CELL_CHARS:
+        return value[:EXCEL_MAX_CELL_CHARS - len(TRUNCATED_MARKER)] + TRUNCATED_MARKER, True
+    return value, False
+
+def _table_rows(data):
+    """ตาราง (CSV String หรือ list ของแถว) -> list ของแถวที่พร้อมเขียน"""
+    if isinstance(data, str) or data is None:
+        return parse_csv_rows(data or "")
+    return [[_to_cell(str(cell)) for cell in row] for row in data if row]
+
+def _limit_warnings(page, table, row_count, truncated, single_sheet):
+    """ข้อความเตือนเมื่อตารางเกินขีดจำกัดของ Excel (ใช้ร่วมกันระหว่างตอนเขียนไฟล์กับ excel_limit_warnings)"""
+    warnings = []
+    if row_count > EXCEL_MAX_ROWS and not single_sheet:
+        sheets = -(-row_count // EXCEL_MAX_ROWS)
+        warnings.append(f"หน้า {page} ตาราง {table}: {row_count:,} แถว เกิน {EXCEL_MAX_ROWS:,} แถวต่อ Sheet - แบ่งเป็น {sheets} Sheet (Sheet ต่อมีชื่อลงท้าย (2), (3), ...)")
+    if truncated:
+        warnings.append(f"หน้า {page} ตาราง {table}: {truncated} ช่องยาวเกิน {EXCEL_MAX_CELL_CHARS:,} ตัวอักษร - ตัดท้ายและใส่เครื่องหมาย \"{TRUNCATED_MARKER.strip()}\"")
+    return warnings
+
+def excel_limit_warnings(tables, single_sheet=False):
+    """
+    ตรวจล่วงหน้าว่าตารางจะเกินขีดจำกัดของ Excel หรือไม่ (ไม่สร้างไฟล์) - ข้อความเดียวกับที่ write_tables_xlsx เตือน
+    tables: iterable ของ (หน้า, ตารางที่, ตาราง) แบบเดียวกับ write_tables_xlsx
+    """
+    warnings = []
+    for page, table, data in tables:
+        rows = _table_rows(data)
+        truncated = sum(1 for row in rows for cell in row if isinstance(cell, str) and len(cell) > EXCEL_MAX_CELL_CHARS)
+        warnings.extend(_limit_warnings(page, table, len(rows), truncated, single_sheet))
+    return warnings
+
+def _sheet_name(name, used, suffix=""):
+    """ชื่อ Sheet ที่ Excel ยอมรับ (ไม่เกิน 31 ตัว, ไม่มีอักขระต้องห้าม, ไม่ซ้ำ) | suffix: ต่อท้ายเสมอแม้ชื่อยาว (เช่น " (2)")"""
+    base = (_INVALID_SHEET_CHARS.sub("_", name)[:SHEET_NAME_MAX - len(suffix)] or "Sheet") + suffix
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f"~{n}"
+        candidate = base[:SHEET_NAME_MAX - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+def write_tables_xlsx(tables, single_sheet=False, sheet_name=None, empty_message="No valid table data found", warnings=None):
+    """
+    เขียนตารางเป็นไฟล์ .xlsx (Return: BytesIO)
+    - tables: iterable ของ (หน้า, ตารางที่, ตาราง) เลขเริ่มที่ 1 (เป็น Generator ได้)
+      ตาราง = CSV String หรือ list ของแถว (จากโหมด Structured ไม่ต้อง Parse ซ้ำ)
+    - single_sheet=False: 1 ตาราง = 1 Sheet (ชื่อจาก sheet_name(หน้า, ตารางที่))
+    - single_sheet=True: รวมทุกตารางไว้ Sheet เดียว มีคอลัมน์ หน้า/ตาราง/แถว นำหน้า
+    - แถวเกินจำนวนสูงสุดของ Excel ขึ้น Sheet ต่อให้อัตโนมัติ เช่น "P1_Table1 (2)" / "Tables (2)"
+    - warnings: (ไม่บังคับ) list ที่จะเพิ่มข้อความเตือนเมื่อแบ่ง Sheet หรือตัดช่องที่ยาวเกิน
+    """
+    sheet_name = sheet_name or (lambda page, table: f"P{page}_Table{table}")
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True})
+    bold = workbook.add_format({"bold": True})
+    used_names = set()
+    written = 0
+
+    consolidated = None
+    row_idx = 0
+
+    consolidated_count = 0
+
+    def new_consolidated_sheet():
+        nonlocal consolidated_count
+        consolidated_count += 1
+        suffix = f" ({consolidated_count})" if consolidated_count > 1 else ""
+        ws = workbook.add_worksheet(_sheet_name("Tables", used_names, suffix))
+        ws.write_row(0, 0, ["หน้า", "ตาราง", "แถว", "ข้อมูล"], bold)
+        ws.freeze_panes(1, 3)
+        return ws
+
+    for page, table, data in tables:
+        rows = _table_rows(data)
+        if not rows:
+            continue
+        written += 1
+        truncated = 0
+        if single_sheet:
+            if consolidated is None:
+                consolidated, row_idx = new_consolidated_sheet(), 1
+            for n, row in enumerate(rows, 1):
+                if row_idx >= EXCEL_MAX_ROWS:
+                    consolidated, row_idx = new_consolidated_sheet(), 1
+                fitted = [_fit_cell(cell) for cell in row]
+                truncated += sum(1 for _, cut in fitted if cut)
+                consolidated.write_row(row_idx, 0, [page, table, n] + [cell for cell, _ in fitted], bold if n == 1 else None)
+                row_idx += 1
+        else:
+            name = sheet_name(page, table)
+            for start in range(0, len(rows), EXCEL_MAX_ROWS):
+                part = start // EXCEL_MAX_ROWS + 1
+                ws = workbook.add_worksheet(_sheet_name(name, used_names, f" ({part})" if part > 1 else ""))
+                for r, row in enumerate(rows[start:start + EXCEL_MAX_ROWS]):
+                    fitted = [_fit_cell(cell) for cell in row]
+                    truncated += sum(1 for _, cut in fitted if cut)
+                    ws.write_row(r, 0, [cell for cell, _ in fitted], bold if start == 0 and r == 0 else None)
+        if warnings is not None:
+            warnings.extend(_limit_warnings(page, table, len(rows), truncated, single_sheet))
+
+    if not written:
+        ws = workbook.add_worksheet("NoTables")
+        ws.write(0, 0, "Message", bold)
+        ws.write(1, 0, empty_message)
+
+    workbook.close()
+    buffer.seek(0)
+    return buffer
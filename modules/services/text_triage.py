@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from modules.services.thai_font_remap import remap_page
+from modules.services.page_source import FITZ_LOCK
+
+# --- ช่วงอักขระไทยที่ใช้ตรวจลำดับสระ/วรรณยุกต์ ---
+THAI_CONSONANTS = set(chr(c) for c in range(0x0E01, 0x0E2F))      # ก - ฮ
+LEADING_VOWELS = set("เแโใไ")                                     # สระหน้า ต้องตามด้วยพยัญชนะ
+ABOVE_BELOW_VOWELS = set("ัิีึืฺุู")  # ั ิ ี ึ ื ุ ู ฺ
+TONE_MARKS = set("็่้๊๋์ํ๎")          # ็ ่ ้ ๊ ๋ ์ ํ ๎
+
+# ค่าเริ่มต้นของการคัดกรอง
+GARBLE_THRESHOLD = 0.05   # สัดส่วนอักขระผิดปกติที่ยอมรับได้
+MIN_TEXT_CHARS = 20       # ต่ำกว่านี้ถือว่าเป็นหน้าสแกน (ไม่มี Text Layer)
+
+# ภาษาไทย cp874 ที่ถูกอ่านเป็น Latin-1 จะเป็นอักขระ 0xA1-0xFF ติดกันยาว (เช่น "ÊÇÑÊ´Õ")
+# ต่างจากภาษายุโรปปกติ (ฝรั่งเศส/เยอรมัน) ที่มีตัวเน้นเสียงแทรกอยู่ในคำทีละตัวสองตัว
+_MOJIBAKE_RUN = re.compile(r"[\xa1-\xff]{3,}")
+_THAI_CHAR = re.compile(r"[\u0e01-\u0e5b]")
+
+def _is_suspicious_char(ch, latin1_suspicious=True):
+    """
+    อักขระที่ไม่ควรพบในข้อความปกติ (มักมาจากฟอนต์ Legacy)
+    latin1_suspicious=False: ตัวอักษร Latin-1 (é, ü, ç ...) ถือว่าปกติ ใช้กับหน้าภาษายุโรปที่ไม่มีร่องรอยภาษาไทย
+    """
+    code = ord(ch)
+    if 0xE000 <= code <= 0xF8FF:        # Private Use Area (เช่น ฟอนต์ไทยแบบเก่า)
+        return True
+    if ch == "�":                  # Replacement Character
+        return True
+    if 0x80 <= code <= 0xFF and latin1_suspicious and ch not in " °©®·":
+        # ภาษาไทยที่ถูกเข้ารหัสผิดเป็น Latin-1 เช่น "ÊÇÑÊ´Õ"
+        return True
+    if unicodedata.category(ch) == "Cc" and ch not in "\n\r\t":
+        return True
+    return False
+
+def garble_score(text):
+    """
+    ให้คะแนนความเพี้ยนของข้อความ (0 = ปกติ, 1 = อ่านไม่ได้)
+    นับ: อักขระแปลก (PUA/Latin-1/Replacement) + ลำดับสระ-วรรณยุกต์ไทยที่ผิดหลัก
+    Latin-1 นับเป็นอักขระแปลกเฉพาะหน้าที่มีภาษาไทย หรือมีลักษณะภาษาไทยที่ถอดรหัสผิด (cp874 -> Latin-1)
+    """
+    chars = [ch for ch in text if not ch.isspace()]
+    if not chars:
+        return 1.0
+    latin1_suspicious = bool(_THAI_CHAR.search(text) or _MOJIBAKE_RUN.search(text))
+
+    bad = 0
+    prev = ""
+    for i, ch in enumerate(chars):
+        if _is_suspicious_char(ch, latin1_suspicious):
+            bad += 1
+        elif ch in ABOVE_BELOW_VOWELS:
+            # สระบน/ล่าง ต้องตามหลังพยัญชนะ
+            if prev not in THAI_CONSONANTS:
+                bad += 1
+        elif ch in TONE_MARKS:
+            # วรรณยุกต์ ต้องตามหลังพยัญชนะหรือสระบน/ล่าง และห้ามซ้อนกัน
+            if prev not in THAI_CONSONANTS and prev not in ABOVE_BELOW_VOWELS:
+                bad += 1
+        elif ch == "ำ":
+            # สระอำ ต้องตามหลังพยัญชนะหรือวรรณยุกต์
+            if prev not in THAI_CONSONANTS and prev not in TONE_MARKS:
+                bad += 1
+        if prev in LEADING_VOWELS and ch not in THAI_CONSONANTS:
+            bad += 1
+        prev = ch
+
+    return min(bad / len(chars), 1.0)
+
+def triage_page(page, threshold=GARBLE_THRESHOLD, remap=False):
+    """
+    ตรวจ Text Layer ของหน้า PDF (fitz.Page)
+    remap=True: ถ้าหน้าเพี้ยน ลองแปลงฟอนต์ไทยแบบเก่าในเครื่องก่อน ถ้าผ่านเกณฑ์ก็ไม่ต้องส่ง AI
+    Return: dict {"text", "score", "needs_ai", "remapped"}
+    """
+    text = page.get_text()
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return {"text": text, "score": 1.0, "needs_ai": True, "remapped": False}
+
+    score = garble_score(text)
+    if score > threshold and remap:
+        remapped_text, changed = remap_page(page)
+        if changed:
+            remapped_score = garble_score(remapped_text)
+            if remapped_score <= threshold:
+                return {"text": remapped_text, "score": remapped_score, "needs_ai": False, "remapped": True}
+
+    return {"text": text, "score": score, "needs_ai": score > threshold, "remapped": False}
+
+def triage_document(doc, page_numbers=None, threshold=GARBLE_THRESHOLD, remap=False):
+    """ตรวจหลายหน้า คืน list ผลตามลำดับ page_numbers"""
+    if page_numbers is None:
+        page_numbers = range(len(doc))
+    results = []
+    for n in page_numbers:
+        # ล็อกทีละหน้า ให้ Thread อื่น (เช่น Render ภาพตัวอย่าง) แทรกได้ระหว่างตรวจเอกสารยาว
+        with FITZ_LOCK:
+            results.append(triage_page(doc.load_page(n), threshold, remap))
+    return results
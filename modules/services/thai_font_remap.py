@@ -0,0 +1,90 @@
+import re
+
+# --- ตารางแปลงฟอนต์ไทยแบบเก่า (Legacy Font Encoding) ---
+
+# 1) ฟอนต์ตระกูล DSE / PSL / ฟอนต์ราชการรุ่นเก่า ที่เอารหัส Windows-874 (TIS-620)
+#    มาวางทับช่อง Latin-1 ทำให้ PDF เก็บ "ÊÇÑÊ´Õ" แทน "สวัสดี"
+CP874_LATIN1_MAP = {}
+for _code in range(0xA1, 0x100):
+    try:
+        CP874_LATIN1_MAP[chr(_code)] = bytes([_code]).decode("cp874")
+    except UnicodeDecodeError:
+        pass  # ช่องที่ Windows-874 ไม่ได้กำหนดไว้ ปล่อยตามเดิม
+
+# 2) ฟอนต์ไทยของ Windows/Office ที่ใช้ Private Use Area (U+F700-U+F71A)
+#    แทนรูปสระ/วรรณยุกต์ที่ถูกเลื่อนตำแหน่ง (เช่น วรรณยุกต์ตัวต่ำ, ญ/ฐ ไม่มีเชิง)
+MS_THAI_PUA_MAP = {
+    "\uf700": "ฐ", "\uf701": "ิ", "\uf702": "ี", "\uf703": "ึ", "\uf704": "ื",
+    "\uf705": "่", "\uf706": "้", "\uf707": "๊", "\uf708": "๋", "\uf709": "์",
+    "\uf70a": "่", "\uf70b": "้", "\uf70c": "๊", "\uf70d": "๋", "\uf70e": "์",
+    "\uf70f": "ญ", "\uf710": "ั", "\uf711": "ํ", "\uf712": "็",
+    "\uf713": "่", "\uf714": "้", "\uf715": "๊", "\uf716": "๋", "\uf717": "์",
+    "\uf718": "ุ", "\uf719": "ู", "\uf71a": "ฺ",
+}
+
+# ชื่อฟอนต์ที่รู้แน่ว่าเป็นแบบ Windows-874-on-Latin-1 (ใช้ตารางที่ 1 ทั้ง span)
+LEGACY_CP874_FONTS = re.compile(r"DSE|PSL|\bSP[A-Z]|Thai[_-]?Old|KodchiangUPC-?Legacy", re.IGNORECASE)
+
+_LATIN1_HIGH = re.compile(r"[\u00a1-\u00ff]")
+_THAI = re.compile(r"[\u0e01-\u0e5b]")
+
+def _looks_like_cp874(text):
+    """span ที่ไม่มีอักษรไทยเลย แต่เต็มไปด้วยอักขระ Latin-1 ช่วงบน = น่าจะเป็นไทยที่เข้ารหัสผิด"""
+    if _THAI.search(text):
+        return False
+    letters = [ch for ch in text if not ch.isspace() and not ch.isdigit()]
+    if not letters:
+        return False
+    return len(_LATIN1_HIGH.findall(text)) / len(letters) >= 0.5
+
+def normalize_thai(text):
+    """จัดลำดับสระ/วรรณยุกต์ที่ฟอนต์เก่ามักเก็บผิด ให้เป็น Unicode มาตรฐาน"""
+    # นิคหิต + (วรรณยุกต์) + สระอา  ->  (วรรณยุกต์) + สระอำ   เช่น "นํ้า" -> "น้ำ"
+    text = re.sub(r"\u0e4d([\u0e48-\u0e4b]?)\u0e32", "\\1\u0e33", text)
+    # วรรณยุกต์ก่อนสระบน/ล่าง -> สลับให้สระมาก่อน  เช่น "ก่ิ" -> "กิ่"
+    text = re.sub(r"([\u0e48-\u0e4c])([\u0e31\u0e34-\u0e3a])", r"\2\1", text)
+    # วรรณยุกต์ซ้ำติดกัน (จากรูปตัวต่ำ+ตัวปกติซ้อนกัน) เหลือตัวเดียว
+    text = re.sub(r"([\u0e48-\u0e4c])\1+", r"\1", text)
+    return text
+
+def remap_text(text, font_name=""):
+    """
+    แปลงข้อความของ span หนึ่งกลับเป็น Unicode ไทยตามตารางของฟอนต์
+    Return: (ข้อความใหม่, จำนวนอักขระที่ถูกแปลง)
+    """
+    changed = 0
+    out = []
+    use_cp874 = bool(LEGACY_CP874_FONTS.search(font_name or "")) or _looks_like_cp874(text)
+
+    for ch in text:
+        if ch in MS_THAI_PUA_MAP:
+            out.append(MS_THAI_PUA_MAP[ch])
+            changed += 1
+        elif use_cp874 and ch in CP874_LATIN1_MAP:
+            out.append(CP874_LATIN1_MAP[ch])
+            changed += 1
+        else:
+            out.append(ch)
+
+    new_text = "".join(out)
+    if changed:
+        new_text = normalize_thai(new_text)
+    return new_text, changed
+
+def remap_page(page):
+    """
+    อ่าน Text Layer ของหน้า (fitz.Page) ทีละ span พร้อมชื่อฟอนต์ แล้วแปลงด้วย remap_text
+    Return: (ข้อความทั้งหน้า, จำนวนอักขระที่ถูกแปลง)
+    """
+    lines_out = []
+    total_changed = 0
+    for block in page.get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            parts = []
+            for span in line.get("spans", []):
+                text, changed = remap_text(span.get("text", ""), span.get("font", ""))
+                parts.append(text)
+                total_changed += changed
+            lines_out.append("".join(parts))
+        lines_out.append("")  # เว้นบรรทัดระหว่าง block
+    return "\n".join(lines_out).strip(), total_changed
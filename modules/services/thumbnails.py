@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import io
+import os
+import re
+import threading
+
+import fitz  # PyMuPDF
+from PIL import Image
+from modules.services.page_source import FITZ_LOCK
+
+# ภาพตัวอย่างหน้า PDF (เก็บเป็น JPEG ขนาดเล็กในหน่วยความจำ ใช้ร่วมกันทุก Session)
+THUMB_DPI = 72
+THUMB_MAX_DIM = 320
+THUMB_QUALITY = 70
+MAX_THUMB_BYTES = int(os.environ.get("SMART_DOC_THUMB_CACHE_MB", "64")) * 1024 * 1024
+
+class ThumbnailCache:
+    """LRU ของ JPEG bytes ตาม (file_hash, เลขหน้า) จำกัดขนาดรวมเป็น bytes"""
+    def __init__(self, max_bytes=MAX_THUMB_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._items[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes and len(self._items) > 1:
+                _, evicted = self._items.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+def render_thumbnail(page):
+    """Render หน้าเดียวเป็น JPEG bytes ขนาดเล็ก"""
+    pix = page.get_pixmap(dpi=THUMB_DPI)
+    img = Image.open(io.BytesIO(pix.tobytes()))
+    img.thumbnail((THUMB_MAX_DIM, THUMB_MAX_DIM))
+    buffer = io.BytesIO()
+    img.convert("RGB").save(buffer, format="JPEG", quality=THUMB_QUALITY)
+    return buffer.getvalue()
+
+def get_thumbnails(pdf_bytes, data_hash, page_numbers, cache=None, doc=None):
+    """
+    ภาพตัวอย่าง (JPEG bytes) ของหน้าที่ขอ เรียงตาม page_numbers
+    Render เฉพาะหน้าที่ยังไม่อยู่ใน Cache (เปิดไฟล์ก็ต่อเมื่อจำเป็น)
+    - doc: เอกสารที่เปิดไว้แล้ว (เช่นจาก DocumentHandle) ถ้ามีจะใช้ตัวนี้แทนการเปิดจาก pdf_bytes
+    """
+    cache = cache or get_thumbnail_cache()
+    thumbs = [cache.get((data_hash, n)) for n in page_numbers]
+    missing = [i for i, data in enumerate(thumbs) if data is None]
+    if missing:
+        owned = doc is None
+        # fitz ไม่ thread-safe: ถือ Lock กลางตลอดการ Render (ดู FITZ_LOCK)
+        with FITZ_LOCK:
+            if owned:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            try:
+                for i in missing:
+                    thumbs[i] = render_thumbnail(doc.load_page(page_numbers[i]))
+                    cache.put((data_hash, page_numbers[i]), thumbs[i])
+            finally:
+                if owned:
+                    doc.close()
+    return thumbs
+
+_RANGE_PART = re.compile(r"^(\d*)\s*-\s*(\d*)$")
+
+def parse_page_ranges(expr, page_count):
+    """
+    แปลงข้อความช่วงหน้า เช่น "1-20, 35, 40-" เป็น list เลขหน้าแบบ 0-based (เรียง/ไม่ซ้ำ)
+    - "40-" = หน้า 40 ถึงหน้าสุดท้าย | "-5" = หน้า 1 ถึง 5
+    Raise: ValueError (ข้อความภาษาไทย) ถ้ารูปแบบผิดหรือเลขหน้าเกินจำนวนหน้า
+    """
+    pages = set()
+    for part in expr.replace(" ", "").split(","):
+        if not part:
+            continue
+        if part.isdigit():
+            start = end = int(part)
+        else:
+            match = _RANGE_PART.match(part)
+            if not match or not (match.group(1) or match.group(2)):
+                raise ValueError(f"รูปแบบช่วงหน้าไม่ถูกต้อง: '{part}'")
+            start = int(match.group(1)) if match.group(1) else 1
+            end = int(match.group(2)) if match.group(2) else page_count
+        if start < 1 or end > page_count or start > end:
+            raise ValueError(f"ช่วงหน้า '{part}' อยู่นอกช่วง 1-{page_count}")
+        pages.update(range(start - 1, end))
+    return sorted(pages)
+
+def format_page_ranges(page_numbers):
+    """list เลขหน้า 0-based -> ข้อความแบบย่อ เช่น [0,1,2,4] -> "1-3,5" """
+    parts = []
+    run_start = prev = None
+    for n in sorted(page_numbers):
+        if prev is not None and n == prev + 1:
+            prev = n
+            continue
+        if run_start is not None:
+            parts.append(f"{run_start + 1}-{prev + 1}" if prev > run_start else f"{run_start + 1}")
+        run_start = prev = n
+    if run_start is not None:
+        parts.append(f"{run_start + 1}-{prev + 1}" if prev > run_start else f"{run_start + 1}")
+    return ",".join(parts)
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+def get_thumbnail_cache():
+    """Cache ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ThumbnailCache()
+        return _shared_cache
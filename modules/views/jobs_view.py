@@ -0,0 +1,78 @@
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from modules.services.job_runner import get_job_runner, STATUS_LABELS
+
+# ความถี่ในการเช็คสถานะงานเบื้องหลัง (วินาที)
+POLL_SECONDS = 2
+
+def get_session_owner():
+    """ระบุเจ้าของงาน = Session ของผู้ใช้ปัจจุบัน"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else "local"
+
+def submit_background_job(kind, title, fn, *args, resource=None, **kwargs):
+    """ส่งงานเข้าคิวเบื้องหลังในนามผู้ใช้ปัจจุบัน | resource: ดู JobRunner.submit"""
+    job_id = get_job_runner().submit(get_session_owner(), kind, title, fn, *args, resource=resource, **kwargs)
+    st.toast(f"🕒 ส่งงาน '{title}' เข้าคิวแล้ว - ใช้เมนูอื่นต่อระหว่างรอได้เลย")
+    return job_id
+
+def _render_job_list(kind, on_open, polling):
+    runner = get_job_runner()
+    jobs = runner.list_jobs(get_session_owner(), kind)
+    active = [j for j in jobs if not j.is_finished]
+
+    # งานเพิ่งเสร็จหมด: Rerun ทั้งหน้าเพื่อหยุด Polling
+    if polling and not active:
+        st.rerun()
+
+    for job in jobs:
+        col_info, col_action = st.columns([4, 1])
+        with col_info:
+            st.markdown(f"**{job.title}** · {STATUS_LABELS[job.status]}")
+            if job.status == "running":
+                st.progress(min(job.fraction, 1.0), text=job.message or None)
+                if job.preview:
+                    with st.expander("👁️ ผลลัพธ์ระหว่างทำงาน"):
+                        st.markdown(job.preview, unsafe_allow_html=True)
+            elif job.status == "failed":
+                st.caption(f"❌ {job.error}")
+        with col_action:
+            if job.status == "queued":
+                if st.button("ยกเลิก", key=f"job_cancel_{job.id}", use_container_width=True):
+                    runner.cancel(job.id)
+            elif job.status == "done":
+                if st.button("📂 เปิดผลลัพธ์", key=f"job_open_{job.id}", type="primary", use_container_width=True):
+                    on_open(job.result)
+                    st.rerun()
+            elif job.is_finished:
+                if st.button("🗑️ ลบ", key=f"job_remove_{job.id}", use_container_width=True):
+                    runner.remove(job.id)
+                    st.rerun()
+
+def render_jobs_panel(kind, on_open):
+    """
+    รายการงานเบื้องหลังของผู้ใช้ (เฉพาะประเภท kind)
+    on_open(result): เรียกเมื่อกดเปิดผลลัพธ์ของงานที่เสร็จแล้ว (เอาผลใส่ Session State)
+    """
+    jobs = get_job_runner().list_jobs(get_session_owner(), kind)
+    if not jobs:
+        return
+    polling = any(not j.is_finished for j in jobs)
+    with st.expander(f"🗂️ งานเบื้องหลัง ({len(jobs)})", expanded=polling):
+        # ระหว่างมีงานค้าง ให้ส่วนนี้ Refresh ตัวเองเป็นระยะ (ไม่ Rerun ทั้งหน้า)
+        st.fragment(_render_job_list, run_every=POLL_SECONDS if polling else None)(kind, on_open, polling)
+
+def _render_sidebar_status():
+    jobs = [j for j in get_job_runner().list_jobs(get_session_owner()) if not j.is_finished]
+    if not jobs:
+        # งานเสร็จหมดแล้ว: Rerun ทั้งหน้าเพื่อหยุด Polling และให้หน้าอื่นเห็นผลลัพธ์
+        st.rerun()
+    st.caption(f"🗂️ งานเบื้องหลัง {len(jobs)} งาน")
+    for job in jobs:
+        st.progress(min(job.fraction, 1.0), text=f"{job.title} · {STATUS_LABELS[job.status]}")
+
+def render_jobs_sidebar():
+    """สรุปงานที่กำลังทำใน Sidebar (เห็นได้จากทุกเมนู)"""
+    if all(j.is_finished for j in get_job_runner().list_jobs(get_session_owner())):
+        return
+    st.fragment(_render_sidebar_status, run_every=POLL_SECONDS)()
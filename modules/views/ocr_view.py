@@ -1,130 +1,215 @@
 import streamlit as st
-import google.generativeai as genai
-import fitz  # PyMuPDF
-from PIL import Image
-import io
-from docx import Document
-import re
-import pandas as pd
-
-def get_available_models(api_key):
-    try:
-        genai.configure(api_key=api_key)
-        all_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        return all_models
-    except:
-        return []
+from modules.services.ocr_engine import run_pipeline, StageTimings, DEFAULT_WORKERS, MAX_WORKERS, ENCODE_WORKERS
+from modules.services.ocr_cache import get_ocr_cache, CacheStats
+from modules.services.ocr_service import (
+    OCR_PROMPT, OCR_JSON_PROMPT, parse_ai_response, ocr_single_image, run_ocr_pages, error_to_dict, split_ocr_results
+)
+from modules.services.document_export import create_word_docx, create_excel_from_tables, ocr_tables
+from modules.services.table_export import excel_limit_warnings
+from modules.services.page_source import PdfPageSource
+from modules.services.document_cache import get_document_cache
+from modules.services.export_cache import get_export_cache, text_fingerprint, tables_fingerprint, combine_fingerprints
+from modules.services.ai_service import list_available_models
+from modules.services.image_encoder import encode_image, ENCODING_PRESETS, PRESET_LABELS, DEFAULT_PRESET
+from modules.services.page_packing import AdaptivePacker
+from modules.services.job_store import get_job_store, file_hash, make_job_id, JobBusyError
+from modules.services.job_runner import get_job_runner
+from modules.views.jobs_view import submit_background_job, render_jobs_panel
+from modules.views.page_picker import render_page_picker
+
+def ocr_job_options(encoding=None, adaptive_dpi=False, max_pack=None, structured=False):
+    """ตัวเลือกที่มีผลต่อผลลัพธ์ OCR (ใช้สร้าง Job ID: เปลี่ยนตัวเลือก = งานใหม่)"""
+    return {
+        "prompt": text_fingerprint(OCR_JSON_PROMPT if structured else OCR_PROMPT),
+        "structured": bool(structured),
+        "encoding": encoding,
+        "adaptive_dpi": bool(adaptive_dpi),
+        "max_pack": None if structured else max_pack,
+    }
+
+def ocr_job_id(data_hash, model_name, page_numbers, run_options):
+    """Job ID ของ Checkpoint ที่ run_ocr_job จะใช้ (run_options: kwargs เดียวกับที่ส่งให้ run_ocr_job)"""
+    options = ocr_job_options(**{k: v for k, v in run_options.items() if k != "num_workers"})
+    return make_job_id(data_hash, model_name, page_numbers, options)
+
+def run_ocr_job(api_key, model_name, pdf_bytes, page_numbers, file_name, progress_bar,
+                num_workers=DEFAULT_WORKERS, encoding=None, adaptive_dpi=False, max_pack=None, structured=False):
+    """
+    รันงาน OCR แบบมี Checkpoint รายหน้า
+    - Job ID มาจาก (ไฟล์ + โมเดล + ชุดหน้า + Prompt/โหมด/การบีบอัดภาพ/การรวมหน้า)
+      ถ้าเคยรันค้างไว้ จะข้ามหน้าที่เสร็จแล้วอัตโนมัติ / งานที่เคยเสร็จแล้ว สั่งรันซ้ำ = เริ่มใหม่ทั้งหมด
+    - max_pack: จำนวนหน้าสูงสุดต่อ Request (None = ส่งทีละหน้า)
+    - structured: ให้ AI ตอบเป็น JSON (ตารางเป็นแถว/ช่องตรงๆ) ส่งทีละหน้าเสมอ
+    - ส่งทีละหน้า: ทำเป็น Pipeline render -> encode -> upload -> parse ให้แต่ละขั้นทำงานซ้อนกัน
+    - ระหว่างรันถือ Lease ของ Job ไว้: อีกตัวที่สั่งรันงานเดียวกันพร้อมกันจะได้ JobBusyError
+    Return: (texts, tables, errors, cache_stats, timings) เรียงตาม page_numbers
+    """
+    store = get_job_store()
+    data_hash = file_hash(pdf_bytes)
+    options = ocr_job_options(encoding, adaptive_dpi, max_pack, structured)
+    job_id = make_job_id(data_hash, model_name, page_numbers, options)
+    # จองงานก่อน: ถ้ามีอีกตัว (เช่น งานเบื้องหลัง) ใช้ Checkpoint นี้อยู่ จะ Raise JobBusyError
+    with store.lease(job_id):
+        meta = store.load_meta(job_id)
+        if meta and meta.get("completed"):
+            # Resume ใช้กับงานที่ค้างเท่านั้น
+            store.reset(job_id)
+        # run_options: ตัวเลือกที่ใช้ Resume ให้ได้ Job ID เดิม (แม้ตัวเลือกบนหน้าจอจะเปลี่ยนไปแล้ว)
+        run_options = {"encoding": encoding, "adaptive_dpi": bool(adaptive_dpi), "max_pack": options["max_pack"], "structured": bool(structured)}
+        store.create(job_id, {"file_hash": data_hash, "file_name": file_name, "model": model_name, "page_numbers": list(page_numbers), "run_options": run_options})
+
+        done_pages = store.load_pages(job_id)
+        remaining = [pos for pos in range(len(page_numbers)) if pos not in done_pages]
+        total = len(page_numbers)
+        already_done = total - len(remaining)
+
+        def report(done, _total):
+            progress_bar.progress((already_done + done) / total, text=f"🔍 อ่านเสร็จแล้ว {already_done + done}/{total} หน้า...")
+
+        cache = get_ocr_cache()
+        cache_stats = CacheStats()
+        timings = StageTimings()
+        with PdfPageSource(pdf_bytes, dpi=150, adaptive_dpi=adaptive_dpi) as source:
+            if max_pack and not structured:
+                def checkpoint(i, raw_text):
+                    clean_text, page_tables = parse_ai_response(raw_text)
+                    store.save_page(job_id, remaining[i], clean_text, page_tables)
+
+                packer = AdaptivePacker(initial=max_pack, max_size=max_pack)
+                raw_responses = run_ocr_pages(
+                    api_key, model_name, source.iter_pages([page_numbers[pos] for pos in remaining]), num_workers, report,
+                    cache, cache_stats, encoding, packer, on_page_done=checkpoint
+                )
+                new_texts, new_tables, new_errors = split_ocr_results(raw_responses)
+                timings = None
+            else:
+                def render(pos):
+                    return pos, source.render(page_numbers[pos])
+
+                def encode(item):
+                    pos, image = item
+                    return pos, encode_image(image, encoding) if encoding else image
+
+                def upload(item):
+                    pos, image = item
+                    return pos, ocr_single_image(api_key, image, model_name, cache, cache_stats, structured=structured)
+
+                def parse(item):
+                    # Parse + Checkpoint ลงดิสก์ ทำซ้อนกับหน้าถัดไปที่ยังรอ AI อยู่
+                    pos, raw_text = item
+                    clean_text, page_tables = parse_ai_response(raw_text)
+                    store.save_page(job_id, pos, clean_text, page_tables)
+                    return clean_text, page_tables
+
+                stages = [
+                    ("render", render, 1),   # fitz ไม่ thread-safe
+                    ("encode", encode, ENCODE_WORKERS),
+                    ("upload", upload, num_workers),
+                    ("parse", parse, 1),
+                ]
+                parsed = run_pipeline(remaining, stages, queue_size=max(2, num_workers), on_progress=report, timings=timings)
+                new_texts, new_tables, new_errors = [], [], []
+                for page in parsed:
+                    if isinstance(page, Exception):
+                        new_texts.append("")
+                        new_tables.append([])
+                        new_errors.append(error_to_dict(page))
+                    else:
+                        new_texts.append(page[0])
+                        new_tables.append(page[1])
+                        new_errors.append(None)
+
+        # รวมผลจาก Checkpoint เดิม + รอบนี้ ตามลำดับหน้า
+        texts, tables, errors = [""] * total, [[]] * total, [None] * total
+        for pos, page in done_pages.items():
+            if pos < total:
+                texts[pos], tables[pos] = page["text"], page["tables"]
+        for i, pos in enumerate(remaining):
+            texts[pos], tables[pos], errors[pos] = new_texts[i], new_tables[i], new_errors[i]
+
+        if not any(errors):
+            store.mark_completed(job_id)
+        return texts, tables, errors, cache_stats, timings
+
+def save_ocr_results(pdf_bytes, page_numbers, file_id, texts, tables, errors, cache_stats, timings=None):
+    """เก็บผลลงใน Session State สำหรับส่วนแสดงผล"""
+    st.session_state['ocr_pdf_bytes'] = pdf_bytes
+    st.session_state['ocr_pdf_hash'] = file_hash(pdf_bytes)
+    st.session_state['ocr_page_numbers'] = list(page_numbers)
+    st.session_state['ocr_results_text'] = texts
+    st.session_state['ocr_results_tables'] = tables
+    # Fingerprint รายหน้า สำหรับ Cache ไฟล์ Export (แก้ข้อความหน้าไหน ค่อย Hash ใหม่เฉพาะหน้านั้น)
+    st.session_state['ocr_page_hashes'] = [text_fingerprint(t) for t in texts]
+    st.session_state['ocr_tables_hash'] = tables_fingerprint(tables)
+    st.session_state['ocr_page_errors'] = errors
+    st.session_state['ocr_cache_summary'] = cache_stats.summary()
+    st.session_state['ocr_timing_summary'] = timings.summary() if timings and timings.counts else None
+    st.session_state['processed_file_id'] = file_id
+    st.session_state['current_page_index'] = 0
 
-def parse_ai_response(raw_text):
+def open_ocr_job_result(result):
+    """เปิดผลของงานเบื้องหลังที่เสร็จแล้ว (เรียกจากแผงงานเบื้องหลัง)"""
+    save_ocr_results(result['pdf_bytes'], result['page_numbers'], result['file_id'], *result['results'])
+
+def start_ocr(background, api_key, model_name, pdf_bytes, page_numbers, uploaded_file, run_options):
     """
-    แยกเนื้อหา:
-    1. ข้อความทั่วไป (Clean Text) -> สำหรับ Word
-    2. ข้อมูลตาราง (CSV List) -> สำหรับ Excel
+    เริ่มงาน OCR
+    - background=True: ส่งเข้าคิวเบื้องหลัง (ผลลัพธ์เปิดได้จากแผงงานเบื้องหลัง)
+    - background=False: รันทันทีใน Script นี้พร้อม Progress Bar
     """
-    if not raw_text: 
-        return "", []
-
-    # Regex ค้นหาข้อความที่อยู่ระหว่าง [[TABLE]]...[[/TABLE]]
-    # re.DOTALL เพื่อให้ . ครอบคลุมบรรทัดใหม่ด้วย
-    table_pattern = re.compile(r'\[\[TABLE\]\](.*?)\[\[/TABLE\]\]', re.DOTALL)
-    
-    found_tables = []
-    
-    # ฟังก์ชันสำหรับแทนที่ตารางในข้อความหลักด้วย Marker
-    def replace_with_marker(match):
-        csv_content = match.group(1).strip()
-        if csv_content:
-            found_tables.append(csv_content)
-            return "\n[--- ตรวจพบตาราง: ดูรายละเอียดในไฟล์ Excel ---]\n"
-        return ""
-
-    # 1. สร้าง Clean Text (เอาตารางออกแล้วแปะป้ายแทน)
-    clean_text = table_pattern.sub(replace_with_marker, raw_text)
-    
-    # ล้างบรรทัดว่างส่วนเกิน
-    clean_text = re.sub(r'\n{3,}', '\n\n', clean_text).strip()
-
-    return clean_text, found_tables
-
-def ocr_single_image(api_key, image, model_name):
+    file_name, file_id = uploaded_file.name, uploaded_file.file_id
+    job_id = ocr_job_id(file_hash(pdf_bytes), model_name, page_numbers, run_options)
+    if get_job_runner().is_busy(job_id) or get_job_store().is_running(job_id):
+        st.error("⏳ งาน OCR นี้กำลังทำงานอยู่ในเบื้องหลัง - รอให้เสร็จแล้วเปิดผลจากแผงงานเบื้องหลัง")
+        return
+    if background:
+        def job_fn(job):
+            results = run_ocr_job(api_key, model_name, pdf_bytes, page_numbers, file_name, job, **run_options)
+            return {"pdf_bytes": pdf_bytes, "page_numbers": list(page_numbers), "file_id": file_id, "results": results}
+        submit_background_job("ocr", f"OCR {file_name} ({len(page_numbers)} หน้า)", job_fn, resource=job_id)
+        return
+
+    progress_bar = st.progress(0, text="กำลังเริ่ม OCR...")
     try:
-        genai.configure(api_key=api_key)
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        model = genai.GenerativeModel(model_name, safety_settings=safety_settings)
-        
-        # --- PROMPT สูตรพิเศษ: สั่งให้แยกตารางด้วยแท็ก ---
-        prompt = """
-        Analyze this image and extract content.
-        1. **Text**: Extract normal text with original layout.
-        2. **Tables**: If you see any data table, DO NOT format it as Markdown. 
-           Instead, convert it to CSV format and wrap it strictly within [[TABLE]] and [[/TABLE]] tags.
-           Example:
-           [[TABLE]]
-           Column1,Column2
-           Val1,Val2
-           [[/TABLE]]
-        3. **Thai Language**: Ensure high accuracy.
-        """
-        
-        response = model.generate_content([prompt, image])
-        
-        # ส่งค่ากลับเป็น Raw Text ก่อน เดี๋ยวไปแยกข้างนอก
-        return response.text
-        
-    except Exception as e:
-        return f"[Error: {str(e)}]"
-
-def create_word_docx(text_list):
-    doc = Document()
-    for i, text in enumerate(text_list):
-        doc.add_heading(f'Page {i+1}', level=1)
-        doc.add_paragraph(text)
-        doc.add_page_break()
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-def create_excel_from_tables(all_pages_tables):
+        results = run_ocr_job(api_key, model_name, pdf_bytes, page_numbers, file_name, progress_bar, **run_options)
+    except JobBusyError as e:
+        progress_bar.empty()
+        st.error(f"⏳ {e}")
+        return
+    save_ocr_results(pdf_bytes, page_numbers, file_id, *results)
+    progress_bar.progress(1.0, text="เสร็จเรียบร้อย! (พับกล่องนี้เพื่อดูผลลัพธ์)")
+    st.rerun()
+
+def get_ocr_docx(texts, page_hashes):
+    """ไฟล์ Word ของผล OCR (สร้างตอนกดดาวน์โหลด และสร้างใหม่เฉพาะเมื่อข้อความเปลี่ยน)"""
+    texts, page_hashes = list(texts), list(page_hashes)
+    key = ("ocr_docx", combine_fingerprints(page_hashes))
+    return get_export_cache().get_or_build(key, lambda: create_word_docx(texts).getvalue())
+
+def get_ocr_xlsx(tables, tables_hash, single_sheet=False):
+    """ไฟล์ Excel ของตารางทุกหน้า (สร้างตอนกดดาวน์โหลด ครั้งเดียวต่อชุดตาราง)"""
+    key = ("ocr_xlsx", tables_hash, single_sheet)
+    return get_export_cache().get_or_build(key, lambda: create_excel_from_tables(tables, single_sheet).getvalue())
+
+def get_ocr_xlsx_warnings(tables, tables_hash, single_sheet=False):
     """
-    all_pages_tables: list ของ list (แต่ละหน้าอาจมีหลายตาราง)
-    Format: [ [table1_p1, table2_p1], [table1_p2], ... ]
+    ตารางที่เกินขีดจำกัดของ Excel (แบ่ง Sheet / ตัดช่องที่ยาวเกิน) ตรวจก่อนกดดาวน์โหลด
+    เพราะไฟล์จริงถูกสร้างตอนกดเท่านั้น | จำผลไว้ตาม Hash ของตาราง ไม่ตรวจซ้ำทุก Rerun
     """
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        has_data = False
-        
-        for page_idx, tables in enumerate(all_pages_tables):
-            for table_idx, csv_data in enumerate(tables):
-                try:
-                    # แปลง CSV String เป็น DataFrame
-                    df = pd.read_csv(io.StringIO(csv_data))
-                    
-                    # ตั้งชื่อ Sheet: P1_T1 (หน้า 1 ตาราง 1)
-                    sheet_name = f"P{page_idx+1}_Table{table_idx+1}"
-                    
-                    # เขียนลง Excel
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    has_data = True
-                except:
-                    pass
-        
-        if not has_data:
-            pd.DataFrame({"Message": ["ไม่พบตารางในเอกสาร"]}).to_excel(writer, sheet_name="NoTables")
-            
-    buffer.seek(0)
-    return buffer
+    key = (tables_hash, single_sheet)
+    cached = st.session_state.get('ocr_xlsx_warnings')
+    if not cached or cached[0] != key:
+        cached = (key, excel_limit_warnings(ocr_tables(tables), single_sheet))
+        st.session_state['ocr_xlsx_warnings'] = cached
+    return cached[1]
 
 def render_ocr_mode():
     # --- Session State ---
     if 'ocr_results_text' not in st.session_state: st.session_state['ocr_results_text'] = [] 
     if 'ocr_results_tables' not in st.session_state: st.session_state['ocr_results_tables'] = [] 
-    if 'ocr_images' not in st.session_state: st.session_state['ocr_images'] = []
+    # เก็บแค่ PDF ต้นฉบับ + เลขหน้า (ไม่เก็บภาพ) แล้ว Render หน้าที่ดูอยู่ใหม่ตอนแสดงผล
+    if 'ocr_pdf_bytes' not in st.session_state: st.session_state['ocr_pdf_bytes'] = None
+    if 'ocr_page_numbers' not in st.session_state: st.session_state['ocr_page_numbers'] = []
     if 'current_page_index' not in st.session_state: st.session_state['current_page_index'] = 0
     if 'processed_file_id' not in st.session_state: st.session_state['processed_file_id'] = None
 
@@ -141,7 +226,7 @@ def render_ocr_mode():
         with col_model:
             selected_model = None
             if api_key:
-                model_options = get_available_models(api_key)
+                model_options = list_available_models(api_key)
                 if model_options:
                     default_idx = 0
                     for i, name in enumerate(model_options):
@@ -149,13 +234,51 @@ def render_ocr_mode():
                             default_idx = i; break
                     selected_model = st.selectbox("🤖 เลือก AI Model", model_options, index=default_idx)
 
+        col_workers, col_encoding = st.columns([1, 1])
+        with col_workers:
+            num_workers = st.slider("⚡ จำนวนหน้าที่ส่ง AI พร้อมกัน (Workers)", 1, MAX_WORKERS, DEFAULT_WORKERS, key="ocr_workers")
+        with col_encoding:
+            preset = st.selectbox("🗜️ บีบอัดภาพก่อนส่ง AI", list(ENCODING_PRESETS), index=list(ENCODING_PRESETS).index(DEFAULT_PRESET), format_func=PRESET_LABELS.get, key="ocr_encoding")
+            adaptive_dpi = st.checkbox("🔎 ปรับ DPI ตามขนาดตัวอักษร (Adaptive DPI)", key="ocr_adaptive_dpi")
+        encoding = ENCODING_PRESETS[preset]
+
+        structured = st.toggle("🧱 ผลลัพธ์แบบโครงสร้าง (JSON) - แยกตารางแม่นกว่า ไม่ต้องพึ่งแท็ก", key="ocr_structured", help="AI ตอบเป็นย่อหน้า/ตาราง (แถว-ช่อง) ตาม Schema ส่งต่อเข้า Word/Excel ได้ตรงๆ (ส่งทีละหน้า)")
+        col_pack, col_pack_size = st.columns([1, 1])
+        with col_pack:
+            use_packing = st.toggle("📦 รวมหลายหน้าต่อ 1 คำขอ (เหมาะกับเอกสารตัวอักษรน้อย)", key="ocr_packing", disabled=structured)
+        with col_pack_size:
+            max_pack = st.slider("จำนวนหน้าสูงสุดต่อคำขอ", 2, 10, 4, key="ocr_pack_size", disabled=structured or not use_packing)
+
+        background = st.toggle("🕒 รันเป็นงานเบื้องหลัง (สลับไปใช้เมนูอื่นระหว่างรอได้)", value=True, key="ocr_background")
+
         uploaded_file = st.file_uploader("📄 อัปโหลดไฟล์ PDF (AI OCR)", type=["pdf"])
 
         if uploaded_file and api_key and selected_model:
-            # Check File Change
-            if st.session_state['processed_file_id'] != uploaded_file.file_id:
-                # Reset
-                pass
+            # เปิดไฟล์ครั้งเดียวต่อไฟล์ (Hash/จำนวนหน้า/เอกสารที่เปิดไว้ ใช้ซ้ำทุก Rerun)
+            handle = get_document_cache().from_upload(uploaded_file)
+            pdf_bytes = handle.data
+            run_options = {
+                "num_workers": num_workers,
+                "encoding": encoding,
+                "adaptive_dpi": adaptive_dpi,
+                "max_pack": max_pack if use_packing and not structured else None,
+                "structured": structured,
+            }
+
+            # --- RESUME: ไฟล์เดิมที่เคยรันค้างไว้ ---
+            unfinished = get_job_store().find_unfinished(handle.hash)
+            if unfinished:
+                job = unfinished[0]
+                progress = f"เสร็จแล้ว {job['done']}/{len(job['page_numbers'])} หน้า (โมเดล {job['model']})"
+                if job['running'] or get_job_runner().is_busy(job['job_id']):
+                    # มีงาน (เช่น งานเบื้องหลัง) ใช้ Checkpoint นี้อยู่ กด Resume ซ้ำจะรันซ้อนกัน
+                    st.info(f"⚙️ งาน OCR ของไฟล์นี้กำลังทำงานอยู่: {progress}")
+                else:
+                    st.warning(f"⏸️ พบงาน OCR ที่ค้างไว้ของไฟล์นี้: {progress}")
+                    if st.button("▶️ ทำต่อจากเดิม (Resume job)", type="primary", use_container_width=True):
+                        # ใช้ตัวเลือกเดิมของงาน (Job ID เดียวกัน) ไม่ใช่ตัวเลือกบนหน้าจอตอนนี้
+                        resume_options = dict(run_options, **job.get('run_options', {}))
+                        start_ocr(background, api_key, job['model'], pdf_bytes, job['page_numbers'], uploaded_file, resume_options)
 
             # --- TABS ---
             tab_batch, tab_select = st.tabs(["🚀 แปลงทั้งหมด (Batch)", "👁️ เลือกเฉพาะหน้า (Selective)"])
@@ -164,114 +287,48 @@ def render_ocr_mode():
             with tab_batch:
                 st.info("ℹ️ อ่านทุกหน้า + แยกตารางให้อัตโนมัติ")
                 if st.button("🚀 เริ่ม OCR ทุกหน้า", type="primary", use_container_width=True):
-                    with st.spinner("📦 กำลังแยกหน้า PDF..."):
-                        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                        temp_images = []
-                        for page_num in range(len(doc)):
-                            page = doc.load_page(page_num)
-                            pix = page.get_pixmap(dpi=150)
-                            img = Image.open(io.BytesIO(pix.tobytes()))
-                            temp_images.append(img)
-                        
-                        st.session_state['ocr_images'] = temp_images
-                        st.session_state['ocr_results_text'] = [""] * len(temp_images)
-                        st.session_state['ocr_results_tables'] = [[]] * len(temp_images)
-                        st.session_state['processed_file_id'] = uploaded_file.file_id
-                        st.session_state['current_page_index'] = 0
-
-                    progress_bar = st.progress(0, text="กำลังเริ่ม OCR...")
-                    total_pages = len(st.session_state['ocr_images'])
-                    
-                    for i, img in enumerate(st.session_state['ocr_images']):
-                        progress_bar.progress((i) / total_pages, text=f"🔍 กำลังอ่านหน้า {i+1}/{total_pages}...")
-                        
-                        # Call AI
-                        raw_response = ocr_single_image(api_key, img, selected_model)
-                        
-                        # Parse: แยก Text กับ Tables
-                        clean_text, tables = parse_ai_response(raw_response)
-                        
-                        st.session_state['ocr_results_text'][i] = clean_text
-                        st.session_state['ocr_results_tables'][i] = tables
-                    
-                    progress_bar.progress(1.0, text="เสร็จเรียบร้อย! (พับกล่องนี้เพื่อดูผลลัพธ์)")
-                    st.rerun()
+                    page_numbers = list(range(handle.page_count))
+
+                    # Call AI (หลายหน้าพร้อมกัน ผลลัพธ์เรียงตามหน้าเดิม + Checkpoint ทุกหน้า)
+                    start_ocr(background, api_key, selected_model, pdf_bytes, page_numbers, uploaded_file, run_options)
 
             # TAB 2: SELECTIVE
             with tab_select:
                 st.info("ℹ️ เลือกเฉพาะหน้า (ระบบจะแยกตารางให้อัตโนมัติเช่นกัน)")
                 
-                if 'ocr_preview_imgs' not in st.session_state or st.session_state.get('ocr_preview_fid') != uploaded_file.file_id:
-                    with st.spinner("🖼️ สร้างภาพตัวอย่าง..."):
-                        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                        previews = []
-                        for i in range(len(doc)):
-                            page = doc.load_page(i)
-                            pix = page.get_pixmap(dpi=72)
-                            img = Image.open(io.BytesIO(pix.tobytes()))
-                            previews.append(img)
-                        st.session_state['ocr_preview_imgs'] = previews
-                        st.session_state['ocr_preview_fid'] = uploaded_file.file_id
-
-                with st.form("ocr_select_form"):
-                    images = st.session_state['ocr_preview_imgs']
-                    cols = st.columns(4)
-                    selected_indices = []
-                    
-                    for i, img in enumerate(images):
-                        col = cols[i % 4]
-                        with col:
-                            st.image(img, use_container_width=True)
-                            if st.checkbox(f"หน้า {i+1}", key=f"ocr_sel_{i}"):
-                                selected_indices.append(i)
-                    
-                    st.markdown("---")
-                    submitted = st.form_submit_button("✅ เริ่ม OCR เฉพาะหน้าที่เลือก", type="primary", use_container_width=True)
+                # เลือกหน้าแบบ Grid แบ่งหน้า / ช่วงหน้า (ไม่ Render ทุกหน้าล่วงหน้า)
+                selected_indices = list(render_page_picker("ocr_pick", handle))
+
+                st.markdown("---")
+                submitted = st.button("✅ เริ่ม OCR เฉพาะหน้าที่เลือก", type="primary", use_container_width=True)
 
                 if submitted:
                     if not selected_indices:
                         st.warning("กรุณาเลือกอย่างน้อย 1 หน้า")
                     else:
-                        st.session_state['ocr_results_text'] = []
-                        st.session_state['ocr_results_tables'] = []
-                        st.session_state['ocr_images'] = []
-                        st.session_state['current_page_index'] = 0
-                        st.session_state['processed_file_id'] = uploaded_file.file_id
-                        
-                        progress_bar = st.progress(0, text="เริ่มทำงาน...")
-                        
-                        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                        total_sel = len(selected_indices)
-                        current_step = 0
-                        
                         selected_indices.sort()
-                        
-                        for idx, page_num in enumerate(selected_indices):
-                            current_step += 1
-                            progress_bar.progress((current_step / total_sel), text=f"🔍 กำลังอ่านหน้า {page_num+1} ({current_step}/{total_sel})...")
-                            
-                            page = doc.load_page(page_num)
-                            pix = page.get_pixmap(dpi=150)
-                            img = Image.open(io.BytesIO(pix.tobytes()))
-                            
-                            st.session_state['ocr_images'].append(img)
-                            
-                            # Call AI
-                            raw_response = ocr_single_image(api_key, img, selected_model)
-                            # Parse
-                            clean_text, tables = parse_ai_response(raw_response)
-                            
-                            st.session_state['ocr_results_text'].append(clean_text)
-                            st.session_state['ocr_results_tables'].append(tables)
-                        
-                        progress_bar.progress(1.0, text="เสร็จเรียบร้อย! (พับกล่องนี้เพื่อดูผลลัพธ์)")
-                        st.rerun()
+
+                        # Call AI
+                        start_ocr(background, api_key, selected_model, pdf_bytes, selected_indices, uploaded_file, run_options)
+
+    # งานเบื้องหลัง (สถานะ + เปิดผลลัพธ์)
+    render_jobs_panel("ocr", open_ocr_job_result)
 
     # 2. ส่วนแสดงผล (Outside Expander)
-    if st.session_state.get('processed_file_id') == uploaded_file.file_id if uploaded_file else False:
+    # ถ้ายังไม่มีไฟล์อัปโหลด (เช่น กลับมาจากเมนูอื่น) ให้แสดงผลล่าสุดที่เปิดไว้
+    if (st.session_state.get('processed_file_id') == uploaded_file.file_id) if uploaded_file else st.session_state.get('ocr_pdf_bytes'):
         if st.session_state.get('ocr_results_text'):
             
             st.markdown("### 📄 ผลลัพธ์ (Result & Export)")
+            if st.session_state.get('ocr_cache_summary'):
+                st.caption(st.session_state['ocr_cache_summary'])
+            if st.session_state.get('ocr_timing_summary'):
+                st.caption(st.session_state['ocr_timing_summary'])
+
+            page_errors = st.session_state.get('ocr_page_errors') or [None] * len(st.session_state['ocr_results_text'])
+            failed_pages = [st.session_state['ocr_page_numbers'][i] + 1 for i, err in enumerate(page_errors) if err]
+            if failed_pages:
+                st.warning(f"⚠️ อ่านไม่สำเร็จ {len(failed_pages)} หน้า (หน้า {', '.join(map(str, failed_pages))}) - ไม่ได้ใส่ลงในไฟล์ผลลัพธ์ ลองรันใหม่เฉพาะหน้าเหล่านี้ได้ในแท็บ Selective")
             
             # --- Check Data ---
             has_text = any(st.session_state['ocr_results_text'])
@@ -279,24 +336,31 @@ def render_ocr_mode():
             has_tables = any(len(t) > 0 for t in st.session_state['ocr_results_tables'])
             
             # --- Export Buttons ---
+            # ส่งเป็นฟังก์ชันให้ download_button: ไฟล์ถูกสร้างตอนกดดาวน์โหลดเท่านั้น (ไม่ใช่ทุก Rerun)
+            # และอ่าน list ใน Session ตอนกด จึงได้ข้อความที่แก้ล่าสุดเสมอ
+            texts = st.session_state['ocr_results_text']
+            page_hashes = st.session_state['ocr_page_hashes']
+            tables = st.session_state['ocr_results_tables']
+            tables_hash = st.session_state['ocr_tables_hash']
             col_d1, col_d2 = st.columns(2)
             
             with col_d1:
                 if has_text:
-                    docx_file = create_word_docx(st.session_state['ocr_results_text'])
-                    st.download_button("💾 Export Word (.docx)", docx_file, "ocr_result.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary", use_container_width=True)
+                    st.download_button("💾 Export Word (.docx)", lambda: get_ocr_docx(texts, page_hashes), "ocr_result.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", type="primary", use_container_width=True)
             
             with col_d2:
                 if has_tables:
-                    excel_file = create_excel_from_tables(st.session_state['ocr_results_tables'])
-                    st.download_button("📊 Export Tables (.xlsx)", excel_file, "ocr_tables.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="secondary", use_container_width=True)
+                    single_sheet = st.toggle("รวมทุกตารางไว้ Sheet เดียว", key="ocr_single_sheet", help="เหมาะกับเอกสารที่มีตารางจำนวนมาก (มีคอลัมน์บอกหน้า/ตาราง)")
+                    st.download_button("📊 Export Tables (.xlsx)", lambda: get_ocr_xlsx(tables, tables_hash, single_sheet), "ocr_tables.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", type="secondary", use_container_width=True)
+                    for warning in get_ocr_xlsx_warnings(tables, tables_hash, single_sheet):
+                        st.warning(f"⚠️ {warning}")
                 else:
                     st.info("ℹ️ ไม่พบตารางในเอกสาร (ปุ่มโหลด Excel จึงไม่แสดง)")
 
             st.markdown("---")
 
             # --- Synced View Controller ---
-            total_pages = len(st.session_state['ocr_images'])
+            total_pages = len(st.session_state['ocr_page_numbers'])
             col_prev, col_nav_info, col_next = st.columns([1, 4, 1])
             
             with col_prev:
@@ -323,11 +387,19 @@ def render_ocr_mode():
             
             with col_left_view:
                 st.info("👁️ ต้นฉบับ")
-                if curr_idx < len(st.session_state['ocr_images']):
-                    st.image(st.session_state['ocr_images'][curr_idx], use_container_width=True)
+                if curr_idx < total_pages and st.session_state['ocr_pdf_bytes']:
+                    # Render เฉพาะหน้าที่กำลังดูจาก PDF ต้นฉบับ
+                    page_num = st.session_state['ocr_page_numbers'][curr_idx]
+                    # ใช้เอกสารที่เปิดค้างไว้ (ถ้าหลุดจาก Cache ไปแล้วจะเปิดใหม่จาก bytes เดิม)
+                    doc_cache = get_document_cache()
+                    handle = doc_cache.get(st.session_state['ocr_pdf_hash']) or doc_cache.from_buffer(st.session_state['ocr_pdf_bytes'], st.session_state['ocr_pdf_hash'])
+                    preview = handle.render(page_num)
+                    st.image(preview, use_container_width=True)
 
             with col_right_view:
                 st.success("📝 ข้อความหลัก (Main Text)")
+                if curr_idx < len(page_errors) and page_errors[curr_idx]:
+                    st.error(f"❌ หน้านี้อ่านไม่สำเร็จ ({page_errors[curr_idx]['kind']}): {page_errors[curr_idx]['message']}")
                 if curr_idx < len(st.session_state['ocr_results_text']):
                     edited_text = st.text_area(
                         label="ocr_output",
@@ -336,4 +408,6 @@ def render_ocr_mode():
                         label_visibility="collapsed",
                         key=f"text_area_{curr_idx}"
                     )
-                    st.session_state['ocr_results_text'][curr_idx] = edited_text
+                    if edited_text != st.session_state['ocr_results_text'][curr_idx]:
+                        st.session_state['ocr_results_text'][curr_idx] = edited_text
+                        st.session_state['ocr_page_hashes'][curr_idx] = text_fingerprint(edited_text)
@@ -0,0 +1,133 @@
+import math
+import streamlit as st
+from modules.services.thumbnails import get_thumbnails, parse_page_ranges, format_page_ranges
+
+# จำนวนภาพตัวอย่างต่อหน้า Grid (Render เฉพาะหน้าที่กำลังดู)
+GRID_COLUMNS = 4
+THUMBS_PER_GRID_PAGE = 12
+
+def _reset_state(prefix, handle):
+    """ไฟล์ใหม่: ล้างสิ่งที่เลือกไว้ (Hash/จำนวนหน้าได้จาก DocumentHandle ที่คำนวณไว้แล้ว)"""
+    for key in [k for k in st.session_state if str(k).startswith(f"{prefix}_")]:
+        del st.session_state[key]
+    st.session_state[f"{prefix}_page_count"] = handle.page_count
+    st.session_state[f"{prefix}_hash"] = handle.hash
+    st.session_state[f"{prefix}_selected"] = {}
+    st.session_state[f"{prefix}_grid_page"] = 0
+
+def _clear_widget_keys(prefix):
+    # ให้ Checkbox/Toggle ที่แสดงอยู่อ่านค่าใหม่จาก selected
+    for key in [k for k in st.session_state if str(k).startswith((f"{prefix}_sel_", f"{prefix}_tbl_"))]:
+        del st.session_state[key]
+
+def _on_select(prefix, page_num):
+    selected = st.session_state[f"{prefix}_selected"]
+    if st.session_state[f"{prefix}_sel_{page_num}"]:
+        is_table = st.session_state.get(f"{prefix}_tbl_{page_num}", False)
+        selected[page_num] = "csv" if is_table else "text"
+    else:
+        selected.pop(page_num, None)
+
+def _on_table(prefix, page_num):
+    selected = st.session_state[f"{prefix}_selected"]
+    if page_num in selected:
+        selected[page_num] = "csv" if st.session_state[f"{prefix}_tbl_{page_num}"] else "text"
+
+def _on_apply_range(prefix, with_modes):
+    page_count = st.session_state[f"{prefix}_page_count"]
+    try:
+        pages = parse_page_ranges(st.session_state[f"{prefix}_range"], page_count)
+    except ValueError as e:
+        st.session_state[f"{prefix}_range_error"] = str(e)
+        return
+    st.session_state[f"{prefix}_range_error"] = None
+    mode = st.session_state.get(f"{prefix}_range_mode", "text") if with_modes else "text"
+    selected = st.session_state[f"{prefix}_selected"]
+    for n in pages:
+        selected[n] = mode
+    _clear_widget_keys(prefix)
+
+def _on_clear(prefix):
+    st.session_state[f"{prefix}_selected"] = {}
+    _clear_widget_keys(prefix)
+
+def _on_grid_page(prefix, delta):
+    st.session_state[f"{prefix}_grid_page"] += delta
+
+def render_page_picker(prefix, handle, with_modes=False):
+    """
+    เลือกหน้าจาก PDF ขนาดใหญ่ได้โดยไม่ต้อง Render ทุกหน้า
+    - ใส่ช่วงหน้า เช่น "1-20,35,40-" หรือติ๊กจาก Grid ที่แบ่งเป็นหน้าๆ (ภาพตัวอย่างสร้างเฉพาะหน้าที่ดูอยู่)
+    - with_modes=True: ระบุได้ว่าแต่ละหน้าเป็น 'ข้อความ (Word)' หรือ 'ตาราง (Excel)'
+    - prefix: ชื่อนำหน้า Key ใน Session State (ต้องไม่ซ้ำกับ Key อื่น เพราะจะถูกล้างเมื่อเปลี่ยนไฟล์)
+    - handle: DocumentHandle ของไฟล์ (จาก get_document_cache().from_upload)
+    Return: dict {เลขหน้า 0-based: 'text' หรือ 'csv'} ของหน้าที่เลือก
+    """
+    if st.session_state.get(f"{prefix}_hash") != handle.hash:
+        _reset_state(prefix, handle)
+
+    page_count = st.session_state[f"{prefix}_page_count"]
+    selected = st.session_state[f"{prefix}_selected"]
+    if page_count == 0:
+        st.warning("ไฟล์นี้ไม่มีหน้าให้เลือก")
+        return {}
+
+    # 1. เลือกด้วยช่วงหน้า
+    if with_modes:
+        col_range, col_mode, col_apply = st.columns([3, 1, 1])
+    else:
+        col_range, col_apply = st.columns([4, 1])
+    with col_range:
+        st.text_input("🔢 เลือกหน้าด้วยช่วง (เช่น 1-20,35,40-)", key=f"{prefix}_range", placeholder=f"1-{page_count}")
+    if with_modes:
+        with col_mode:
+            st.selectbox("แปลงเป็น", ["text", "csv"], format_func={"text": "ข้อความ (Word)", "csv": "ตาราง (Excel)"}.get, key=f"{prefix}_range_mode")
+    with col_apply:
+        st.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
+        st.button("➕ เพิ่มตามช่วง", key=f"{prefix}_apply", on_click=_on_apply_range, args=(prefix, with_modes), use_container_width=True)
+    if st.session_state.get(f"{prefix}_range_error"):
+        st.error(st.session_state[f"{prefix}_range_error"])
+
+    # 2. Grid แบ่งหน้า (Render ภาพตัวอย่างเฉพาะหน้า Grid ที่ดูอยู่ และเก็บ Cache ไว้)
+    grid_pages = max(1, math.ceil(page_count / THUMBS_PER_GRID_PAGE))
+    grid_page = min(st.session_state[f"{prefix}_grid_page"], grid_pages - 1)
+    st.session_state[f"{prefix}_grid_page"] = grid_page
+    start = grid_page * THUMBS_PER_GRID_PAGE
+    visible = list(range(start, min(start + THUMBS_PER_GRID_PAGE, page_count)))
+    if not visible:
+        return dict(selected)
+
+    col_prev, col_info, col_next = st.columns([1, 4, 1])
+    with col_prev:
+        st.button("⬅️", key=f"{prefix}_grid_prev", on_click=_on_grid_page, args=(prefix, -1), disabled=grid_page == 0, use_container_width=True)
+    with col_info:
+        st.markdown(f"<div style='text-align: center; padding-top: 5px;'>หน้า {start + 1}-{visible[-1] + 1} จาก {page_count} (ชุดที่ {grid_page + 1}/{grid_pages})</div>", unsafe_allow_html=True)
+    with col_next:
+        st.button("➡️", key=f"{prefix}_grid_next", on_click=_on_grid_page, args=(prefix, 1), disabled=grid_page >= grid_pages - 1, use_container_width=True)
+
+    with handle.lock:
+        thumbs = get_thumbnails(handle.data, handle.hash, visible, doc=handle.source.doc)
+    cols = st.columns(GRID_COLUMNS)
+    for i, (page_num, thumb) in enumerate(zip(visible, thumbs)):
+        with cols[i % GRID_COLUMNS]:
+            st.image(thumb, use_container_width=True)
+            st.checkbox(f"หน้า {page_num + 1}", value=page_num in selected, key=f"{prefix}_sel_{page_num}", on_change=_on_select, args=(prefix, page_num))
+            if with_modes:
+                st.toggle("เป็นตาราง (Excel)?", value=selected.get(page_num) == "csv", key=f"{prefix}_tbl_{page_num}", on_change=_on_table, args=(prefix, page_num), help="ถ้าเปิด จะแปลงหน้านี้เป็น Excel")
+
+    # 3. สรุปหน้าที่เลือก
+    col_summary, col_clear = st.columns([4, 1])
+    with col_summary:
+        if selected:
+            summary = f"✅ เลือกแล้ว {len(selected)} หน้า: {format_page_ranges(selected)}"
+            if with_modes:
+                tables = [n for n, mode in selected.items() if mode == "csv"]
+                if tables:
+                    summary += f" (ตาราง: {format_page_ranges(tables)})"
+            st.caption(summary)
+        else:
+            st.caption("ยังไม่ได้เลือกหน้า")
+    with col_clear:
+        st.button("ล้างที่เลือก", key=f"{prefix}_clear", on_click=_on_clear, args=(prefix,), disabled=not selected, use_container_width=True)
+
+    return dict(selected)
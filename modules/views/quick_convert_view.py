@@ -1,100 +1,153 @@
 import streamlit as st
-import google.generativeai as genai
-import fitz  # PyMuPDF
-from PIL import Image
-import io
-from docx import Document
-import re
-import pandas as pd # เพิ่ม Pandas สำหรับจัดการ Excel
+from modules.services.ocr_engine import run_pipeline, StageTimings, DEFAULT_WORKERS, MAX_WORKERS, ENCODE_WORKERS
+from modules.services.ocr_cache import get_ocr_cache, CacheStats
+from modules.services.ocr_service import process_page_ai
+from modules.services.document_export import create_doc_from_results, create_excel_from_results
+from modules.services.page_source import PdfPageSource
+from modules.services.document_cache import get_document_cache
+from modules.services.text_triage import triage_document
+from modules.services.ai_service import list_available_models
+from modules.services.image_encoder import encode_image, ENCODING_PRESETS, PRESET_LABELS, DEFAULT_PRESET
+from modules.views.jobs_view import submit_background_job, render_jobs_panel
+from modules.views.page_picker import render_page_picker
 
-def get_available_models(api_key):
-    try:
-        genai.configure(api_key=api_key)
-        all_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        return all_models
-    except:
-        return []
+def run_quick_fix_batch(api_key, model_name, pdf_bytes, file_name, progress_bar, num_workers=DEFAULT_WORKERS,
+                        encoding=None, adaptive_dpi=False, use_triage=True, use_remap=True):
+    """
+    แปลงทุกหน้าเป็น Word (Batch) - ไม่แตะ st.* นอกจาก progress_bar จึงรันเป็นงานเบื้องหลังได้
+    Return: dict ผลลัพธ์สำหรับ save_quick_fix_results
+    """
+    with PdfPageSource(pdf_bytes, dpi=150, adaptive_dpi=adaptive_dpi) as source:
+        total_pages = len(source)
+
+        # 1. Triage: หน้าไหน Text Layer ปกติ ดึงข้อความเองได้เลย / หน้าไหนเพี้ยน ค่อยส่ง AI
+        if use_triage:
+            triage = triage_document(source.doc, remap=use_remap)
+        else:
+            triage = [{"text": "", "score": 1.0, "needs_ai": True, "remapped": False}] * total_pages
+        ai_pages = [i for i, t in enumerate(triage) if t["needs_ai"]]
+        remapped_count = sum(1 for t in triage if t["remapped"])
+        extracted_texts = [t["text"].strip() for t in triage]
+        total_ai = max(len(ai_pages), 1)
 
-def clean_ocr_text(text):
-    if not text: return ""
-    # ลบพวก Markdown code block ออก (เผื่อ AI เผลอใส่มา)
-    text = text.replace("```csv", "").replace("```", "")
-    return text.strip()
+        def report(done, total):
+            progress_bar.progress((done / total_ai), text=f"⏳ ส่ง AI แปลงเสร็จแล้ว {done}/{len(ai_pages)} หน้า...")
+
+        cache = get_ocr_cache()
+        cache_stats = CacheStats()
+        timings = StageTimings()
+
+        # 2. Batch Mode = Text Only (ยิงเฉพาะหน้าที่เพี้ยนพร้อมกัน ผลลัพธ์เรียงตามหน้าเดิม)
+        # Pipeline: Render/บีบอัดหน้าถัดไประหว่างที่หน้าก่อนหน้ารอ AI อยู่
+        stages = [
+            ("render", source.render, 1),   # fitz ไม่ thread-safe
+            ("encode", lambda img: encode_image(img, encoding) if encoding else img, ENCODE_WORKERS),
+            ("upload", lambda img: process_page_ai(api_key, img, model_name, "text", cache, cache_stats), num_workers),
+        ]
+        ai_texts = run_pipeline(ai_pages, stages, queue_size=max(2, num_workers), on_progress=report, timings=timings)
+    failed_pages = []
+    for page_idx, text_result in zip(ai_pages, ai_texts):
+        if isinstance(text_result, Exception):
+            # หน้าที่ล้มเหลวไม่ใส่ลงเอกสาร แต่จดไว้แจ้งผู้ใช้
+            failed_pages.append(page_idx + 1)
+            extracted_texts[page_idx] = ""
+        else:
+            extracted_texts[page_idx] = text_result
 
-def process_page_ai(api_key, image, model_name, output_format="text"):
+    progress_bar.progress(1.0, text="✅ เสร็จเรียบร้อย! (ผลลัพธ์อยู่ด้านล่าง)")
+    return {
+        "word": create_doc_from_results(extracted_texts),
+        "excel": None,
+        "excel_warnings": [],
+        "filename": file_name,
+        "cache_summary": cache_stats.summary(),
+        "failed_pages": failed_pages,
+        "triage_summary": f"⚡ ข้าม AI ได้ {total_pages - len(ai_pages)}/{total_pages} หน้า (Text Layer ปกติ / แปลงฟอนต์เก่าในเครื่อง {remapped_count} หน้า)",
+        "timing_summary": timings.summary() if timings.counts else None,
+    }
+
+def run_quick_fix_selective(api_key, model_name, pdf_bytes, file_name, selection_map, progress_bar,
+                            num_workers=DEFAULT_WORKERS, encoding=None, adaptive_dpi=False, single_sheet=False):
     """
-    ฟังก์ชันส่งรูปให้ AI แกะข้อความ
-    output_format: 'text' (Word) หรือ 'csv' (Excel)
+    แปลงเฉพาะหน้าที่เลือก (selection_map: {เลขหน้า: 'text' หรือ 'csv'})
+    single_sheet=True: ตารางทุกหน้าอยู่ใน Sheet เดียว
+    Return: dict ผลลัพธ์สำหรับ save_quick_fix_results
     """
-    try:
-        genai.configure(api_key=api_key)
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        model = genai.GenerativeModel(model_name, safety_settings=safety_settings)
-        
-        if output_format == "csv":
-            # Prompt สำหรับ Excel (ขอ CSV)
-            prompt = """
-            Act as a Data Entry Clerk. 
-            Extract the table data from this image perfectly.
-            - Output STRICTLY in CSV format (Comma Separated Values).
-            - Do NOT use Markdown code blocks. Just raw CSV data.
-            - Handle Thai characters correctly.
-            - If there are merged cells, repeat the value in each cell or handle logically.
-            """
+    with PdfPageSource(pdf_bytes, dpi=150, adaptive_dpi=adaptive_dpi) as source:
+        word_texts = []
+        excel_csvs = []
+
+        total_selected = len(selection_map)
+        jobs = sorted(selection_map.items())
+
+        def report(done, total):
+            progress_bar.progress((done / total_selected), text=f"⏳ แปลงเสร็จแล้ว {done}/{total_selected} หน้า...")
+
+        cache = get_ocr_cache()
+        cache_stats = CacheStats()
+        timings = StageTimings()
+
+        # วนลูปตามหน้าที่เลือก แบบ Pipeline (render -> encode -> upload ทำงานซ้อนกัน)
+        def render(job):
+            page_idx, mode = job
+            return mode, source.render(page_idx)
+
+        def encode(job):
+            mode, img = job
+            return mode, encode_image(img, encoding) if encoding else img
+
+        def upload(job):
+            mode, img = job
+            return process_page_ai(api_key, img, model_name, mode, cache, cache_stats)
+
+        stages = [("render", render, 1), ("encode", encode, ENCODE_WORKERS), ("upload", upload, num_workers)]
+        results = run_pipeline(jobs, stages, queue_size=max(2, num_workers), on_progress=report, timings=timings)
+
+    failed_pages = []
+    for (page_idx, mode), result in zip(jobs, results):
+        if isinstance(result, Exception):
+            failed_pages.append(page_idx + 1)
+        elif mode == "text":
+            word_texts.append(result)
         else:
-            # Prompt สำหรับ Word (ขอ Text)
-            prompt = """
-            You are a high-speed OCR engine. 
-            Convert this document image into plain text.
-            - IGNORE any underlying text layer. READ VISUALLY.
-            - Preserve the original layout (paragraphs/lists).
-            - Thai Language accuracy is top priority.
-            """
-        
-        response = model.generate_content([prompt, image])
-        return clean_ocr_text(response.text)
-    except Exception as e:
-        return f"Error: {str(e)}"
+            excel_csvs.append(result)
 
-def create_doc_from_results(results):
-    """สร้าง Word จาก List ของข้อความ"""
-    doc = Document()
-    for text in results:
-        doc.add_paragraph(text)
-        doc.add_page_break()
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+    progress_bar.progress(1.0, text="✅ เสร็จเรียบร้อย! (ผลลัพธ์อยู่ด้านล่าง)")
 
-def create_excel_from_results(csv_results):
-    """สร้าง Excel จาก List ของ CSV String (แยก Sheet ตามหน้า)"""
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        has_data = False
-        for i, csv_text in enumerate(csv_results):
-            if not csv_text or "Error" in csv_text: continue
-            
-            try:
-                # แปลง CSV String เป็น DataFrame
-                df = pd.read_csv(io.StringIO(csv_text))
-                sheet_name = f"Page_{i+1}"
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                has_data = True
-            except:
-                # กรณีแปลง CSV ไม่ผ่าน (AI อาจตอบมาไม่ดี) ให้ข้าม
-                pass
-                
-        if not has_data: # กัน Error กรณีไม่มีข้อมูลเลย
-            pd.DataFrame({"Message": ["No valid table data found"]}).to_excel(writer, sheet_name="Error")
-            
-    buffer.seek(0)
-    return buffer
+    # เตรียมไฟล์ผลลัพธ์ (อาจมีทั้งคู่ หรืออย่างใดอย่างหนึ่ง)
+    excel_warnings = []
+    return {
+        "word": create_doc_from_results(word_texts) if word_texts else None,
+        "excel": create_excel_from_results(excel_csvs, single_sheet, excel_warnings) if excel_csvs else None,
+        "excel_warnings": excel_warnings,
+        "filename": file_name,
+        "cache_summary": cache_stats.summary(),
+        "failed_pages": failed_pages,
+        "triage_summary": None,
+        "timing_summary": timings.summary() if timings.counts else None,
+    }
+
+def save_quick_fix_results(result):
+    """เก็บผลลงใน Session State สำหรับส่วนดาวน์โหลด"""
+    st.session_state['qf_word_result'] = result['word']
+    st.session_state['qf_excel_result'] = result['excel']
+    st.session_state['qf_excel_warnings'] = result.get('excel_warnings') or []
+    st.session_state['qf_filename'] = result['filename']
+    st.session_state['qf_cache_summary'] = result['cache_summary']
+    st.session_state['qf_failed_pages'] = result['failed_pages']
+    st.session_state['qf_triage_summary'] = result['triage_summary']
+    st.session_state['qf_timing_summary'] = result['timing_summary']
+
+def start_quick_fix(background, title, run_fn, *args, **kwargs):
+    """รัน run_fn ทันที (พร้อม Progress Bar) หรือส่งเข้าคิวเบื้องหลัง"""
+    if background:
+        submit_background_job("quick_fix", title, lambda job: run_fn(*args, progress_bar=job, **kwargs))
+        return
+    progress_bar = st.progress(0, text="กำลังเตรียมไฟล์...")
+    try:
+        save_quick_fix_results(run_fn(*args, progress_bar=progress_bar, **kwargs))
+    except Exception as e:
+        st.error(f"เกิดข้อผิดพลาด: {e}")
 
 def render_quick_convert_mode():
     
@@ -113,7 +166,7 @@ def render_quick_convert_mode():
         with col_model:
             selected_model = None
             if api_key:
-                model_options = get_available_models(api_key)
+                model_options = list_available_models(api_key)
                 if model_options:
                     default_idx = 0
                     for i, name in enumerate(model_options):
@@ -123,10 +176,22 @@ def render_quick_convert_mode():
                             default_idx = i
                     selected_model = st.selectbox("🤖 เลือก AI Model", model_options, index=default_idx)
 
+        col_workers, col_encoding = st.columns([1, 1])
+        with col_workers:
+            num_workers = st.slider("⚡ จำนวนหน้าที่ส่ง AI พร้อมกัน (Workers)", 1, MAX_WORKERS, DEFAULT_WORKERS, key="qf_workers")
+        with col_encoding:
+            preset = st.selectbox("🗜️ บีบอัดภาพก่อนส่ง AI", list(ENCODING_PRESETS), index=list(ENCODING_PRESETS).index(DEFAULT_PRESET), format_func=PRESET_LABELS.get, key="qf_encoding")
+            adaptive_dpi = st.checkbox("🔎 ปรับ DPI ตามขนาดตัวอักษร (Adaptive DPI)", key="qf_adaptive_dpi")
+        encoding = ENCODING_PRESETS[preset]
+        background = st.toggle("🕒 รันเป็นงานเบื้องหลัง (สลับไปใช้เมนูอื่นระหว่างรอได้)", value=True, key="qf_background")
+        run_options = {"num_workers": num_workers, "encoding": encoding, "adaptive_dpi": adaptive_dpi}
+
         # 2. Upload Zone
         uploaded_file = st.file_uploader("วางไฟล์ PDF ที่มีปัญหาตรงนี้ (Drag & Drop)", type=["pdf"])
 
         if uploaded_file and api_key and selected_model:
+            # เปิดไฟล์ครั้งเดียวต่อไฟล์ แล้วส่ง memoryview ของไฟล์ต่อ (ไม่ copy bytes ทุก Rerun)
+            handle = get_document_cache().from_upload(uploaded_file)
             st.markdown("---")
             
             # 3. Selection Tabs (อยู่ใน Expander แล้ว!)
@@ -135,117 +200,51 @@ def render_quick_convert_mode():
             # === TAB 1: BATCH (เน้นเร็ว เป็น Word หมด) ===
             with tab_batch:
                 st.info("ℹ️ แปลงทุกหน้าเป็น Word รวดเดียว (เหมาะกับเอกสารข้อความล้วน)")
+                use_triage = st.toggle("⚡ ข้ามหน้าที่ Text Layer อ่านได้ปกติ (ไม่ต้องส่ง AI)", value=True, key="qf_triage")
+                use_remap = st.toggle("🔤 แปลงฟอนต์ไทยแบบเก่าในเครื่องก่อน (DSE/PSL/Windows-874)", value=True, key="qf_remap", disabled=not use_triage)
                 if st.button("🚀 เริ่มแปลงเป็น Word ทั้งหมด", type="primary", use_container_width=True):
-                    progress_bar = st.progress(0, text="กำลังเตรียมไฟล์...")
-                    try:
-                        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                        total_pages = len(doc)
-                        extracted_texts = []
-
-                        for i in range(total_pages):
-                            progress_bar.progress((i / total_pages), text=f"⏳ กำลังแปลงหน้า {i+1}/{total_pages}...")
-                            page = doc.load_page(i)
-                            pix = page.get_pixmap(dpi=150)
-                            img = Image.open(io.BytesIO(pix.tobytes()))
-                            # Batch Mode = Text Only
-                            text_result = process_page_ai(api_key, img, selected_model, output_format="text")
-                            extracted_texts.append(text_result)
-
-                        progress_bar.progress(1.0, text="✅ เสร็จเรียบร้อย! (ผลลัพธ์อยู่ด้านล่าง)")
-                        
-                        # Save to session state
-                        st.session_state['qf_word_result'] = create_doc_from_results(extracted_texts)
-                        st.session_state['qf_excel_result'] = None # Clear Excel
-                        st.session_state['qf_filename'] = uploaded_file.name
-                        
-                    except Exception as e:
-                        st.error(f"เกิดข้อผิดพลาด: {e}")
+                    start_quick_fix(
+                        background, f"Quick Fix {uploaded_file.name} (ทั้งไฟล์)", run_quick_fix_batch,
+                        api_key, selected_model, handle.data, uploaded_file.name,
+                        use_triage=use_triage, use_remap=use_remap, **run_options
+                    )
 
             # === TAB 2: SELECTIVE (เลือกได้ว่าเป็น Text หรือ Table) ===
             with tab_select:
                 st.info("ℹ️ ติ๊กเลือกหน้า และระบุได้ว่าหน้านั้นเป็น 'ตาราง (Excel)' หรือ 'ข้อความ (Word)'")
                 
-                # Preview Gen
-                if 'qf_preview_images' not in st.session_state or st.session_state.get('qf_file_id') != uploaded_file.file_id:
-                    with st.spinner("🖼️ สร้างภาพตัวอย่าง..."):
-                        doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                        previews = []
-                        for i in range(len(doc)):
-                            page = doc.load_page(i)
-                            pix = page.get_pixmap(dpi=72) 
-                            img = Image.open(io.BytesIO(pix.tobytes()))
-                            previews.append(img)
-                        st.session_state['qf_preview_images'] = previews
-                        st.session_state['qf_file_id'] = uploaded_file.file_id
+                # เลือกหน้าแบบ Grid แบ่งหน้า / ช่วงหน้า พร้อมระบุว่าเป็นตารางหรือไม่ (ไม่ Render ทุกหน้าล่วงหน้า)
+                selection_map = render_page_picker("qf_pick", handle, with_modes=True)
 
-                # Grid Selection with Options
-                with st.form("qf_select_form"):
-                    images = st.session_state['qf_preview_images']
-                    cols = st.columns(4)
-                    
-                    # เก็บสถานะการเลือก (ใช้ Dictionary)
-                    selection_map = {} 
-                    
-                    for i, img in enumerate(images):
-                        col = cols[i % 4]
-                        with col:
-                            st.image(img, use_container_width=True)
-                            
-                            # Checkbox หลัก (เลือกหน้านี้ไหม)
-                            is_selected = st.checkbox(f"เลือกหน้า {i+1}", key=f"qf_sel_{i}")
-                            
-                            # Checkbox รอง (เป็นตารางไหม) -> แสดงเฉพาะถ้าเลือกหน้าหลัก (แต่ Streamlit ทำ dynamic ใน form ยาก เลยโชว์ตลอด)
-                            is_table = st.toggle(f"เป็นตาราง (Excel)?", key=f"qf_tbl_{i}", help="ถ้าเปิด จะแปลงหน้านี้เป็น Excel")
-                            
-                            if is_selected:
-                                selection_map[i] = "csv" if is_table else "text"
-                    
-                    st.markdown("---")
-                    submitted = st.form_submit_button("✅ เริ่มแปลงตามที่เลือก", type="primary", use_container_width=True)
+                st.markdown("---")
+                single_sheet = st.toggle("รวมทุกตารางไว้ Sheet เดียว", key="qf_single_sheet", help="เหมาะกับเอกสารที่มีตารางจำนวนมาก (มีคอลัมน์บอกหน้า)")
+                submitted = st.button("✅ เริ่มแปลงตามที่เลือก", type="primary", use_container_width=True)
 
                 if submitted:
                     if not selection_map:
                         st.warning("กรุณาเลือกอย่างน้อย 1 หน้า")
                     else:
-                        progress_bar = st.progress(0, text="กำลังเตรียมไฟล์...")
-                        try:
-                            doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-                            
-                            word_texts = []
-                            excel_csvs = []
-                            
-                            total_selected = len(selection_map)
-                            current_step = 0
-
-                            # วนลูปตามหน้าที่เลือก
-                            for page_idx, mode in sorted(selection_map.items()):
-                                current_step += 1
-                                progress_bar.progress((current_step / total_selected), text=f"⏳ กำลังแปลงหน้า {page_idx+1} (โหมด {mode})...")
-                                
-                                page = doc.load_page(page_idx)
-                                pix = page.get_pixmap(dpi=150)
-                                img = Image.open(io.BytesIO(pix.tobytes()))
-                                
-                                result = process_page_ai(api_key, img, selected_model, output_format=mode)
-                                
-                                if mode == "text":
-                                    word_texts.append(result)
-                                else:
-                                    excel_csvs.append(result)
+                        start_quick_fix(
+                            background, f"Quick Fix {uploaded_file.name} ({len(selection_map)} หน้า)", run_quick_fix_selective,
+                            api_key, selected_model, handle.data, uploaded_file.name, selection_map,
+                            single_sheet=single_sheet, **run_options
+                        )
 
-                            progress_bar.progress(1.0, text="✅ เสร็จเรียบร้อย! (ผลลัพธ์อยู่ด้านล่าง)")
-                            
-                            # เตรียมไฟล์ผลลัพธ์ (อาจมีทั้งคู่ หรืออย่างใดอย่างหนึ่ง)
-                            st.session_state['qf_word_result'] = create_doc_from_results(word_texts) if word_texts else None
-                            st.session_state['qf_excel_result'] = create_excel_from_results(excel_csvs) if excel_csvs else None
-                            st.session_state['qf_filename'] = uploaded_file.name
-                            
-                        except Exception as e:
-                            st.error(f"เกิดข้อผิดพลาด: {e}")
+    # งานเบื้องหลัง (สถานะ + เปิดผลลัพธ์)
+    render_jobs_panel("quick_fix", save_quick_fix_results)
 
     # 3. Download Buttons (อยู่นอก Expander) - แสดงตามผลลัพธ์ที่มี
     if 'qf_filename' in st.session_state:
         st.markdown("### 📥 ดาวน์โหลดผลลัพธ์")
+        if st.session_state.get('qf_triage_summary'):
+            st.caption(st.session_state['qf_triage_summary'])
+        if st.session_state.get('qf_cache_summary'):
+            st.caption(st.session_state['qf_cache_summary'])
+        if st.session_state.get('qf_timing_summary'):
+            st.caption(st.session_state['qf_timing_summary'])
+        if st.session_state.get('qf_failed_pages'):
+            failed = st.session_state['qf_failed_pages']
+            st.warning(f"⚠️ แปลงไม่สำเร็จ {len(failed)} หน้า (หน้า {', '.join(map(str, failed))}) - ไม่ได้ใส่ลงในไฟล์ผลลัพธ์ ลองเลือกแปลงใหม่เฉพาะหน้าเหล่านี้ได้")
         
         col_d1, col_d2 = st.columns(2)
         
@@ -275,6 +274,8 @@ def render_quick_convert_mode():
                     type="secondary", # ใช้สีต่างกันจะได้ไม่งง
                     use_container_width=True
                 )
+                for warning in st.session_state.get('qf_excel_warnings', []):
+                    st.warning(f"⚠️ {warning}")
                 has_result = True
                 
         if has_result:
@@ -1,74 +1,161 @@
+import html
+import time
 import streamlit as st
-import google.generativeai as genai
 from modules.services.comparator import TextComparator
+from modules.services.ai_service import request_ai, list_available_models, AIServiceError
+from modules.services.ocr_engine import DEFAULT_WORKERS, MAX_WORKERS
+from modules.services.ocr_cache import CacheStats
+from modules.services.proofreader import PROOFREAD_PROMPT, proofread_text, get_correction_cache, estimate_tokens
+from modules.services.spell_prepass import PrepassStats, get_spell_prepass
+from modules.views.jobs_view import submit_background_job, render_jobs_panel
 
-def get_available_models(api_key):
-    """ดึงรายชื่อโมเดลทั้งหมดที่ Key นี้ใช้ได้จริง"""
-    try:
-        genai.configure(api_key=api_key)
-        all_models = []
-        for m in genai.list_models():
-            if 'generateContent' in m.supported_generation_methods:
-                all_models.append(m.name)
-        return all_models
-    except:
-        return []
-
-def get_ai_correction_stream(api_key, text, model_name, progress_bar, stream_box):
-    try:
-        genai.configure(api_key=api_key)
-        
-        # ปิด Safety Filter
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        
-        model = genai.GenerativeModel(model_name, safety_settings=safety_settings)
-        
-        prompt = f"""
-        Act as a professional proofreader. 
-        Please correct the spelling, grammar, and punctuation errors in the following text (Thai and English).
-        Maintain the original tone and style. 
-        RETURN ONLY THE CORRECTED TEXT without any explanation or markdown formatting.
-        
-        Text to correct:
-        {text}
-        """
-        
-        response = model.generate_content(prompt, stream=True)
-        
-        full_text = ""
-        total_len = len(text) if len(text) > 0 else 1
-        
-        for chunk in response:
-            if chunk.text:
-                full_text += chunk.text
-                
-                # Update UI
-                current_len = len(full_text)
-                progress = min(current_len / total_len, 0.99)
-                progress_bar.progress(progress, text=f"🤖 AI กำลังพิมพ์... ({int(progress*100)}%)")
-                
-                # Live Preview
-                stream_box.markdown(
-                    f"""
-                    <div style="background-color: #f0f2f6; padding: 15px; border-radius: 8px; font-family: monospace; color: #333; font-size: 0.9rem; height: 200px; overflow-y: auto; border: 1px dashed #ccc;">
-                        {full_text}
-                    </div>
-                    """, 
-                    unsafe_allow_html=True
-                )
-
-        progress_bar.progress(1.0, text="เสร็จเรียบร้อย!")
-        return full_text.strip()
-        
-    except Exception as e:
-        if "429" in str(e):
-            return "API_ERROR: โควต้าเต็ม (Quota Exceeded)"
-        return f"API_ERROR: {str(e)}"
+PREVIEW_STYLE = "background-color: #f0f2f6; padding: 15px; border-radius: 8px; font-family: monospace; color: #333; font-size: 0.9rem; height: 200px; overflow-y: auto; border: 1px dashed #ccc;"
+# Live Preview: อัปเดตหน้าจอไม่เกิน PREVIEW_FPS ครั้ง/วินาที และแสดงแค่ท้ายข้อความ PREVIEW_TAIL_CHARS ตัวอักษร
+# (ส่งทั้งข้อความทุก Chunk = งาน O(n²) และส่งข้อมูลผ่าน Websocket มากเกินไปเมื่อข้อความยาว)
+PREVIEW_FPS = 8
+PREVIEW_TAIL_CHARS = 3000
+
+def _stream_preview_html(tail, truncated):
+    prefix = "… " if truncated else ""
+    return f'<div style="{PREVIEW_STYLE} white-space: pre-wrap;">{prefix}{html.escape(tail)}</div>'
+
+def stream_correction(api_key, text, model_name, progress_bar, stream_box):
+    """
+    ตรวจทานแบบ Stream คำตอบให้ดูสด | Raise: AIServiceError / Exception ระหว่าง Stream
+    - เก็บคำตอบเป็น list แล้ว join ครั้งเดียวตอนจบ (ไม่ต่อ String ซ้ำทุก Chunk)
+    - Preview อัปเดตตามรอบเวลา (PREVIEW_FPS) และแสดงแค่ท้ายข้อความ งานต่อรอบจึงคงที่ไม่โตตามความยาว
+    - Progress คิดจากจำนวน Token ที่ได้ เทียบกับ Token ของต้นฉบับ (คำตอบยาวใกล้เคียงต้นฉบับ)
+    """
+    prompt = PROOFREAD_PROMPT.format(text=text)
+    
+    # ยิงผ่าน ai_service (Rate Limit + Retry ก่อนเริ่ม Stream)
+    response = request_ai(api_key, model_name, prompt, stream=True)
+    
+    parts = []
+    tail = ""          # ท้ายข้อความสำหรับ Preview (ยาวไม่เกิน PREVIEW_TAIL_CHARS)
+    received_chars = 0
+    received_tokens = 0
+    expected_tokens = max(estimate_tokens(text), 1)
+    frame_interval = 1.0 / PREVIEW_FPS
+    last_frame = 0.0
+    dirty = False
+
+    def render_frame():
+        progress = min(received_tokens / expected_tokens, 0.99)
+        progress_bar.progress(progress, text=f"🤖 AI กำลังพิมพ์... ({int(progress*100)}%)")
+        stream_box.markdown(_stream_preview_html(tail, received_chars > len(tail)), unsafe_allow_html=True)
+
+    for chunk in response:
+        delta = chunk.text
+        if not delta:
+            continue
+        parts.append(delta)
+        received_chars += len(delta)
+        tail = (tail + delta)[-PREVIEW_TAIL_CHARS:]
+
+        # ใช้จำนวน Token จริงจาก API ถ้ามี (สะสมมาแล้ว) ไม่งั้นประมาณจากข้อความส่วนที่เพิ่งได้
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage is not None and getattr(usage, "candidates_token_count", 0):
+            received_tokens = usage.candidates_token_count
+        else:
+            received_tokens += estimate_tokens(delta)
+
+        dirty = True
+        now = time.monotonic()
+        if now - last_frame >= frame_interval:
+            render_frame()
+            last_frame, dirty = now, False
+
+    if dirty:
+        render_frame()
+    progress_bar.progress(1.0, text="เสร็จเรียบร้อย!")
+    return "".join(parts).strip()
+
+def _chunk_preview_html(chunks, finished):
+    """Preview รายชิ้นตามลำดับเดิม: ชิ้นที่เสร็จแสดงข้อความที่แก้แล้ว ชิ้นที่ยังไม่เสร็จแสดงสถานะรอ"""
+    parts = []
+    for i, (body, separator) in enumerate(chunks):
+        if i in finished:
+            parts.append(html.escape(finished[i] + separator))
+        else:
+            parts.append(f'<span style="color: #999;">⏳ ส่วนที่ {i + 1} กำลังตรวจ...</span>{html.escape(separator)}')
+    return f'<div style="{PREVIEW_STYLE} white-space: pre-wrap;">{"".join(parts)}</div>'
+
+def run_proofread(api_key, text, model_name, progress_bar, stream_box, num_workers=DEFAULT_WORKERS, use_prepass=True):
+    """
+    ตรวจทานข้อความ (ใช้ได้ทั้งหน้าจอปกติและงานเบื้องหลัง)
+    - ย่อหน้าที่เคยตรวจแล้ว (ข้อความ + โมเดลเดิม) ใช้ผลจาก Cache ส่ง AI เฉพาะย่อหน้าใหม่/ที่ถูกแก้
+    - use_prepass: ตรวจคำกับพจนานุกรมก่อน ย่อหน้าที่ไม่มีคำแปลกไม่ต้องส่ง AI
+    - ต้องส่งแค่ชิ้นเดียว: Stream คำตอบให้ดูสด
+    - หลายชิ้น: แบ่งตามย่อหน้า/ประโยค ส่ง AI พร้อมกัน แล้วแสดงผลทีละชิ้นที่เสร็จ
+    Return: (ข้อความที่แก้แล้ว หรือ "API_ERROR: ..." ถ้าไม่สำเร็จเลย, จำนวนชิ้นที่ล้มเหลว, สรุป Cache/การข้ามย่อหน้า)
+    """
+    def on_chunk(chunks, finished):
+        progress_bar.progress(len(finished) / len(chunks), text=f"🤖 ตรวจทานเสร็จ {len(finished)}/{len(chunks)} ส่วน...")
+        stream_box.markdown(_chunk_preview_html(chunks, finished), unsafe_allow_html=True)
+
+    def single_fn(body):
+        return stream_correction(api_key, body, model_name, progress_bar, stream_box)
+
+    stats = CacheStats(unit="ย่อหน้า")
+    prepass_stats = PrepassStats()
+    corrected_text, failures, chunk_count = proofread_text(
+        api_key, model_name, text, num_workers=num_workers, on_chunk=on_chunk,
+        cache=get_correction_cache(), stats=stats, single_fn=single_fn,
+        prepass=get_spell_prepass() if use_prepass else None, prepass_stats=prepass_stats
+    )
+    if chunk_count and len(failures) == chunk_count:
+        error = failures[0][1]
+        if (isinstance(error, AIServiceError) and error.kind == "quota") or "429" in str(error):
+            return "API_ERROR: โควต้าเต็ม (Quota Exceeded)", len(failures), None
+        return f"API_ERROR: {error}", len(failures), None
+    progress_bar.progress(1.0, text="เสร็จเรียบร้อย!")
+    summary = "  \n".join(filter(None, [stats.summary(), prepass_stats.summary()]))
+    return corrected_text.strip(), len(failures), summary
+
+def run_proofread_job(job, api_key, text, model_name, num_workers=DEFAULT_WORKERS, use_prepass=True):
+    """งานตรวจทานแบบเบื้องหลัง (job ใช้แทนทั้ง progress_bar และ stream_box)"""
+    corrected_text, failed_chunks, cache_summary = run_proofread(api_key, text, model_name, job, job, num_workers, use_prepass)
+    if corrected_text.startswith("API_ERROR:"):
+        raise RuntimeError(corrected_text.replace("API_ERROR:", "").strip())
+    return {"original": text, "corrected": corrected_text, "failed_chunks": failed_chunks, "cache_summary": cache_summary}
+
+def open_proofread_result(result):
+    st.session_state['sc_result'] = result
+
+def render_proofread_result(original_text, corrected_text, failed_chunks=0, cache_summary=None):
+    if cache_summary:
+        st.caption(cache_summary)
+    if failed_chunks:
+        st.warning(f"⚠️ ตรวจทานไม่สำเร็จ {failed_chunks} ส่วน (คงข้อความเดิมไว้ในส่วนนั้น) - ลองกดตรวจทานใหม่อีกครั้งได้")
+
+    original_lines = original_text.splitlines()
+    corrected_lines = corrected_text.splitlines()
+
+    comparator = TextComparator()
+    raw_html = comparator.generate_diff_html(original_lines, corrected_lines, mode="all")
+    final_html = comparator.get_final_display_html(raw_html)
+
+    # 1. Diff View
+    st.info("👁️ เปรียบเทียบจุดแก้ (Diff View)")
+    st.markdown('<div class="css-card">', unsafe_allow_html=True)
+    import streamlit.components.v1 as components
+    components.html(final_html, height=500, scrolling=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    st.markdown("---")
+    
+    # 2. Final Text Box
+    st.success("✅ ข้อความที่แก้ไขแล้ว (Final Text)")
+    st.text_area(
+        label="Final Text", 
+        value=corrected_text, 
+        height=300,
+        label_visibility="collapsed"
+    )
+    
+    st.caption("💡 กดปุ่ม Copy มุมขวาบนของกล่องด้านล่าง 👇")
+    st.code(corrected_text, language=None)
 
 def render_spell_check_mode():
     
@@ -87,7 +174,7 @@ def render_spell_check_mode():
         with col_model:
             selected_model = None
             if api_key:
-                model_options = get_available_models(api_key)
+                model_options = list_available_models(api_key)
                 if model_options:
                     default_idx = 0
                     for i, name in enumerate(model_options):
@@ -99,6 +186,13 @@ def render_spell_check_mode():
                 else:
                     st.error("❌ ไม่พบโมเดล")
 
+        col_bg, col_workers = st.columns([1, 1])
+        with col_bg:
+            background = st.toggle("🕒 รันเป็นงานเบื้องหลัง (สลับไปใช้เมนูอื่นระหว่างรอได้)", key="sc_background")
+            use_prepass = st.toggle("🔎 ตรวจคำกับพจนานุกรมก่อน (ย่อหน้าที่ไม่พบคำแปลกไม่ต้องส่ง AI)", value=True, key="sc_prepass")
+        with col_workers:
+            num_workers = st.slider("⚡ จำนวนส่วนที่ตรวจพร้อมกัน (ข้อความยาว)", 1, MAX_WORKERS, DEFAULT_WORKERS, key="sc_workers")
+
         st.markdown("---")
         
         # Form สำหรับกรอกข้อความ (อยู่ใน Expander เลย)
@@ -116,8 +210,15 @@ def render_spell_check_mode():
                 disabled=(not api_key)
             )
 
+    # งานเบื้องหลัง (สถานะ + เปิดผลลัพธ์)
+    render_jobs_panel("proofread", open_proofread_result)
+
     # --- 2. ส่วนแสดงผล (Outside Expander) ---
-    if submit_btn and api_key and text_input and selected_model:
+    if submit_btn and api_key and text_input and selected_model and background:
+        title = text_input.strip().splitlines()[0][:30] if text_input.strip() else ""
+        submit_background_job("proofread", f"ตรวจทาน: {title}...", run_proofread_job, api_key, text_input, selected_model, num_workers, use_prepass)
+
+    elif submit_btn and api_key and text_input and selected_model:
         
         st.markdown("### 📝 ผลการตรวจทาน (AI Suggestion)")
         st.caption("🚀 สถานะการทำงาน:")
@@ -126,7 +227,7 @@ def render_spell_check_mode():
         stream_box = st.empty()
         
         try:
-            corrected_text = get_ai_correction_stream(api_key, text_input, selected_model, progress_bar, stream_box)
+            corrected_text, failed_chunks, cache_summary = run_proofread(api_key, text_input, selected_model, progress_bar, stream_box, num_workers, use_prepass)
             
             stream_box.empty() 
             progress_bar.empty()
@@ -135,36 +236,16 @@ def render_spell_check_mode():
                 st.error("เกิดข้อผิดพลาด:")
                 st.error(corrected_text.replace("API_ERROR:", ""))
             else:
-                original_lines = text_input.splitlines()
-                corrected_lines = corrected_text.splitlines()
-
-                comparator = TextComparator()
-                raw_html = comparator.generate_diff_html(original_lines, corrected_lines, mode="all")
-                final_html = comparator.get_final_display_html(raw_html)
-
-                # 1. Diff View
-                st.info("👁️ เปรียบเทียบจุดแก้ (Diff View)")
-                st.markdown('<div class="css-card">', unsafe_allow_html=True)
-                import streamlit.components.v1 as components
-                components.html(final_html, height=500, scrolling=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                st.markdown("---")
-                
-                # 2. Final Text Box
-                st.success("✅ ข้อความที่แก้ไขแล้ว (Final Text)")
-                st.text_area(
-                    label="Final Text", 
-                    value=corrected_text, 
-                    height=300,
-                    label_visibility="collapsed"
-                )
-                
-                st.caption("💡 กดปุ่ม Copy มุมขวาบนของกล่องด้านล่าง 👇")
-                st.code(corrected_text, language=None)
+                render_proofread_result(text_input, corrected_text, failed_chunks, cache_summary)
                     
         except Exception as e:
             st.error(f"เกิดข้อผิดพลาด: {e}")
+
+    elif st.session_state.get('sc_result'):
+        # ผลจากงานเบื้องหลังที่เปิดไว้
+        st.markdown("### 📝 ผลการตรวจทาน (AI Suggestion)")
+        result = st.session_state['sc_result']
+        render_proofread_result(result['original'], result['corrected'], result.get('failed_chunks', 0), result.get('cache_summary'))
             
     elif not submit_btn:
         st.info("👈 กรอกข้อความในกล่องตั้งค่าด้านบน แล้วกดปุ่ม 'เริ่มตรวจทาน'")
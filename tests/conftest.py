@@ -0,0 +1,12 @@
+import pytest
+
+from modules.services import ai_service
+from modules.services.fake_ai_backend import FakeBackend
+
+@pytest.fixture
+def fake_backend():
+    """Backend จำลองที่ตอบทันที (ไม่ติด Rate Limit) แล้วคืน Backend ตาม Environment หลังจบ Test"""
+    backend = FakeBackend(latency=0, jitter=0, per_image_latency=0, chunk_delay=0, rpm=60000)
+    ai_service.set_backend(backend)
+    yield backend
+    ai_service.set_backend(None)
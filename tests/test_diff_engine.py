@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from modules.services.diff_engine import DiffTooExpensive, diff_opcodes, matching_blocks
+
+def _lcs_length(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b, 1):
+            prev, row[j] = row[j], prev + 1 if x == y else max(row[j], row[j - 1])
+    return row[-1]
+
+def _apply(a, b, opcodes):
+    """ตรวจว่า Opcodes ครอบคลุมทั้งสองฝั่งต่อเนื่องกัน แล้วประกอบ b ขึ้นใหม่จาก a"""
+    out, i, j = [], 0, 0
+    for tag, i1, i2, j1, j2 in opcodes:
+        assert (i1, j1) == (i, j)
+        if tag == "equal":
+            assert a[i1:i2] == b[j1:j2]
+            out.extend(a[i1:i2])
+        else:
+            assert tag in ("replace", "delete", "insert")
+            assert (i2 > i1) == (tag != "insert") and (j2 > j1) == (tag != "delete")
+            out.extend(b[j1:j2])
+        i, j = i2, j2
+    assert (i, j) == (len(a), len(b))
+    return out
+
+def _random_pair(rng):
+    alphabet = "abcde"[:rng.randint(1, 5)]
+    a = [rng.choice(alphabet) for _ in range(rng.randint(0, 30))]
+    b = list(a)
+    for _ in range(rng.randint(0, 10)):
+        op = rng.random()
+        pos = rng.randint(0, len(b))
+        if op < 0.4:
+            b.insert(pos, rng.choice(alphabet + "xyz"))
+        elif b and op < 0.8:
+            del b[min(pos, len(b) - 1)]
+        elif b:
+            b[min(pos, len(b) - 1)] = rng.choice(alphabet)
+    return a, b
+
+def test_random_edit_scripts_are_valid():
+    rng = random.Random(1234)
+    for _ in range(2000):
+        a, b = _random_pair(rng)
+        assert _apply(a, b, diff_opcodes(a, b)) == b
+
+def test_myers_finds_longest_common_subsequence():
+    rng = random.Random(42)
+    for _ in range(1000):
+        a, b = _random_pair(rng)
+        blocks = matching_blocks(a, b, max_cost=len(a) + len(b) + 1)
+        assert sum(size for _, _, size in blocks) == _lcs_length(a, b)
+        assert _apply(a, b, diff_opcodes(a, b, max_cost=len(a) + len(b) + 1)) == b
+
+def test_line_diff_with_repeated_lines():
+    a = ["def f():", "    return 1", "}", "", "def g():", "    return 2", "}"]
+    b = ["def f():", "    return 10", "}", "", "", "def g():", "    return 2", "}"]
+    opcodes = diff_opcodes(a, b)
+    assert _apply(a, b, opcodes) == b
+    assert [op[0] for op in opcodes] == ["equal", "replace", "equal", "insert", "equal"]
+
+def test_empty_inputs():
+    assert diff_opcodes([], []) == []
+    assert diff_opcodes("", "abc") == [("insert", 0, 0, 0, 3)]
+    assert diff_opcodes("abc", "") == [("delete", 0, 3, 0, 0)]
+    assert diff_opcodes("abc", "abc") == [("equal", 0, 3, 0, 3)]
+
+def test_max_cost_raises_when_exceeded():
+    with pytest.raises(DiffTooExpensive):
+        matching_blocks("abcdefgh", "hgfedcba", max_cost=2)
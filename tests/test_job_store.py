@@ -0,0 +1,79 @@
+import os
+import time
+
+import pytest
+
+from modules.services import job_store
+from modules.services.job_store import JobBusyError, OcrJobStore, file_hash, make_job_id
+
+@pytest.fixture
+def store(tmp_path):
+    return OcrJobStore(jobs_dir=str(tmp_path))
+
+def test_job_id_depends_on_file_model_pages_and_options():
+    h = file_hash(b"%PDF")
+    base = make_job_id(h, "m", [0, 1], {"structured": False})
+    assert base == make_job_id(h, "m", [0, 1], {"structured": False})
+    assert base != make_job_id(h, "m", [0, 1], {"structured": True})
+    assert base != make_job_id(h, "m", [0, 2], {"structured": False})
+    assert base != make_job_id(h, "other", [0, 1], {"structured": False})
+    assert base != make_job_id(file_hash(b"%PDF-2"), "m", [0, 1], {"structured": False})
+
+def test_resume_lists_unfinished_jobs_with_saved_pages(store):
+    store.create("job1", {"file_hash": "h", "page_numbers": [0, 1, 2]})
+    store.save_page("job1", 0, "หน้า 1", [])
+    store.save_page("job1", 2, "หน้า 3", [["a", "b"]])
+    # create ซ้ำ = ใช้ Checkpoint เดิม
+    assert store.create("job1", {"file_hash": "h", "page_numbers": [0, 1, 2]})["created"] > 0
+    assert store.load_pages("job1") == {0: {"text": "หน้า 1", "tables": []}, 2: {"text": "หน้า 3", "tables": [["a", "b"]]}}
+
+    [job] = store.find_unfinished("h")
+    assert job["job_id"] == "job1" and job["done"] == 2 and not job["running"]
+    assert store.find_unfinished("other") == []
+
+    store.mark_completed("job1")
+    assert store.find_unfinished("h") == []
+
+def test_corrupt_page_counts_as_not_done(store):
+    store.create("job1", {"file_hash": "h"})
+    store.save_page("job1", 0, "ok", [])
+    with open(os.path.join(store.jobs_dir, "job1", "pages", "1.json"), "w") as f:
+        f.write("{broken")
+    assert list(store.load_pages("job1")) == [0]
+
+def test_lease_blocks_a_second_run_and_is_released(store):
+    with store.lease("job1"):
+        assert store.is_running("job1")
+        with pytest.raises(JobBusyError):
+            store.acquire("job1")
+    assert not store.is_running("job1")
+    with pytest.raises(RuntimeError):
+        with store.lease("job1"):
+            raise RuntimeError("ล้มกลางทาง")
+    assert not store.is_running("job1")
+
+def test_stale_lease_can_be_taken_over(store, monkeypatch):
+    store.acquire("job1")
+    monkeypatch.setattr(job_store, "LEASE_SECONDS", 0)
+    assert not store.is_running("job1")
+    store.acquire("job1")  # ไม่ Raise: Lease เดิมหมดอายุแล้ว
+
+def test_reset_keeps_the_lease(store):
+    store.create("job1", {"file_hash": "h"})
+    with store.lease("job1"):
+        store.save_page("job1", 0, "เก่า", [])
+        store.reset("job1")
+        assert store.load_pages("job1") == {} and store.load_meta("job1") is None
+        assert store.is_running("job1")
+
+def test_prune_removes_old_jobs_but_not_running_ones(store):
+    old = time.time() - 30 * 86400
+    for job_id in ("old", "old_running", "new"):
+        store.create(job_id, {"file_hash": "h"})
+    for job_id in ("old", "old_running"):
+        meta = store.load_meta(job_id)
+        meta["created"] = old
+        job_store._write_json(os.path.join(store.jobs_dir, job_id, "meta.json"), meta)
+    store.acquire("old_running")
+    store.prune()
+    assert sorted(os.listdir(store.jobs_dir)) == ["new", "old_running"]
@@ -0,0 +1,47 @@
+import os
+import time
+
+from modules.services.ocr_cache import CacheStats, OcrCache
+
+def _age(cache, key, seconds_ago):
+    t = time.time() - seconds_ago
+    os.utime(cache._path(key), (t, t))
+
+def test_make_key_depends_on_image_model_and_prompt():
+    key = OcrCache.make_key(b"img", "m", "p")
+    assert key != OcrCache.make_key(b"img2", "m", "p")
+    assert key != OcrCache.make_key(b"img", "m2", "p")
+    assert key != OcrCache.make_key(b"img", "m", "p2")
+
+def test_get_put_round_trip(tmp_path):
+    cache = OcrCache(cache_dir=str(tmp_path))
+    assert cache.get("ab" * 32) is None
+    cache.put("ab" * 32, "ข้อความภาษาไทย")
+    assert cache.get("ab" * 32) == "ข้อความภาษาไทย"
+
+def test_evicts_least_recently_used_down_to_target(tmp_path):
+    cache = OcrCache(cache_dir=str(tmp_path), max_bytes=100)
+    keys = [f"{n:02d}" * 32 for n in range(4)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.put(key, "x" * 30)
+        _age(cache, key, age)
+    assert cache._total_bytes == 90
+
+    cache.get(keys[0])  # ถูกใช้ล่าสุด: ไม่ควรถูกลบ
+    cache.put(keys[3], "x" * 30)  # รวม 120 > 100: ลบตัวที่ใช้ล่าสุดนานที่สุดจนเหลือไม่เกิน 90
+    assert [cache.get(k) is not None for k in keys] == [True, False, True, True]
+    assert cache._total_bytes == 90
+
+def test_overwrite_tracks_size_without_rescanning(tmp_path):
+    cache = OcrCache(cache_dir=str(tmp_path), max_bytes=1000)
+    cache.put("aa" * 32, "x" * 10)
+    cache.put("aa" * 32, "x" * 50)
+    cache.put("bb" * 32, "x" * 5)
+    assert cache._total_bytes == 55
+
+def test_cache_stats_summary():
+    stats = CacheStats()
+    stats.record(True)
+    stats.record(False)
+    assert stats.hits == 1 and stats.misses == 1
+    assert stats.summary()
@@ -0,0 +1,52 @@
+import pytest
+
+from modules.services.ocr_cache import OcrCache
+from modules.services.ocr_service import OCR_PROMPT, ocr_page_group, ocr_single_image
+from modules.services.page_packing import AdaptivePacker, build_packed_content, iter_groups, split_packed_response
+
+def test_split_packed_response():
+    raw = "[[PAGE 1]]\nหน้าแรก\n\n[[PAGE 2]]\n  หน้าสอง [[PAGE 9]] ในบรรทัด\n[[PAGE 3]]\n"
+    assert split_packed_response(raw, 3) == ["หน้าแรก", "หน้าสอง [[PAGE 9]] ในบรรทัด", ""]
+
+@pytest.mark.parametrize("raw", [
+    "",
+    "[[PAGE 1]]\na\n[[PAGE 3]]\nc",          # ข้ามหน้า
+    "[[PAGE 2]]\nb\n[[PAGE 1]]\na",          # สลับลำดับ
+    "คำนำ\n[[PAGE 1]]\na\n[[PAGE 2]]\nb",   # มีข้อความก่อน Marker แรก
+    "[[PAGE 1]]\na",                         # Marker ไม่ครบ
+])
+def test_split_packed_response_rejects_bad_markers(raw):
+    assert split_packed_response(raw, 2) is None
+
+def test_build_packed_content_interleaves_markers():
+    content = build_packed_content("PROMPT", [b"a", b"b"])
+    assert content[0].endswith("PROMPT") and "2 page images" in content[0]
+    assert content[1:] == ["[[PAGE 1]]", b"a", "[[PAGE 2]]", b"b"]
+
+def test_adaptive_packer_grows_and_halves():
+    packer = AdaptivePacker(initial=2, max_size=4)
+    packer.success(); packer.success(); packer.success()
+    assert packer.size == 4
+    packer.failure()
+    assert packer.size == 2
+    packer.failure(); packer.failure()
+    assert packer.size == 1
+
+def test_iter_groups_follows_packer_size():
+    packer = AdaptivePacker(initial=2, max_size=2)
+    assert [len(g) for g in iter_groups(range(5), packer)] == [2, 2, 1]
+
+def test_packed_results_do_not_replace_single_page_cache(fake_backend, tmp_path):
+    cache = OcrCache(cache_dir=str(tmp_path))
+    images = [b"page-one", b"page-two"]
+    packed = ocr_page_group("key", images, "models/fake-flash", cache)
+    assert all(isinstance(text, str) for text in packed)
+
+    # ผลจากคำตอบรวมไม่ถูกเก็บใต้ Key ของการอ่านทีละหน้า
+    assert all(cache.get(cache.make_key(image, "models/fake-flash", OCR_PROMPT)) is None for image in images)
+    single = ocr_single_image("key", images[0], "models/fake-flash", cache)
+    assert cache.get(cache.make_key(images[0], "models/fake-flash", OCR_PROMPT)) == single
+
+    # รอบถัดไปของแบบรวมหน้าใช้ผลจาก Cache ได้ทั้งสองแบบ (ทีละหน้ามาก่อน)
+    again = ocr_page_group("key", images, "models/fake-flash", cache)
+    assert again == [single, packed[1]]
@@ -0,0 +1,64 @@
+import random
+
+from modules.services.ocr_cache import CacheStats
+from modules.services.proofreader import (
+    CorrectionCache, chunk_text, estimate_tokens, join_chunks, normalize_paragraph, proofread_text
+)
+
+THAI_WORDS = ["ภาษาไทย", "ที่", "เป็น", "เอกสาร", "ตรวจ", "คำ", "ผิด", "ไม่", "แล้ว", "ให้", "ถูกต้อง"]
+LATIN_WORDS = ["the", "report", "page", "2024", "OCR", "line."]
+
+def _random_text(rng):
+    paragraphs = []
+    for _ in range(rng.randint(1, 8)):
+        words = [rng.choice(THAI_WORDS + LATIN_WORDS) for _ in range(rng.randint(0, 120))]
+        joiners = ["", " ", "  ", "\n", ". "]
+        paragraphs.append("".join(w + rng.choice(joiners) for w in words))
+    return "".join(p + rng.choice(["\n\n", "\n \n", "\n\n\n  "]) for p in paragraphs)
+
+def test_chunk_text_round_trips_every_character():
+    rng = random.Random(7)
+    for _ in range(300):
+        text = _random_text(rng)
+        max_tokens = rng.choice([5, 20, 80, 1500])
+        chunks = chunk_text(text, max_tokens)
+        assert join_chunks(chunks, [body for body, _ in chunks]) == text
+
+def test_chunk_text_respects_budget_and_thai_syllables():
+    text = "ภาษาไทยที่ไม่มีช่องว่างเลยแม้แต่นิดเดียวต้องถูกตัดตามจำนวนตัวอักษร" * 20
+    chunks = chunk_text(text, 30)
+    assert len(chunks) > 1
+    for body, _ in chunks:
+        assert estimate_tokens(body) <= 30
+        # ไม่เริ่มชิ้นด้วยสระ/วรรณยุกต์ที่ต้องเกาะพยัญชนะ
+        assert body[0] not in "ัิีึืุู็่้๊๋์"
+
+def test_chunk_text_keeps_paragraphs_together_when_they_fit():
+    assert chunk_text("ย่อหน้าหนึ่ง\n\nย่อหน้าสอง", 1500) == [("ย่อหน้าหนึ่ง\n\nย่อหน้าสอง", "")]
+    assert join_chunks(chunk_text("", 10), [""]) == ""
+
+def test_normalize_paragraph_ignores_spacing():
+    assert normalize_paragraph("  ก  ข \n\n ค ") == normalize_paragraph("ก ข\nค")
+    assert CorrectionCache.make_key("ก  ข", "m") == CorrectionCache.make_key("ก ข", "m")
+    assert CorrectionCache.make_key("ก ข", "m") != CorrectionCache.make_key("ก ข", "other")
+
+def test_correction_cache_evicts_by_bytes():
+    cache = CorrectionCache(max_bytes=12)
+    cache.put("a", "กข")       # 6 bytes
+    cache.put("b", "คง")
+    cache.get("a")
+    cache.put("c", "x")
+    assert cache.get("b") is None and cache.get("a") == "กข" and cache.total_bytes == 7
+
+def test_proofread_text_reassembles_in_order_and_reuses_cache(fake_backend):
+    text = "\n\n".join(f"ย่อหน้าที่ {n} มีข้อความภาษาไทย" for n in range(40)) + "\n"
+    cache, stats = CorrectionCache(), CacheStats()
+    corrected, failures, sent = proofread_text("key", "models/fake-flash", text, num_workers=4, max_tokens=40,
+                                               cache=cache, stats=stats)
+    # Backend จำลองคืนข้อความเดิม: ต่อกลับแล้วต้องได้ต้นฉบับทุกตัวอักษร
+    assert corrected == text and not failures and sent > 1
+
+    edited = text.replace("ย่อหน้าที่ 7 ", "ย่อหน้าที่ เจ็ด ")
+    corrected, failures, sent = proofread_text("key", "models/fake-flash", edited, num_workers=4, max_tokens=40,
+                                               cache=cache, stats=stats)
+    assert corrected == edited and not failures and sent == 1
@@ -0,0 +1,35 @@
+from modules.services.spell_prepass import SpellPrepass, WordTrie, get_spell_prepass, segment_thai
+
+ENGLISH = ["the", "and", "quick", "brown", "fox", "open", "file", "report"]
+THAI = ["ไฟล์", "และ", "ภาษา", "ไทย", "ภาษาไทย", "ตรวจ", "คำ"]
+
+def _prepass():
+    return SpellPrepass(THAI, ENGLISH)
+
+def test_segment_thai_prefers_dictionary_words():
+    trie = WordTrie(THAI)
+    assert segment_thai("ตรวจคำภาษาไทย", trie) == [("ตรวจ", True), ("คำ", True), ("ภาษาไทย", True)]
+
+def test_segment_thai_merges_unknown_runs():
+    trie = WordTrie(THAI)
+    assert segment_thai("ตรวจกขคคำ", trie) == [("ตรวจ", True), ("กขค", False), ("คำ", True)]
+    assert "".join(word for word, _ in segment_thai("ภาษาฯไทย", trie)) == "ภาษาฯไทย"
+
+def test_word_trie_prefix_lengths():
+    trie = WordTrie(THAI)
+    assert trie.prefix_lengths("ภาษาไทยดี") == [4, 7]
+    assert "ไทย" in trie and "ไท" not in trie
+
+def test_english_suffixes_and_short_acronyms():
+    prepass = _prepass()
+    assert prepass.is_clean("Open the files and the PDF report")
+    assert prepass.is_clean("ไฟล์ PDF และ OCR")
+    assert prepass.unknown_words("the quikc brown fxo") == ["quikc", "fxo"]
+
+def test_all_caps_misspellings_are_not_clean():
+    prepass = _prepass()
+    assert prepass.is_clean("THE QUICK BROWN FOX")
+    assert prepass.unknown_words("THE QUIKC BROWN FXO") == ["QUIKC", "FXO"]
+    # คำตัวพิมพ์ใหญ่ยาวเกินตัวย่อ ต้องอยู่ในพจนานุกรมแม้อยู่ในประโยคปกติ
+    assert prepass.unknown_words("Open the REPORTT") == ["REPORTT"]
+    assert not get_spell_prepass().is_clean("THE QUIKC BROWN FXO")
@@ -0,0 +1,56 @@
+import re
+import zipfile
+
+from modules.services.table_export import (
+    EXCEL_MAX_CELL_CHARS, TRUNCATED_MARKER, _fit_cell, _to_cell, parse_csv_rows, write_tables_xlsx
+)
+
+def _read_sheet(buffer, index=1):
+    """อ่านค่าใน Sheet กลับมาจากไฟล์ .xlsx (xlsxwriter โหมด constant_memory เขียนข้อความแบบ inlineStr)"""
+    xml = zipfile.ZipFile(buffer).read(f"xl/worksheets/sheet{index}.xml").decode("utf-8")
+    rows = []
+    for row in re.findall(r"<row [^>]*>(.*?)</row>", xml):
+        cells = []
+        for attrs, body in re.findall(r"<c ([^>]*)>(.*?)</c>", row):
+            if 't="inlineStr"' in attrs:
+                cells.append(re.search(r"<t[^>]*>(.*?)</t>", body).group(1))
+            else:
+                cells.append(float(re.search(r"<v>(.*?)</v>", body).group(1)))
+        rows.append(cells)
+    return rows
+
+def test_to_cell_numbers():
+    assert _to_cell(" 42 ") == 42
+    assert _to_cell("-3.5") == -3.5
+    assert _to_cell("ราคา") == "ราคา"
+
+def test_to_cell_keeps_codes_as_text():
+    assert _to_cell("007") == "007"
+    # เกิน 15 หลัก: double ของ Excel เก็บหลักท้ายไม่ได้
+    assert _to_cell("1234567890123456789") == "1234567890123456789"
+    assert _to_cell("1234567890123") == 1234567890123
+    assert _to_cell("123456789012345") == 123456789012345
+
+def test_long_digit_string_round_trips_through_xlsx():
+    buffer = write_tables_xlsx([(1, 1, "เลขบัตร,จำนวน\n1234567890123456789,12")])
+    assert _read_sheet(buffer) == [["เลขบัตร", "จำนวน"], ["1234567890123456789", 12.0]]
+
+def test_parse_csv_rows_quoted_thai_and_ragged_rows():
+    rows = parse_csv_rows('```csv\nชื่อ,ที่อยู่\n"สมชาย","12 ถนนสุขุมวิท, กรุงเทพ"\nเกิน\n```')
+    assert rows == [["ชื่อ", "ที่อยู่"], ["สมชาย", "12 ถนนสุขุมวิท, กรุงเทพ"], ["เกิน"]]
+
+def test_parse_csv_rows_markdown_table():
+    rows = parse_csv_rows("| a | b |\n|---|:--:|\n| 1 | x |")
+    assert rows == [["a", "b"], [1, "x"]]
+
+def test_parse_csv_rows_unbalanced_quotes_split_per_line():
+    rows = parse_csv_rows('a,"b\nc,d')
+    assert rows == [["a", "b"], ["c", "d"]]
+
+def test_parse_csv_rows_empty():
+    assert parse_csv_rows("```\n\n```") == []
+
+def test_fit_cell_truncates_with_marker():
+    value, cut = _fit_cell("ก" * (EXCEL_MAX_CELL_CHARS + 10))
+    assert cut and len(value) == EXCEL_MAX_CELL_CHARS and value.endswith(TRUNCATED_MARKER)
+    assert _fit_cell("สั้น") == ("สั้น", False)
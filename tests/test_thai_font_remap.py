@@ -0,0 +1,29 @@
+from modules.services.thai_font_remap import normalize_thai, remap_text
+
+def _cp874_on_latin1(thai):
+    """จำลองฟอนต์เก่า: ไบต์ Windows-874 ของข้อความไทย ถูกอ่านเป็นอักขระ Latin-1"""
+    return thai.encode("cp874").decode("latin-1")
+
+def test_remaps_cp874_on_latin1_by_content():
+    garbled = _cp874_on_latin1("สวัสดีครับ")
+    assert garbled == "ÊÇÑÊ´Õ¤ÃÑº"
+    assert remap_text(garbled) == ("สวัสดีครับ", 10)
+
+def test_remaps_by_legacy_font_name_even_with_few_high_chars():
+    garbled = _cp874_on_latin1("ก") + " 2567 ABC"
+    assert remap_text(garbled)[1] == 0
+    assert remap_text(garbled, "DSE-Regular") == ("ก 2567 ABC", 1)
+
+def test_remaps_private_use_tone_marks_and_normalizes_order():
+    # ก + วรรณยุกต์ตัวต่ำ (PUA) + สระอิ -> เรียงเป็น ก + สระอิ + ไม้เอก
+    assert remap_text("ก\uf70aิ") == ("กิ่", 1)
+    assert remap_text("\uf70fาณ") == ("ญาณ", 1)
+
+def test_leaves_normal_text_alone():
+    for text in ("ภาษาไทยปกติ", "café résumé naïve", "Plain ASCII 123", ""):
+        assert remap_text(text) == (text, 0)
+
+def test_normalize_thai():
+    assert normalize_thai("นํ้า") == "น้ำ"
+    assert normalize_thai("ก่ิ") == "กิ่"
+    assert normalize_thai("ก่่") == "ก่"
@@ -0,0 +1,33 @@
+import pytest
+
+from modules.services.thumbnails import ThumbnailCache, format_page_ranges, parse_page_ranges
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-3, 5", 10) == [0, 1, 2, 4]
+    assert parse_page_ranges("8-", 10) == [7, 8, 9]
+    assert parse_page_ranges("-2,2,2", 10) == [0, 1]
+    assert parse_page_ranges(" , ", 10) == []
+
+@pytest.mark.parametrize("expr", ["0", "11", "5-3", "a", "-", "1-2-3", "3-12"])
+def test_parse_page_ranges_rejects_bad_input(expr):
+    with pytest.raises(ValueError):
+        parse_page_ranges(expr, 10)
+
+def test_parse_page_ranges_empty_document():
+    with pytest.raises(ValueError):
+        parse_page_ranges("1", 0)
+
+def test_format_page_ranges_round_trip():
+    assert format_page_ranges([4, 0, 1, 2, 9]) == "1-3,5,10"
+    assert format_page_ranges([]) == ""
+    for pages in ([0], [0, 2, 3, 4, 7], list(range(20))):
+        assert parse_page_ranges(format_page_ranges(pages), 20) == pages
+
+def test_thumbnail_cache_evicts_least_recently_used():
+    cache = ThumbnailCache(max_bytes=10)
+    cache.put(("f", 0), b"aaaa")
+    cache.put(("f", 1), b"bbbb")
+    assert cache.get(("f", 0)) == b"aaaa"
+    cache.put(("f", 2), b"cccc")
+    assert cache.get(("f", 1)) is None
+    assert cache.get(("f", 0)) == b"aaaa" and cache.total_bytes == 8